@@ -0,0 +1,356 @@
+"""
+Benchmark harness for StreamSearch queries and Flask routes.
+
+Times every DataSource query method and every route (through Flask's test
+client), reporting p50/p95/p99 latency, rows or bytes per second, and peak
+memory, plus the time and memory it takes to build 10,000 result records
+as tuples, dicts and Media objects. Writes the results as JSON so runs on
+different commits can be compared. Run from the project root:
+
+    python -m Benchmarks.bench --seed --scale 10     # reload the database first
+    python -m Benchmarks.bench --output before.json
+    python -m Benchmarks.bench --compare before.json --threshold 0.1
+
+--seed rebuilds the database named in psql_config.py from the CSVs in Data/,
+optionally repeated --scale times with renamed copies of every title, so
+only point it at a local development database.
+"""
+
+import argparse
+import json
+import math
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+import app as webapp
+from ProductionCode.backends import create_datasource, get_backend_name
+from ProductionCode.datasource import DataSource
+from ProductionCode.loader import load_catalog, read_platform_rows
+from ProductionCode.media import MEDIA_FIELDS, Media
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "latest.json")
+
+# (name, call) pairs; call takes the data source and returns the result.
+DATASOURCE_CASES = (
+    ("get_media_later_than", lambda ds: ds.get_media_later_than(2015)),
+    ("get_media_later_than_page", lambda ds: ds.get_media_later_than(2015, limit=51)),
+    ("get_media_by_actor", lambda ds: ds.get_media_by_actor("Anupam Kher")),
+    ("get_media_by_category", lambda ds: ds.get_media_by_category("Drama")),
+    ("get_media_by_category_page", lambda ds: ds.get_media_by_category("Drama", limit=51)),
+    ("get_media_by_advanced_filter",
+     lambda ds: ds.get_media_by_advanced_filter("Anupam Kher", 2000, "Drama")),
+    ("get_media_by_advanced_filter_page",
+     lambda ds: ds.get_media_by_advanced_filter("", 2000, "Comedy", limit=51)),
+    ("get_media_by_advanced_filter_platform_type_page",
+     lambda ds: ds.get_media_by_advanced_filter("", 2000, "", platform="Hulu",
+                                                media_type="Movie", limit=51)),
+    ("get_media_summaries_page",
+     lambda ds: ds.get_media_summaries(category="Drama", limit=51)),
+    ("get_facet_counts", lambda ds: ds.get_facet_counts(release_year=2000, category="Drama")),
+    ("stream_media", lambda ds: list(ds.stream_media(release_year=1900))),
+    ("search_text", lambda ds: ds.search_text("haunted house")),
+    ("get_media_from_title", lambda ds: ds.get_media_from_title("The Grand Seduction")),
+    ("get_similar_titles", lambda ds: ds.get_similar_titles("The Grand Seducton")),
+    ("get_all_categories", lambda ds: ds.get_all_categories()),
+    ("get_all_actors", lambda ds: ds.get_all_actors()),
+    ("get_all_media_titles", lambda ds: ds.get_all_media_titles()),
+    ("get_data_version", lambda ds: ds.get_data_version()),
+)
+
+# (name, build) pairs; build turns one row of column values into a record.
+RECORD_CASES = (
+    ("tuple", tuple),
+    ("dict", lambda values: dict(zip(MEDIA_FIELDS, values))),
+    ("Media", lambda values: Media(*values)),
+)
+RECORD_ROWS = 10000
+
+ROUTE_CASES = (
+    "/",
+    "/about",
+    "/filter",
+    "/actor/Anupam Kher",
+    "/year/2015",
+    "/category/Drama",
+    "/filter/results?actor=&year=2000&category=Comedy",
+    "/filter/results?actor=Anupam+Kher&year=&category=Drama",
+    "/search/text?q=haunted+house",
+    "/search?title_choice=The+Grand+Seduction",
+    "/api/suggest?field=title&q=star",
+    "/api/suggest?field=actor&q=emma",
+)
+
+
+def scaled_rows(platform_rows, scale):
+    """
+    Repeats the catalog scale times, renaming each copy's titles so every
+    row stays distinct while actors, genres and years keep their real mix.
+
+    Args:
+        platform_rows (iterable): Rows as yielded by loader.read_platform_rows().
+        scale (int): Number of copies of the catalog.
+    Yields:
+        tuple: Platform rows.
+    """
+    rows = list(platform_rows)
+    yield from rows
+    for copy in range(2, scale + 1):
+        for row in rows:
+            yield row[:1] + (f"{row[1]} ({copy})",) + row[2:]
+
+
+def seed(scale):
+    """
+    Rebuilds the configured database from Data/, scaled up scale times.
+
+    Args:
+        scale (int): Number of copies of the catalog to load.
+    Returns:
+        dict: The loader's report, see loader.load_catalog().
+    """
+    connection = DataSource.open_connection()
+    try:
+        return load_catalog(connection, scaled_rows(read_platform_rows(), scale))
+    finally:
+        connection.close()
+
+
+def percentile(sorted_values, fraction):
+    """
+    Returns a nearest-rank percentile.
+
+    Args:
+        sorted_values (list): Measurements in ascending order.
+        fraction (float): e.g. 0.95 for p95.
+    Returns:
+        float: The percentile, or 0.0 if there are no measurements.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(fraction * len(sorted_values))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+def peak_rss_kb():
+    """Returns this process's peak resident set size in kilobytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def measure(call, repeat, warmup=1, size=len):
+    """
+    Times repeated calls.
+
+    Args:
+        call (callable): Zero-argument function to time.
+        repeat (int): Number of timed calls.
+        warmup (int): Untimed calls made first.
+        size (callable): Maps a call's result to its size in rows or bytes.
+    Returns:
+        dict: Latency percentiles in milliseconds, throughput, and how much
+        the process's peak memory grew while measuring.
+    """
+    rss_before = peak_rss_kb()
+    for _ in range(warmup):
+        call()
+    seconds = []
+    items = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = call()
+        seconds.append(time.perf_counter() - started)
+        items += size(result) if result is not None else 0
+    seconds.sort()
+    total = sum(seconds)
+    return {
+        "calls": repeat,
+        "p50_ms": percentile(seconds, 0.50) * 1000,
+        "p95_ms": percentile(seconds, 0.95) * 1000,
+        "p99_ms": percentile(seconds, 0.99) * 1000,
+        "mean_ms": total / repeat * 1000 if repeat else 0.0,
+        "items_per_call": items / repeat if repeat else 0,
+        "items_per_sec": items / total if total else 0.0,
+        "peak_rss_growth_kb": peak_rss_kb() - rss_before,
+    }
+
+
+def result_size(result):
+    """Counts the rows in a query result; single values count as one."""
+    return len(result) if isinstance(result, (list, tuple)) else 1
+
+
+def benchmark_datasource(ds, repeat):
+    """
+    Times every DataSource query method.
+
+    Args:
+        ds: A DataSource or MemoryDataSource.
+        repeat (int): Timed calls per method.
+    Returns:
+        dict: Case name -> measurements; items are rows.
+    """
+    return {f"datasource.{name}": measure(lambda call=call: call(ds), repeat, size=result_size)
+            for name, call in DATASOURCE_CASES}
+
+
+def benchmark_routes(flask_app, repeat):
+    """
+    Times every route through Flask's test client.
+
+    Args:
+        flask_app (Flask): The app to request pages from.
+        repeat (int): Timed requests per route.
+    Returns:
+        dict: Route -> measurements; items are response bytes.
+    """
+    client = flask_app.test_client()
+    return {f"route.{path}": measure(lambda path=path: client.get(path).data, repeat)
+            for path in ROUTE_CASES}
+
+
+def allocated_kb(call):
+    """
+    Measures the memory held by what a call returns.
+
+    Args:
+        call (callable): Zero-argument function to measure.
+    Returns:
+        float: Kilobytes allocated by the call and still in use when it returns.
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = call()
+        allocated = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del result
+    return allocated / 1024
+
+
+def benchmark_records(repeat, rows=RECORD_ROWS):
+    """
+    Times building result records of each kind in RECORD_CASES from the
+    same column values, and measures the memory the records take. Values
+    are shared, so the memory is that of the records themselves.
+
+    Args:
+        repeat (int): Timed batches per kind.
+        rows (int): Records per batch.
+    Returns:
+        dict: Case name -> measurements; items are records, and kb is the
+        memory one batch takes.
+    """
+    values = [["Movie", f"Title {i}", "Actor A, Actor B", 2000 + i % 20, "Drama",
+               "Description", "Netflix", i] for i in range(rows)]
+    results = {}
+    for name, build in RECORD_CASES:
+        def batch(build=build):
+            return [build(row) for row in values]
+        stats = measure(batch, repeat)
+        stats["kb"] = allocated_kb(batch)
+        results[f"records.{name}"] = stats
+    return results
+
+
+def compare(baseline, current, threshold, min_delta_ms=0.5):
+    """
+    Finds cases whose p95 latency grew by more than threshold.
+
+    Args:
+        baseline (dict): Results JSON from an earlier run.
+        current (dict): Results JSON from this run.
+        threshold (float): Allowed relative slowdown, e.g. 0.1 for 10%.
+        min_delta_ms (float): Smaller slowdowns are ignored as timer noise,
+            whatever their relative size.
+    Returns:
+        list: (case, baseline p95 ms, current p95 ms) for each regression.
+    """
+    regressions = []
+    for case, now in current["results"].items():
+        before = baseline["results"].get(case)
+        if (before and now["p95_ms"] > before["p95_ms"] * (1 + threshold)
+                and now["p95_ms"] - before["p95_ms"] >= min_delta_ms):
+            regressions.append((case, before["p95_ms"], now["p95_ms"]))
+    return regressions
+
+
+def git_commit():
+    """Returns the current commit hash, or None outside a git checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args():
+    """Parses command line arguments for the benchmark run."""
+    parser = argparse.ArgumentParser(description="Benchmark StreamSearch queries and routes.")
+    parser.add_argument("--seed", action="store_true",
+                        help="Rebuild the database from Data/ before benchmarking")
+    parser.add_argument("--scale", type=int, default=1,
+                        help="With --seed, load the catalog this many times over (e.g. 10, 100)")
+    parser.add_argument("--repeat", type=int, default=50, help="Timed calls per case")
+    parser.add_argument("--only", choices=("datasource", "routes", "records"),
+                        help="Benchmark only DataSource methods, routes or record types")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Disable the app's query cache so routes always query the database")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Where to write results JSON")
+    parser.add_argument("--compare", help="Results JSON from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Relative p95 slowdown reported as a regression (default 0.1)")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5,
+                        help="Ignore p95 slowdowns smaller than this many ms (default 0.5)")
+    return parser.parse_args()
+
+
+def main():
+    """Runs the benchmarks, writes the results, and reports regressions."""
+    args = parse_args()
+    if args.seed:
+        for table, (count, seconds) in seed(args.scale).items():
+            print(f"seeded {table}: {count} rows in {seconds:.2f}s")
+
+    if args.no_cache and hasattr(webapp.ds, "query_cache"):
+        webapp.ds.query_cache = None
+    results = {}
+    if args.only in (None, "datasource"):
+        results.update(benchmark_datasource(create_datasource(), args.repeat))
+    if args.only in (None, "routes"):
+        results.update(benchmark_routes(webapp.app, args.repeat))
+    if args.only in (None, "records"):
+        results.update(benchmark_records(args.repeat))
+
+    report = {
+        "commit": git_commit(),
+        "backend": get_backend_name(),
+        "scale": args.scale,
+        "repeat": args.repeat,
+        "peak_rss_kb": peak_rss_kb(),
+        "results": results,
+    }
+    for case, stats in results.items():
+        print(f"{case:60} p50 {stats['p50_ms']:8.2f}ms  p95 {stats['p95_ms']:8.2f}ms  "
+              f"p99 {stats['p99_ms']:8.2f}ms  {stats['items_per_sec']:12,.0f}/s")
+    print(f"peak RSS: {report['peak_rss_kb']:,} KB")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as output:
+        json.dump(report, output, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline_file:
+            regressions = compare(json.load(baseline_file), report,
+                                  args.threshold, args.min_delta_ms)
+        for case, before, now in regressions:
+            print(f"REGRESSION {case}: p95 {before:.2f}ms -> {now:.2f}ms")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+ALTER TABLE media ADD PRIMARY KEY (id);
+ALTER TABLE actors ADD PRIMARY KEY (id);
+ALTER TABLE genres ADD PRIMARY KEY (id);
+ALTER TABLE directors ADD PRIMARY KEY (id);
+
+CREATE UNIQUE INDEX actors_actor_idx ON actors (lower(actor));
+CREATE UNIQUE INDEX genres_genre_idx ON genres (lower(genre));
+CREATE UNIQUE INDEX directors_director_idx ON directors (lower(director));
+CREATE INDEX actors_sorted_idx ON actors (actor);
+CREATE INDEX genres_sorted_idx ON genres (genre);
+-- Prefix matches (match=prefix) are ranges over lower(name) compared by bytes.
+CREATE INDEX actors_actor_prefix_idx ON actors (lower(actor) text_pattern_ops);
+CREATE INDEX genres_genre_prefix_idx ON genres (lower(genre) text_pattern_ops);
+
+ALTER TABLE media_to_actors ADD PRIMARY KEY (media_id, actor_id);
+ALTER TABLE media_to_actors ADD FOREIGN KEY (media_id) REFERENCES media (id);
+ALTER TABLE media_to_actors ADD FOREIGN KEY (actor_id) REFERENCES actors (id);
+CREATE INDEX media_to_actors_actor_idx ON media_to_actors (actor_id, media_id);
+
+ALTER TABLE media_to_genres ADD PRIMARY KEY (media_id, genre_id);
+ALTER TABLE media_to_genres ADD FOREIGN KEY (media_id) REFERENCES media (id);
+ALTER TABLE media_to_genres ADD FOREIGN KEY (genre_id) REFERENCES genres (id);
+CREATE INDEX media_to_genres_genre_idx ON media_to_genres (genre_id, media_id);
+
+ALTER TABLE media_to_directors ADD PRIMARY KEY (media_id, director_id);
+ALTER TABLE media_to_directors ADD FOREIGN KEY (media_id) REFERENCES media (id);
+ALTER TABLE media_to_directors ADD FOREIGN KEY (director_id) REFERENCES directors (id);
+CREATE INDEX media_to_directors_director_idx ON media_to_directors (director_id, media_id);
+
+CREATE INDEX media_catalog_order_idx ON media (release_year DESC, title, id);
+-- Platform and media type filters, with or without a release year range.
+CREATE INDEX media_platform_type_year_idx
+    ON media (lower(platform), lower(media_type), release_year);
+CREATE INDEX media_search_idx ON media USING GIN (search_vector);
+-- Exact title lookups, and "did you mean" suggestions by trigram similarity.
+CREATE INDEX media_title_lower_idx ON media (lower(title));
+-- The loader installs pg_trgm in public, which is not on its search_path.
+CREATE INDEX media_title_trgm_idx ON media USING GIST (title public.gist_trgm_ops);
+
+ANALYZE media;
+ANALYZE actors;
+ANALYZE genres;
+ANALYZE directors;
+ANALYZE media_to_actors;
+ANALYZE media_to_genres;
+ANALYZE media_to_directors;
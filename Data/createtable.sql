@@ -1,10 +1,59 @@
+DROP TABLE IF EXISTS media_to_actors;
+DROP TABLE IF EXISTS media_to_genres;
+DROP TABLE IF EXISTS media_to_directors;
+DROP TABLE IF EXISTS actors;
+DROP TABLE IF EXISTS genres;
+DROP TABLE IF EXISTS directors;
+DROP TABLE IF EXISTS media;
+DROP TABLE IF EXISTS catalog_version;
 DROP TABLE IF EXISTS stream_data;
-CREATE TABLE stream_data (
+
+CREATE TABLE media (
+    id int NOT NULL,
     media_type text,
     title text,
     media_cast text,
     release_year int,
     category text,
     media_description text,
-    platform text
-);
\ No newline at end of file
+    platform text,
+    search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(media_description, '')), 'B')
+    ) STORED
+);
+
+CREATE TABLE actors (
+    id int NOT NULL,
+    actor text NOT NULL
+);
+
+CREATE TABLE genres (
+    id int NOT NULL,
+    genre text NOT NULL
+);
+
+CREATE TABLE directors (
+    id int NOT NULL,
+    director text NOT NULL
+);
+
+CREATE TABLE media_to_actors (
+    media_id int NOT NULL,
+    actor_id int NOT NULL
+);
+
+CREATE TABLE media_to_genres (
+    media_id int NOT NULL,
+    genre_id int NOT NULL
+);
+
+CREATE TABLE media_to_directors (
+    media_id int NOT NULL,
+    director_id int NOT NULL
+);
+
+CREATE TABLE catalog_version (
+    version bigint NOT NULL,
+    loaded_at timestamptz NOT NULL DEFAULT now()
+);
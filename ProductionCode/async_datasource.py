@@ -0,0 +1,91 @@
+"""
+Module providing an asyncio interface to a DataSource.
+
+psycopg2 is a blocking driver, so AsyncDataSource runs each query on a small
+thread pool and awaits the result. Independent queries started together run
+on separate pooled connections at the same time, so waiting for all of them
+takes as long as the slowest rather than the sum.
+"""
+
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# Worker threads for data sources without a connection pool.
+DEFAULT_WORKERS = 4
+
+
+class AsyncDataSource:
+    """
+    Awaitable versions of every DataSource query method.
+
+    Any method of the wrapped data source can be called and awaited, e.g.
+    ``await ads.get_all_categories()``; it runs on the executor's threads.
+    """
+
+    def __init__(self, datasource, max_workers=None):
+        """
+        Args:
+            datasource: A DataSource or MemoryDataSource to run queries on.
+            max_workers (int): Most queries run at once. Defaults to the
+                DataSource's max_connections, so every pooled connection
+                can be in use, or DEFAULT_WORKERS without a pool.
+        """
+        if max_workers is None:
+            pool_settings = getattr(datasource, "pool_settings", None)
+            max_workers = (pool_settings["max_size"] if isinstance(pool_settings, dict)
+                           else DEFAULT_WORKERS)
+        self.datasource = datasource
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix="streamsearch-query")
+
+    async def call(self, function, *args, **kwargs):
+        """
+        Runs any blocking function on the executor and awaits its result.
+        The function sees the caller's context variables, such as the
+        request timings queries add their time to, as asyncio.to_thread()
+        does.
+
+        Args:
+            function (callable): The function to run.
+            *args, **kwargs: Its arguments.
+        Returns:
+            The function's return value; its exceptions are re-raised.
+        """
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self.executor, partial(context.run, function,
+                                                                 *args, **kwargs))
+
+    def __getattr__(self, name):
+        """Returns an async wrapper for the wrapped data source's method."""
+        if name in ("datasource", "executor"):
+            raise AttributeError(name)
+        method = getattr(self.datasource, name)
+        if not callable(method):
+            return method
+
+        async def run_method(*args, **kwargs):
+            return await self.call(getattr(self.datasource, name), *args, **kwargs)
+
+        run_method.__name__ = name
+        run_method.__doc__ = method.__doc__
+        return run_method
+
+    def gather(self, *calls):
+        """
+        Runs several awaitables concurrently from synchronous code, such as
+        a Flask view, and waits for them all.
+
+        Args:
+            *calls: Coroutines, e.g. ads.get_all_categories().
+        Returns:
+            list: Each call's result in order, or the exception it raised.
+        """
+        async def run_all():
+            return await asyncio.gather(*calls, return_exceptions=True)
+        return asyncio.run(run_all())
+
+    def close(self):
+        """Waits for running queries and stops the worker threads."""
+        self.executor.shutdown(wait=True)
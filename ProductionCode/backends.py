@@ -0,0 +1,45 @@
+"""
+Module for choosing where StreamSearch reads its data from.
+
+The backend is named by the STREAMSEARCH_BACKEND environment variable, or
+else by BACKEND in psql_config.py, and defaults to PostgreSQL:
+
+    postgres: DataSource, querying the database built by the loader.
+    memory: MemoryDataSource, answering from the platform CSVs in memory.
+"""
+
+import os
+import ProductionCode.psql_config as config
+from ProductionCode.datasource import DataSource
+from ProductionCode.memory_datasource import MemoryDataSource
+
+BACKENDS = ("postgres", "memory")
+
+
+def get_backend_name():
+    """
+    Returns the configured backend name.
+
+    Returns:
+        str: One of BACKENDS, or whatever unknown name was configured.
+    """
+    return os.environ.get("STREAMSEARCH_BACKEND") or getattr(config, "BACKEND", "postgres")
+
+
+def create_datasource(backend=None, **options):
+    """
+    Creates the data source for the configured backend.
+
+    Args:
+        backend (str): Backend name; defaults to get_backend_name().
+        **options: Keyword arguments for DataSource. The memory backend
+            needs none and ignores them.
+    Returns:
+        DataSource or MemoryDataSource: The data source.
+    """
+    backend = backend or get_backend_name()
+    if backend == "postgres":
+        return DataSource(**options)
+    if backend == "memory":
+        return MemoryDataSource()
+    raise ValueError(f"Unknown backend {backend!r}; expected one of {', '.join(BACKENDS)}")
@@ -0,0 +1,270 @@
+"""
+Module providing bitmap indexes for filtering an in-memory catalog.
+
+Entries are numbered by position, 0 to size - 1. A bitmap is a Python int
+whose bit i is set when entry i matches, so AND, OR and NOT of whole
+filters are single big-integer operations, run in C a machine word at a
+time, and counting matches is int.bit_count(). Fields with few distinct
+values (genre, platform, media type, decade) keep one bitmap per value;
+fields with many values that each match few entries (actors) keep sorted
+posting lists instead, turned into bitmaps when queried, which keeps the
+index small. Release years keep, for each year, the bitmap of every entry
+released in or after it.
+
+Filters are written as nested tuples:
+
+    ("and", ("genre", "Drama"), ("not", ("platform", "Netflix")))
+    ("or", ("actor", "Tom Hanks"), ("actor", "tom", "prefix"))
+    ("after", 2000)
+
+A leaf (field, value) matches the value ignoring case, or with a third
+item "prefix" every value starting with it.
+"""
+
+import re
+from bisect import bisect_left, bisect_right
+from ProductionCode.datasource import COLUMN_FILTERS, MATCH_MODES, prefix_bounds
+
+NONZERO_BYTE = re.compile(rb"[^\x00]")
+# The set bits of every byte value, lowest first.
+BYTE_BITS = tuple(tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256))
+
+
+def index_key(value):
+    """
+    Returns the key a field value is indexed under: lower-cased text, or
+    the value itself otherwise.
+    """
+    return value.lower() if isinstance(value, str) else value
+
+
+def filter_expression(actor_name=None, release_year=None, category=None, match="exact",
+                      **columns):
+    """
+    Builds the filter expression of the filters the list queries take.
+    A missing or empty filter is left out, as in media_filters().
+
+    Args:
+        actor_name (str): The name of the actor to filter by.
+        release_year (int): The year to filter media released after.
+        category (str): The genre or category to filter by.
+        match (str): "exact" or "prefix".
+        **columns: Optional platform and media_type, matched as whole values.
+    Returns:
+        tuple: An "and" expression for BitmapIndex.evaluate().
+    Raises:
+        TypeError: If columns names a column not in COLUMN_FILTERS.
+    """
+    unknown = set(columns) - set(COLUMN_FILTERS)
+    if unknown:
+        raise TypeError(f"Unknown filters: {', '.join(sorted(unknown))}")
+    filters = [("after", release_year)] if release_year is not None else []
+    filters += [(field, name, match) for field, name in (("actor", actor_name),
+                                                        ("genre", category)) if name]
+    filters += [(column, columns[column]) for column in COLUMN_FILTERS if columns.get(column)]
+    return ("and", *filters)
+
+
+def to_bitmap(positions):
+    """
+    Builds a bitmap with the given bits set.
+
+    Args:
+        positions (iterable of int): Entry positions, in any order.
+    Returns:
+        int: The bitmap.
+    """
+    positions = list(positions)
+    if not positions:
+        return 0
+    data = bytearray(max(positions) // 8 + 1)
+    for position in positions:
+        data[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(data, "little")
+
+
+def range_bitmap(start, stop):
+    """
+    Returns the bitmap of positions start (inclusive) to stop (exclusive).
+    """
+    if stop <= start:
+        return 0
+    return ((1 << (stop - start)) - 1) << start
+
+
+def bit_positions(bits, reverse=False):
+    """
+    Yields the positions of a bitmap's set bits. Runs of unset bits are
+    skipped a byte at a time by a regular expression scan, so sparse
+    bitmaps are read about as fast as dense ones.
+
+    Args:
+        bits (int): A bitmap.
+        reverse (bool): Yield the highest position first instead of the lowest.
+    Yields:
+        int: Set bit positions, in ascending (or descending) order.
+    """
+    size = (bits.bit_length() + 7) // 8
+    if not reverse:
+        data = bits.to_bytes(size, "little")
+        for found in NONZERO_BYTE.finditer(data):
+            offset = found.start()
+            for bit in BYTE_BITS[data[offset]]:
+                yield offset * 8 + bit
+        return
+    data = bits.to_bytes(size, "big")
+    for found in NONZERO_BYTE.finditer(data):
+        offset = found.start()
+        for bit in reversed(BYTE_BITS[data[offset]]):
+            yield (size - 1 - offset) * 8 + bit
+
+
+class BitmapIndex:
+    """Evaluates filter expressions over a fixed set of entries as bitmaps."""
+
+    def __init__(self, size):
+        """
+        Creates an index with no fields.
+
+        Args:
+            size (int): Number of entries.
+        """
+        self.size = size
+        self._bitmaps = {}
+        self._postings = {}
+        self._names = {}
+        self._sorted_keys = {}
+        self._years = ([], [])
+
+    def add_field(self, field, pairs, postings=False):
+        """
+        Indexes a field.
+
+        Args:
+            field (str): The field name used in filters.
+            pairs (iterable): (position, value) pairs; an entry may have
+                several values, and None values are left out.
+            postings (bool): Keep sorted posting lists rather than bitmaps,
+                for fields with many rarely shared values.
+        """
+        found, names = {}, self._names.setdefault(field, {})
+        for position, value in pairs:
+            if value is None:
+                continue
+            key = index_key(value)
+            names.setdefault(key, value)
+            found.setdefault(key, []).append(position)
+        if postings:
+            self._postings[field] = {key: sorted(positions) for key, positions in found.items()}
+        else:
+            self._bitmaps[field] = {key: to_bitmap(positions) for key, positions in found.items()}
+        self._sorted_keys[field] = sorted(found)
+
+    def add_years(self, pairs):
+        """
+        Indexes release years for ("after", year) filters.
+
+        Args:
+            pairs (iterable): (position, release year) pairs; None years
+                never match.
+        """
+        by_year = {}
+        for position, year in pairs:
+            if year is not None:
+                by_year.setdefault(year, []).append(position)
+        years = sorted(by_year)
+        at_least, bits = [], 0
+        for year in reversed(years):
+            bits |= to_bitmap(by_year[year])
+            at_least.append(bits)
+        at_least.reverse()
+        self._years = (years, at_least)
+
+    def everything(self):
+        """Returns the bitmap of every entry."""
+        return range_bitmap(0, self.size)
+
+    def lookup(self, field, value, match="exact"):
+        """
+        Returns the bitmap of entries whose field has a value, ignoring case,
+        or with match="prefix" a value starting with it.
+
+        Raises:
+            KeyError: If the field is not indexed.
+            ValueError: If match is not one of MATCH_MODES.
+        """
+        if field not in self._sorted_keys:
+            raise KeyError(f"Unknown field: {field}")
+        if match == "exact":
+            keys = [index_key(value)]
+        elif match in MATCH_MODES:
+            low, high = prefix_bounds(value)
+            sorted_keys = self._sorted_keys[field]
+            keys = sorted_keys[bisect_left(sorted_keys, low):bisect_left(sorted_keys, high)]
+        else:
+            raise ValueError(f"Unknown match mode: {match}")
+        if field in self._bitmaps:
+            bits = 0
+            for key in keys:
+                bits |= self._bitmaps[field].get(key, 0)
+            return bits
+        postings = self._postings[field]
+        return to_bitmap(position for key in keys for position in postings.get(key, ()))
+
+    def released_after(self, year):
+        """Returns the bitmap of entries released after a year."""
+        years, at_least = self._years
+        index = bisect_right(years, int(year))
+        return at_least[index] if index < len(years) else 0
+
+    def evaluate(self, expression):
+        """
+        Finds the entries matching a filter expression.
+
+        Args:
+            expression (tuple): A filter, see the module docstring.
+        Returns:
+            int: The bitmap of matching entries.
+        Raises:
+            KeyError: If the expression names an unknown field.
+            ValueError: If an operator is misused or a match mode unknown.
+        """
+        operator, *operands = expression
+        if operator == "and":
+            bits = self.everything()
+            for operand in operands:
+                if not bits:
+                    break
+                bits &= self.evaluate(operand)
+            return bits
+        if operator == "or":
+            bits = 0
+            for operand in operands:
+                bits |= self.evaluate(operand)
+            return bits
+        if operator == "not":
+            if len(operands) != 1:
+                raise ValueError("not takes exactly one filter")
+            return self.everything() & ~self.evaluate(operands[0])
+        if operator == "after":
+            return self.released_after(*operands)
+        return self.lookup(operator, *operands)
+
+    def counts(self, field, bits):
+        """
+        Counts the entries of a bitmap per value of a bitmap field.
+
+        Args:
+            field (str): A field indexed without postings.
+            bits (int): The entries to count, e.g. from evaluate().
+        Returns:
+            list: (value, count) pairs for values with a nonzero count,
+            values as first indexed.
+        """
+        names = self._names[field]
+        found = []
+        for key, value_bits in self._bitmaps[field].items():
+            count = (bits & value_bits).bit_count()
+            if count:
+                found.append((names[key], count))
+        return found
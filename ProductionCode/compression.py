@@ -0,0 +1,290 @@
+"""
+Module for compressing HTTP responses and precompressing static files.
+
+CompressionMiddleware wraps a WSGI app and compresses text responses with
+Brotli (when the brotli package is installed) or gzip, chunk by chunk, so
+large or streamed pages are compressed as they are produced. Static files
+are compressed ahead of time by running this module:
+
+    python -m ProductionCode.compression static/stylesheet.css
+
+which writes stylesheet.css.gz (and stylesheet.css.br with brotli) next to
+the original for the app to serve as they are.
+"""
+
+import gzip
+import os
+import sys
+import zlib
+from functools import partial
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Responses smaller than this are sent as they are; compressing them saves
+# less than the encoding's own overhead.
+MIN_SIZE = 1024
+
+COMPRESSIBLE_TYPES = (
+    "text/html",
+    "text/plain",
+    "text/css",
+    "text/csv",
+    "application/json",
+    "application/javascript",
+    "image/svg+xml",
+)
+
+# File suffix for each encoding, in order of preference.
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def available_encodings():
+    """
+    Returns the encodings this process can produce, best first.
+
+    Returns:
+        tuple: Content-Encoding names.
+    """
+    return tuple(name for name, _ in ENCODINGS if name != "br" or brotli is not None)
+
+
+def choose_encoding(accept_encoding, encodings=None):
+    """
+    Picks the best encoding a client accepts.
+
+    Args:
+        accept_encoding (str): The request's Accept-Encoding header, or None.
+        encodings (tuple): Encodings to choose from, best first; defaults
+            to available_encodings().
+    Returns:
+        str: An encoding name, or None to send the response uncompressed.
+    """
+    accepted = {}
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+    if encodings is None:
+        encodings = available_encodings()
+    for name in encodings:
+        if accepted.get(name, accepted.get("*", 0.0)) > 0:
+            return name
+    return None
+
+
+def compressor(encoding, level=6):
+    """
+    Creates a streaming compressor.
+
+    Args:
+        encoding (str): "br" or "gzip".
+        level (int): gzip level 1-9; Brotli uses a comparable quality.
+    Returns:
+        tuple: (compress, flush, finish) functions; compress takes bytes and
+        returns the compressed bytes ready so far, flush returns everything
+        compressed so far so the client can decode it, and finish ends the
+        stream.
+    """
+    if encoding == "br":
+        brotli_compressor = brotli.Compressor(quality=min(level + 1, 11))
+        return brotli_compressor.process, brotli_compressor.flush, brotli_compressor.finish
+    zlib_compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return (zlib_compressor.compress, partial(zlib_compressor.flush, zlib.Z_SYNC_FLUSH),
+            zlib_compressor.flush)
+
+
+def is_compressible(content_type):
+    """
+    Tells whether a response type is worth compressing.
+
+    Args:
+        content_type (str): The Content-Type header, or None.
+    Returns:
+        bool: True for text types in COMPRESSIBLE_TYPES.
+    """
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    return media_type in COMPRESSIBLE_TYPES
+
+
+class CompressionMiddleware:
+    """
+    WSGI middleware that compresses text responses the client can decode.
+
+    Responses are left alone when they are smaller than min_size, not of
+    a compressible type, already encoded, or marked no-transform. ETags of
+    compressed responses get the encoding appended, as the compressed bytes
+    are a different representation; revalidations are matched back to the
+    app's own ETag.
+    """
+
+    def __init__(self, app, min_size=MIN_SIZE, level=6):
+        """
+        Args:
+            app: The WSGI app to wrap, e.g. flask_app.wsgi_app.
+            min_size (int): Smallest Content-Length worth compressing.
+                Responses without a Content-Length (streamed ones) are
+                always compressed.
+            level (int): Compression level, 1 (fastest) to 9 (smallest).
+        """
+        self.app = app
+        self.min_size = min_size
+        self.level = level
+
+    def __call__(self, environ, start_response):
+        encoding = None
+        if environ.get("REQUEST_METHOD") != "HEAD":
+            encoding = choose_encoding(environ.get("HTTP_ACCEPT_ENCODING"))
+        if encoding is None:
+            return self.app(environ, start_response)
+
+        suffix = f"-{encoding}\""
+        if_none_match = environ.get("HTTP_IF_NONE_MATCH", "")
+        revalidating_compressed = suffix in if_none_match
+        if revalidating_compressed:
+            environ["HTTP_IF_NONE_MATCH"] = if_none_match.replace(suffix, "\"")
+        compressing = []
+
+        def compressing_start_response(status, headers, exc_info=None):
+            headers = list(headers)
+            if self._should_compress(status, headers):
+                streamed = not any(name.lower() == "content-length" for name, _ in headers)
+                headers = [(name, value) for name, value in headers
+                           if name.lower() != "content-length"]
+                headers.append(("Content-Encoding", encoding))
+                compressing.append(streamed)
+            if compressing or (revalidating_compressed and status.startswith("304")):
+                headers = [(name, self._tag(value, suffix) if name.lower() == "etag" else value)
+                           for name, value in headers]
+            headers = self._add_vary(headers)
+            return start_response(status, headers, exc_info)
+
+        body = self.app(environ, compressing_start_response)
+        if not compressing:
+            return body
+        return self._compress(body, encoding, flush_chunks=compressing[0])
+
+    def _should_compress(self, status, headers):
+        """Tells whether a response with these headers should be compressed."""
+        if not status.startswith("200"):
+            return False
+        found = {name.lower(): value for name, value in headers}
+        if "content-encoding" in found or "no-transform" in found.get("cache-control", ""):
+            return False
+        if not is_compressible(found.get("content-type")):
+            return False
+        length = found.get("content-length")
+        return length is None or int(length) >= self.min_size
+
+    @staticmethod
+    def _tag(etag, suffix):
+        """Appends the encoding to a quoted ETag."""
+        if etag.endswith("\"") and not etag.endswith(suffix):
+            return etag[:-1] + suffix
+        return etag
+
+    @staticmethod
+    def _add_vary(headers):
+        """Adds Accept-Encoding to the Vary header."""
+        for i, (name, value) in enumerate(headers):
+            if name.lower() == "vary":
+                if "accept-encoding" not in value.lower():
+                    headers[i] = (name, f"{value}, Accept-Encoding")
+                return headers
+        return headers + [("Vary", "Accept-Encoding")]
+
+    def _compress(self, body, encoding, flush_chunks=False):
+        """
+        Yields the compressed body, compressing each chunk as it is produced.
+        With flush_chunks, as for streamed responses, each chunk is sent as
+        soon as it is compressed instead of when the compressor's buffer
+        fills, so the client can show it right away.
+        """
+        compress, flush, finish = compressor(encoding, self.level)
+        try:
+            for chunk in body:
+                data = compress(chunk)
+                if flush_chunks:
+                    data += flush()
+                if data:
+                    yield data
+            yield finish()
+        finally:
+            close = getattr(body, "close", None)
+            if close is not None:
+                close()
+
+
+def precompress(path, level=9):
+    """
+    Writes compressed copies of a static file next to it, for every
+    available encoding.
+
+    Args:
+        path (str): The file to compress.
+        level (int): Compression level; ahead of time, the smallest output
+            is worth the extra CPU.
+    Returns:
+        list: Paths of the files written.
+    """
+    with open(path, "rb") as source:
+        data = source.read()
+    written = []
+    for encoding, extension in ENCODINGS:
+        if encoding not in available_encodings():
+            continue
+        if encoding == "br":
+            compressed = brotli.compress(data, quality=11)
+        else:
+            compressed = gzip.compress(data, compresslevel=level, mtime=0)
+        with open(path + extension, "wb") as output:
+            output.write(compressed)
+        written.append(path + extension)
+    return written
+
+
+def precompressed_path(path, accept_encoding):
+    """
+    Finds an up-to-date precompressed copy of a static file that the client
+    accepts.
+
+    Args:
+        path (str): The original file.
+        accept_encoding (str): The request's Accept-Encoding header.
+    Returns:
+        tuple: (path of the compressed copy, encoding), or (None, None).
+    """
+    try:
+        modified = os.path.getmtime(path)
+    except OSError:
+        return None, None
+    present = {}
+    for encoding, extension in ENCODINGS:
+        try:
+            if os.path.getmtime(path + extension) >= modified:
+                present[encoding] = path + extension
+        except OSError:
+            continue
+    encoding = choose_encoding(accept_encoding, tuple(present))
+    return (present[encoding], encoding) if encoding else (None, None)
+
+
+def main():
+    """Precompresses the static files named on the command line."""
+    for path in sys.argv[1:]:
+        size = os.path.getsize(path)
+        for written in precompress(path):
+            print(f"{written}: {size:,} -> {os.path.getsize(written):,} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Module providing a bounded, thread-safe pool of PostgreSQL connections.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+import psycopg2
+
+
+class PoolTimeoutError(ConnectionError):
+    """Raised when no pooled connection becomes free before the wait timeout."""
+
+
+class PoolClosedError(ConnectionError):
+    """Raised when a connection is borrowed from a pool after closeall()."""
+
+
+class ConnectionPool:
+    """
+    Hands out a bounded number of database connections to worker threads.
+
+    Connections are opened lazily up to max_size, health-checked when they
+    have sat idle for a while, and thrown away when they are found closed so
+    the next borrower transparently gets a fresh one.
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, wait_timeout=30.0,
+                 health_check_interval=30.0):
+        """
+        Opens min_size connections up front.
+
+        Args:
+            connect (callable): Zero-argument factory returning a new connection.
+            min_size (int): Number of connections opened immediately.
+            max_size (int): Upper bound on open connections.
+            wait_timeout (float): Seconds a borrower waits for a free connection.
+            health_check_interval (float): Idle seconds after which a connection
+                is pinged before being handed out again.
+        """
+        if max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size, max_size >= 1")
+        self._connect = connect
+        self.settings = {
+            "max_size": max_size,
+            "wait_timeout": wait_timeout,
+            "health_check_interval": health_check_interval,
+        }
+        self._condition = threading.Condition()
+        self._idle = []
+        self._size = 0
+        self.closed = False
+        self._stats = {
+            "borrows": 0,
+            "waits": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "timeouts": 0,
+            "discarded": 0,
+        }
+        for _ in range(min_size):
+            self._idle.append((connect(), time.monotonic()))
+            self._size += 1
+
+    def getconn(self):
+        """
+        Borrows a connection, waiting up to wait_timeout for one to free up.
+
+        Returns:
+            connection: A healthy database connection owned by the caller
+            until it is handed back with putconn().
+        Raises:
+            PoolTimeoutError: If no connection frees up in time.
+            PoolClosedError: If the pool has been closed.
+        """
+        started = time.monotonic()
+        deadline = started + self.settings["wait_timeout"]
+        waited = False
+        while True:
+            with self._condition:
+                if self.closed:
+                    raise PoolClosedError("Connection pool is closed")
+                while not self._idle and self._size >= self.settings["max_size"]:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeoutError(
+                            f"No database connection free after {self.settings['wait_timeout']}s"
+                        )
+                    waited = True
+                    self._condition.wait(remaining)
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                else:
+                    conn, last_used = None, None
+                    self._size += 1
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    self._release_slot()
+                    raise
+            elif not self._is_healthy(conn, last_used):
+                self._discard(conn)
+                continue
+
+            self._record_borrow(time.monotonic() - started if waited else None)
+            return conn
+
+    def putconn(self, conn, discard=False):
+        """
+        Returns a borrowed connection to the pool.
+
+        Args:
+            conn (connection): The connection previously returned by getconn().
+            discard (bool): Close the connection instead of keeping it. It
+                is closed anyway once the pool has been closed.
+        """
+        if not discard and not conn.closed:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                discard = True
+        if discard or conn.closed:
+            self._discard(conn)
+            return
+        with self._condition:
+            if not self.closed:
+                self._idle.append((conn, time.monotonic()))
+                self._condition.notify()
+                return
+        self._discard(conn)
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager that borrows a connection and always hands it back.
+        Connections left closed by an error are discarded rather than reused.
+        """
+        conn = self.getconn()
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            self.putconn(conn, discard=True)
+            raise
+        except BaseException:
+            self.putconn(conn)
+            raise
+        self.putconn(conn)
+
+    def closeall(self):
+        """
+        Closes the pool: idle connections are closed now, borrowed ones when
+        they are returned, and getconn() fails from then on.
+        """
+        with self._condition:
+            self.closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._condition.notify_all()
+        for conn, _ in idle:
+            _close_quietly(conn)
+
+    def stats(self):
+        """
+        Reports pool size and wait metrics.
+
+        Returns:
+            dict: Current size, idle and in-use counts plus cumulative counters.
+        """
+        with self._condition:
+            stats = dict(self._stats)
+            stats.update(
+                size=self._size,
+                idle=len(self._idle),
+                in_use=self._size - len(self._idle),
+                max_size=self.settings["max_size"],
+            )
+        return stats
+
+    def _is_healthy(self, conn, last_used):
+        """Checks a pooled connection, pinging it if it has been idle too long."""
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.settings["health_check_interval"]:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+
+    def _discard(self, conn):
+        """Closes a connection and frees its slot for a replacement."""
+        _close_quietly(conn)
+        with self._condition:
+            self._stats["discarded"] += 1
+        self._release_slot()
+
+    def _release_slot(self):
+        """Gives back one unit of pool capacity and wakes a waiter."""
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    def _record_borrow(self, wait_seconds):
+        """Updates borrow and wait counters."""
+        with self._condition:
+            self._stats["borrows"] += 1
+            if wait_seconds is not None:
+                self._stats["waits"] += 1
+                self._stats["wait_seconds_total"] += wait_seconds
+                self._stats["wait_seconds_max"] = max(
+                    self._stats["wait_seconds_max"], wait_seconds
+                )
+
+
+def _close_quietly(conn):
+    """Closes a connection, ignoring errors from already-broken sockets."""
+    try:
+        conn.close()
+    except psycopg2.Error:
+        pass
@@ -2,38 +2,404 @@
 Module for accessing and querying movie data from a PostgreSQL database.
 """
 
+import hashlib
 import html
+import re
+import threading
+import time
 import psycopg2
+import psycopg2.extensions
+from psycopg2 import errorcodes
 import ProductionCode.psql_config as config
+from ProductionCode.connection_pool import ConnectionPool
+from ProductionCode.media import Media, MediaSummary
+from ProductionCode.metrics import record_query, result_bytes
+from ProductionCode.query_cache import make_key
 
+MEDIA_COLUMNS = """
+    m.media_type, m.title, m.media_cast, m.release_year,
+    m.category, m.media_description, m.platform, m.id
+"""
+# The columns the list pages show, leaving out the long cast lists.
+SUMMARY_COLUMNS = "m.title, m.release_year, m.media_description, m.id"
 
-class DataSource:
-    """Handles database connection and queries for movie data."""
+# Select list for each record type.
+RECORD_COLUMNS = {Media: MEDIA_COLUMNS, MediaSummary: SUMMARY_COLUMNS}
+
+PLACEHOLDER = re.compile(r"%%|%s")
+
+# Errors PREPARE raises for a query that still runs as a plain execute:
+# a statement PREPARE does not accept, or a parameter whose type the
+# server cannot infer without the value. Other errors, such as a missing
+# table, fail the plain query too and are raised, so the query is
+# prepared again once they are fixed.
+UNPREPARABLE_ERRORS = (errorcodes.SYNTAX_ERROR, errorcodes.INDETERMINATE_DATATYPE,
+                       errorcodes.AMBIGUOUS_PARAMETER)
+
+# Rows fetched per round trip when streaming through a server-side cursor.
+STREAM_ITERSIZE = 2000
+
+# Least trigram similarity of a "did you mean" title suggestion; pg_trgm's
+# own similarity_threshold, also 0.3 by default, is a floor under it.
+SIMILARITY_THRESHOLD = 0.3
+
+CATALOG_ORDER = "m.release_year DESC, m.title, m.id"
+REVERSE_CATALOG_ORDER = "m.release_year, m.title DESC, m.id DESC"
+AFTER_KEY = "(m.release_year < %s OR (m.release_year = %s AND (m.title, m.id) > (%s, %s)))"
+BEFORE_KEY = "(m.release_year > %s OR (m.release_year = %s AND (m.title, m.id) < (%s, %s)))"
+
+ACTOR_MEDIA_IDS = """
+    SELECT ma.media_id FROM media_to_actors ma
+    JOIN actors a ON a.id = ma.actor_id
+    WHERE {condition}
+"""
+
+GENRE_MEDIA_IDS = """
+    SELECT mg.media_id FROM media_to_genres mg
+    JOIN genres g ON g.id = mg.genre_id
+    WHERE {condition}
+"""
+
+# Facets counted for a filter: genre, release decade, platform and media type.
+FACETS = ("genre", "decade", "platform", "media_type")
+
+# Counts every facet of the media matching a filter in one pass. Each
+# grouping set yields the rows of one facet, which GROUPING() identifies;
+# media are counted once per value even when the genre join repeats them.
+FACET_QUERY = """
+    SELECT CASE WHEN GROUPING(g.genre) = 0 THEN 'genre'
+                WHEN GROUPING(m.release_year / 10) = 0 THEN 'decade'
+                WHEN GROUPING(m.platform) = 0 THEN 'platform'
+                ELSE 'media_type' END,
+           COALESCE(g.genre, (m.release_year / 10 * 10)::text, m.platform, m.media_type),
+           count(DISTINCT m.id)
+    FROM media m
+    LEFT JOIN media_to_genres mg ON mg.media_id = m.id
+    LEFT JOIN genres g ON g.id = mg.genre_id
+    {where}
+    GROUP BY GROUPING SETS ((g.genre), (m.release_year / 10), (m.platform), (m.media_type))
+"""
+
+# How actor and genre filters are compared with names: "exact" matches a
+# whole name, "prefix" every name starting with the filter; both ignore case.
+MATCH_MODES = ("exact", "prefix")
+
+# Filters on columns of the media table itself, matched as whole values
+# ignoring case; media_platform_type_year_idx serves them together with a
+# release year filter.
+COLUMN_FILTERS = ("platform", "media_type")
+
+
+def prefix_bounds(prefix):
+    """
+    Returns the range of lower-cased names starting with a prefix.
+
+    Args:
+        prefix (str): A non-empty prefix.
+    Returns:
+        tuple: (low, high); a lower-cased name starts with the prefix when
+        low <= name < high, comparing code points.
+    """
+    low = prefix.lower()
+    return low, low[:-1] + chr(ord(low[-1]) + 1)
+
+
+def name_condition(column, name, match="exact"):
+    """
+    Builds the condition comparing a name column with a filter value.
+    Prefix matches are written as a range rather than LIKE so that the
+    text_pattern_ops index on lower(column) serves them even from a
+    prepared statement's generic plan.
+
+    Args:
+        column (str): The name column, e.g. a.actor.
+        name (str): The filter value.
+        match (str): One of MATCH_MODES.
+    Returns:
+        tuple: (condition, params).
+    """
+    if match == "prefix":
+        return (f"lower({column}) ~>=~ %s AND lower({column}) ~<~ %s",
+                list(prefix_bounds(name)))
+    if match != "exact":
+        raise ValueError(f"Unknown match mode: {match}")
+    return f"lower({column}) = lower(%s)", [name]
+
+
+def column_filters(options):
+    """
+    Takes the COLUMN_FILTERS out of a method's keyword arguments.
+
+    Args:
+        options (dict): Keyword arguments, e.g. filters mixed with paging
+            arguments; the filters are removed from it.
+    Returns:
+        dict: Column name -> filter value, for media_filters().
+    """
+    return {column: options.pop(column) for column in COLUMN_FILTERS if column in options}
+
+
+def media_filters(actor_name=None, release_year=None, category=None, match="exact",
+                  **columns):
+    """
+    Builds the conditions for a media list query.
+    A missing or empty filter is left out.
+
+    Args:
+        actor_name (str): Cast member name, ignoring case.
+        release_year (int): Keep media released after this year.
+        category (str): Genre name, ignoring case.
+        match (str): "exact" to match whole actor and genre names, or
+            "prefix" to match names starting with the given ones.
+        **columns: Optional platform (e.g. "Hulu") and media_type ("Movie"
+            or "TV Show"), each matched as a whole value ignoring case.
+    Returns:
+        tuple: (conditions, params) for get_media_page() or stream_media().
+    Raises:
+        TypeError: If columns names a column not in COLUMN_FILTERS.
+    """
+    conditions = []
+    params = []
+    unknown = set(columns) - set(COLUMN_FILTERS)
+    if unknown:
+        raise TypeError(f"Unknown filters: {', '.join(sorted(unknown))}")
+    for column in COLUMN_FILTERS:
+        if columns.get(column):
+            conditions.append(f"lower(m.{column}) = lower(%s)")
+            params.append(columns[column])
+    if release_year is not None:
+        conditions.append("m.release_year > %s")
+        params.append(release_year)
+    for name, column, subquery in ((actor_name, "a.actor", ACTOR_MEDIA_IDS),
+                                   (category, "g.genre", GENRE_MEDIA_IDS)):
+        if name:
+            condition, name_params = name_condition(column, name, match)
+            conditions.append(f"m.id IN ({subquery.format(condition=condition)})")
+            params.extend(name_params)
+    return conditions, params
+
+
+def facet_lists(counts):
+    """
+    Orders facet counts for display.
+
+    Args:
+        counts (iterable): (facet, value, count) triples; None values,
+            e.g. media without a genre, are left out.
+    Returns:
+        dict: Facet name in FACETS -> list of (value, count), largest count
+        first, then by value. Decades are ints, other values strings.
+    """
+    facets = {facet: [] for facet in FACETS}
+    for facet, value, count in counts:
+        if value is not None:
+            facets[facet].append((int(value) if facet == "decade" else value, count))
+    for values in facets.values():
+        values.sort(key=lambda item: (-item[1], item[0]))
+    return facets
+
+
+def media_list_query(conditions, order=CATALOG_ORDER, columns=MEDIA_COLUMNS):
+    """
+    Builds a media list query from the conditions of media_filters().
+
+    Args:
+        conditions (list): SQL conditions on the media table aliased as m.
+        order (str): ORDER BY clause.
+        columns (str): Select list, MEDIA_COLUMNS or SUMMARY_COLUMNS.
+    Returns:
+        str: The query, without a LIMIT.
+    """
+    query = f"SELECT {columns} FROM media m"
+    if conditions:
+        query += f" WHERE {' AND '.join(conditions)}"
+    return query + f" ORDER BY {order}"
+
+
+def prepared_form(query):
+    """
+    Rewrites a query for PREPARE: psycopg2's %s placeholders become $1, $2...
+
+    Args:
+        query (str): SQL with %s placeholders (and %% for a literal %).
+    Returns:
+        tuple: (statement name, SQL for PREPARE, number of parameters).
+    """
+    count = 0
+
+    def number(match):
+        nonlocal count
+        if match.group() == "%%":
+            return "%"
+        count += 1
+        return f"${count}"
+
+    sql = PLACEHOLDER.sub(number, query)
+    name = "streamsearch_" + hashlib.sha1(query.encode("utf-8")).hexdigest()[:16]
+    return name, sql, count
+
+
+class PreparingConnection(psycopg2.extensions.connection):
+    """A psycopg2 connection that remembers which statements it has prepared."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared_statements = set()
+
+
+class Database:
+    """
+    Runs SQL on a pool of connections, with optional result caching,
+    one retry on dropped connections, latency metrics, and server-side
+    prepared statements.
+    """
+
+    def __init__(self, min_connections=1, max_connections=10, wait_timeout=30.0,
+                 query_cache=None):
+        """
+        Constructor without immediate connection to the database.
+
+        Args:
+            min_connections (int): Connections opened when the pool is created.
+            max_connections (int): Upper bound on concurrently open connections.
+            wait_timeout (float): Seconds a query waits for a free connection.
+            query_cache (QueryCache): Cache for execute_query results, or None
+                to always query the database.
+        """
+        self.pool = None
+        self.pool_settings = {
+            "min_size": min_connections,
+            "max_size": max_connections,
+            "wait_timeout": wait_timeout,
+        }
+        self._lock = threading.Lock()
+        self.query_cache = query_cache
+        self.statement_stats = {
+            "prepares": 0,
+            "executions": 0,
+            "plan_reuses": 0,
+            "reprepares": 0,
+            "unprepared": 0,
+        }
+        self._unpreparable = set()
+
+    @staticmethod
+    def open_connection():
+        """
+        Opens a single connection using credentials from psqlConfig.py.
 
-    def __init__(self):
-        """Constructor without immediate connection to the database."""
-        self.connection = None
+        Returns:
+            connection: A new psycopg2 connection.
+        """
+        try:
+            return psycopg2.connect(
+                database=config.DATABASE,
+                user=config.USER,
+                password=config.PASSWORD,
+                host="localhost",
+                connection_factory=PreparingConnection
+            )
+        except psycopg2.DatabaseError as e:
+            raise ConnectionError(f"Connection error: {e}") from e
 
     def connect(self):
         """
-        Initiates connection to database using credentials from psqlConfig.py.
-        This method needs to be explicitly called to establish a connection.
+        Creates the connection pool shared by every query on this DataSource.
+        This method is called lazily by execute_query, but may be called
+        explicitly to fail fast on bad credentials.
+
+        Returns:
+            ConnectionPool: The pool queries borrow connections from.
         """
-        if self.connection is None:
-            try:
-                self.connection = psycopg2.connect(
-                    database=config.DATABASE,
-                    user=config.USER,
-                    password=config.PASSWORD,
-                    host="localhost"
-                )
-            except psycopg2.DatabaseError as e:
-                raise ConnectionError(f"Connection error: {e}") from e
-        return self.connection
+        if self.pool is None:
+            with self._lock:
+                if self.pool is None:
+                    self.pool = ConnectionPool(self.open_connection, **self.pool_settings)
+        return self.pool
+
+    def close(self):
+        """
+        Closes all pooled connections. The next query opens a new pool.
+        """
+        with self._lock:
+            pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.closeall()
+
+    def pool_stats(self):
+        """
+        Reports connection pool size and wait metrics.
+
+        Returns:
+            dict: Pool statistics, or an empty dict before the pool exists.
+        """
+        return self.pool.stats() if self.pool is not None else {}
+
+    def cache_stats(self):
+        """
+        Reports query cache hit, miss and eviction counters.
+
+        Returns:
+            dict: Cache statistics, or an empty dict when caching is off.
+        """
+        return self.query_cache.stats() if self.query_cache is not None else {}
+
+    def prepared_stats(self):
+        """
+        Reports how often prepared statement plans were reused.
+
+        Returns:
+            dict: Counts of PREPAREs, EXECUTEs, EXECUTEs of an already
+            prepared plan, re-PREPAREs after a connection lost its plans,
+            and queries run unprepared.
+        """
+        with self._lock:
+            return dict(self.statement_stats)
+
+    def get_data_version(self):
+        """
+        Returns the version of the data, used to invalidate the query cache.
+        Overridden by DataSource to read the loader's catalog version.
+
+        Returns:
+            int: The version, or None if it is unknown.
+        """
+        return None
 
     def execute_query(self, query, params=None):
         """
         Helper method to execute queries and fetch results safely.
+        If a query cache is set, a fresh cached result for the same query
+        and params is returned without touching the database. The cache is
+        emptied when the loader stamps a new catalog version.
+
+        Args:
+            query (str): SQL query to execute.
+            params (tuple): Parameters for query placeholders.
+
+        Returns:
+            list or tuple or None: Query result(s) or None on error.
+        """
+        cache = self.query_cache
+        if cache is None:
+            return self._run_query(query, params)
+        if cache.version_check_due():
+            cache.set_version(self.get_data_version())
+        key = make_key(query, params)
+        results = cache.get(key)
+        if results is None:
+            results = self._run_query(query, params)
+            if results is not None:
+                cache.put(key, results)
+        return results
+
+    def _run_query(self, query, params=None):
+        """
+        Helper method to execute queries against the database, bypassing
+        any query cache. Each call borrows a pooled connection for the
+        duration of the query. A query that fails because its connection
+        dropped is retried once on a fresh connection. Its latency, row
+        count and size are recorded in the metrics registry.
 
         Args:
             query (str): SQL query to execute.
@@ -42,101 +408,363 @@ class DataSource:
         Returns:
             list or tuple or None: Query result(s) or None on error.
         """
-        if self.connection is None:
-            self.connect()
+        pool = self.connect()
+        started = time.perf_counter()
+        results = None
+        for attempt in range(2):
+            try:
+                with pool.connection() as conn:
+                    cursor = conn.cursor()
+                    self._execute(conn, cursor, query, params)
+                    results = cursor.fetchall()
+                break
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                if attempt:
+                    print(f"Query failed: {e}")
+            except psycopg2.DatabaseError as e:
+                print(f"Query failed: {e}")
+                break
+        record_query(query, time.perf_counter() - started, results)
+        return results
+
+    def _execute(self, conn, cursor, query, params):
+        """
+        Runs a query as a prepared statement, preparing it on first use on
+        each connection so later runs skip parsing and planning.
+
+        Falls back to re-preparing when the server no longer has the plan
+        (e.g. the session was reset), and to a plain execute for queries
+        the server cannot prepare (see UNPREPARABLE_ERRORS) or connections
+        that do not track plans.
+        """
+        name, sql, count = prepared_form(query)
+        if not isinstance(conn, PreparingConnection) or name in self._unpreparable:
+            self._count("unprepared")
+            cursor.execute(query, params)
+            return
+
+        execute = f"EXECUTE {name}" + (f" ({', '.join(['%s'] * count)})" if count else "")
+        if name in conn.prepared_statements:
+            try:
+                cursor.execute(execute, params)
+                self._count("executions", "plan_reuses")
+                return
+            except psycopg2.DatabaseError as e:
+                if e.pgcode != errorcodes.INVALID_SQL_STATEMENT_NAME:
+                    raise
+                conn.rollback()
+                conn.prepared_statements.clear()
+                self._count("reprepares")
 
         try:
-            cursor = self.connection.cursor()
+            cursor.execute(f"PREPARE {name} AS {sql}")
+        except psycopg2.ProgrammingError as e:
+            conn.rollback()
+            if e.pgcode not in UNPREPARABLE_ERRORS:
+                raise
+            with self._lock:
+                self._unpreparable.add(name)
+            self._count("unprepared")
             cursor.execute(query, params)
-            return cursor.fetchall()
+            return
+        conn.prepared_statements.add(name)
+        cursor.execute(execute, params)
+        self._count("prepares", "executions")
+
+    def _count(self, *names):
+        """Increments prepared statement counters."""
+        with self._lock:
+            for name in names:
+                self.statement_stats[name] += 1
+
+    def stream_query(self, query, params=None, itersize=STREAM_ITERSIZE):
+        """
+        Helper method that yields a query's rows as the server sends them.
+        Rows are read through a server-side cursor itersize rows at a time,
+        so memory use stays flat however many rows the query returns. The
+        pooled connection is held until the generator is exhausted or closed.
+
+        Args:
+            query (str): SQL query to execute.
+            params (tuple): Parameters for query placeholders.
+            itersize (int): Rows fetched per round trip.
+
+        Yields:
+            tuple: Each result row. Stops early, after printing the error,
+            if the query fails.
+
+        The query is recorded like the others (see record_query()), timed
+        from execute until the generator is exhausted or closed, so a
+        failed stream also marks the request as failed.
+        """
+        pool = self.connect()
+        conn = pool.getconn()
+        discard = failed = False
+        count = size = 0
+        started = time.perf_counter()
+        try:
+            with conn.cursor(name="streamsearch_stream") as cursor:
+                cursor.itersize = itersize
+                cursor.execute(query, params)
+                for row in cursor:
+                    count += 1
+                    size += result_bytes((row,))
+                    yield row
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            discard = failed = True
+            print(f"Query failed: {e}")
         except psycopg2.DatabaseError as e:
+            failed = True
             print(f"Query failed: {e}")
+        finally:
+            pool.putconn(conn, discard=discard)
+            record_query(query, time.perf_counter() - started, None if failed else [],
+                         fetched=(count, size))
+
+
+class DataSource(Database):
+    """Handles database connection and queries for movie data."""
+
+    def __init__(self, min_connections=1, max_connections=10, wait_timeout=30.0,
+                 cache_vocabularies=False, query_cache=None):
+        """
+        Constructor without immediate connection to the database.
+
+        Args:
+            min_connections (int): Connections opened when the pool is created.
+            max_connections (int): Upper bound on concurrently open connections.
+            wait_timeout (float): Seconds a query waits for a free connection.
+            cache_vocabularies (bool): Keep the category and actor lists in
+                memory until the loader stamps a new catalog version.
+            query_cache (QueryCache): Cache for execute_query results, or None
+                to always query the database.
+        """
+        super().__init__(min_connections, max_connections, wait_timeout, query_cache)
+        self.vocabulary_cache = {} if cache_vocabularies else None
+
+    def get_media_page(self, conditions, params, record=Media, **paging):
+        """
+        Helper method that lists media matching every condition, newest first
+        and then by title, optionally one keyset page at a time.
+
+        Args:
+            conditions (list): SQL conditions on the media table aliased as m.
+            params (list): Parameters for the conditions' placeholders.
+            record (type): Media, or MediaSummary to fetch fewer columns.
+            **paging: Optional keyword arguments:
+                limit (int): Maximum number of rows, or None for all of them.
+                after (tuple): (release_year, title, id) of the row just
+                    before the wanted rows.
+                before (tuple): (release_year, title, id) of the row just
+                    after the wanted rows; ignored when after is given.
+        Returns:
+            list: Records of the given type, or None if an error occurs.
+        """
+        conditions = list(conditions)
+        params = list(params)
+        limit, after, before = (paging.get(name) for name in ("limit", "after", "before"))
+        key = after or before
+        backwards = bool(before) and not after
+        if key:
+            conditions.append(BEFORE_KEY if backwards else AFTER_KEY)
+            params.extend((key[0], key[0], key[1], key[2]))
+
+        query = media_list_query(conditions,
+                                 REVERSE_CATALOG_ORDER if backwards else CATALOG_ORDER,
+                                 RECORD_COLUMNS[record])
+        if limit is not None:
+            query += " LIMIT %s"
+            params.append(limit)
+
+        results = self.execute_query(query, tuple(params))
+        if results is None:
             return None
+        if backwards:
+            results = results[::-1]
+        return record.from_rows(results)
 
-    def get_media_later_than(self, release_year):
+    def get_media_later_than(self, release_year, limit=None, after=None, before=None):
         """        
         Retrieves all movies released after a specified year.
 
         Args:
             release_year (int): The year to filter movies by.   
+            limit, after, before: Paging arguments, see get_media_page().
         Returns:
-            list: A list of tuples containing movie data, or None if an error occurs.
+            list: Media records, or None if an error occurs.
         """
-        query = """
-            SELECT * FROM stream_data 
-            WHERE release_year > %s 
-            ORDER BY release_year DESC
-        """
-        return self.execute_query(query, (release_year,))
+        conditions, params = media_filters(release_year=release_year)
+        return self.get_media_page(conditions, params, limit=limit, after=after, before=before)
 
-    def get_media_by_actor(self, actor_name):
+    def get_media_by_actor(self, actor_name, limit=None, after=None, before=None,
+                           match="exact"):
         """
         Retrieves movie titles and descriptions for a specific actor.
+        The name must match a whole cast member, ignoring case, or with
+        match="prefix" the start of one.
         Args:
             actor_name (str): The name of the actor to filter movies by.
+            limit, after, before: Paging arguments, see get_media_page().
+            match (str): "exact" or "prefix", see media_filters().
         Returns:
-            list: A list of tuples containing movie titles and descriptions, 
-            or None if an error occurs.
-        """
-        query = """
-            SELECT * FROM stream_data 
-            WHERE media_cast ILIKE %s
+            list: Media records, or None if an error occurs.
         """
-        return self.execute_query(query, (f"%{actor_name}%",))
+        conditions, params = media_filters(actor_name=actor_name, match=match)
+        return self.get_media_page(conditions, params, limit=limit, after=after, before=before)
 
-    def get_media_by_category(self, category):
+    def get_media_by_category(self, category, limit=None, after=None, before=None,
+                              match="exact"):
         """
         Retrieves movies in a specific category or genre.
+        The category must match a whole genre, ignoring case, or with
+        match="prefix" the start of one.
         Args:
             category (str): The genre or category to filter movies by.
+            limit, after, before: Paging arguments, see get_media_page().
+            match (str): "exact" or "prefix", see media_filters().
         Returns:
-            list: A list of tuples containing movie data, or None if an error occurs.
+            list: Media records, or None if an error occurs.
         """
-        query = """
-            SELECT * FROM stream_data 
-            WHERE category ILIKE %s 
-            ORDER BY release_year DESC
-        """
-        return self.execute_query(query, (f"%{category}%",))
+        conditions, params = media_filters(category=category, match=match)
+        return self.get_media_page(conditions, params, limit=limit, after=after, before=before)
 
-    def get_all_categories(self):
+    def get_data_version(self):
         """
-        Retrieves all unique categories from the database.
+        Retrieves the version stamp the loader wrote for the current catalog.
         Returns:
-            list: A sorted list of unique categories, or an empty list if none found.
+            int: The catalog version, or None if it cannot be read.
         """
         query = """
-            SELECT category FROM stream_data WHERE category IS NOT NULL
+            SELECT version FROM catalog_version
+            ORDER BY loaded_at DESC LIMIT 1
+        """
+        result = self._run_query(query)
+        return result[0][0] if result else None
+
+    def get_vocabulary(self, query):
+        """
+        Helper method that runs a single-column list query, reusing the
+        cached list while the catalog version is unchanged if caching is on.
+        Args:
+            query (str): SQL query returning one name per row.
+        Returns:
+            list: The names in query order, or an empty list on error.
         """
+        version = None
+        if self.vocabulary_cache is not None:
+            version = self.get_data_version()
+            cached = self.vocabulary_cache.get(query)
+            if version is not None and cached and cached[0] == version:
+                return cached[1]
+
         results = self.execute_query(query)
         if results is None:
             return []
+        names = [row[0] for row in results]
+        if version is not None:
+            self.vocabulary_cache[query] = (version, names)
+        return names
 
-        genre_set = set()
-        for row in results:
-            genres = [genre.strip() for genre in row[0].split(",")]
-            genre_set.update(genres)
-
-        return sorted(genre_set)
+    def get_all_categories(self):
+        """
+        Retrieves all unique categories from the genre list built by the loader.
+        Returns:
+            list: A sorted list of unique categories, or an empty list if none found.
+        """
+        query = """
+            SELECT genre FROM genres ORDER BY genre
+        """
+        return self.get_vocabulary(query)
 
-    def get_media_by_advanced_filter(self, actor_name, release_year, category):
+    def get_media_by_advanced_filter(self, actor_name, release_year, category, match="exact",
+                                     **options):
         """
-        Retrieves media based on actor name, category, and release year.
+        Retrieves media based on actor name, category, and release year,
+        and optionally platform and media type.
+        An empty actor name, category, platform or media type leaves that filter out.
         Args:
             actor_name (str): The name of the actor to filter by.
             release_year (int): The year to filter movies released after.
             category (str): The genre or category to filter movies by.
+            match (str): "exact" or "prefix", see media_filters().
+            **options: Optional platform and media_type, see media_filters(),
+                and limit, after and before, see get_media_page().
         Returns:
-            list: A list of tuples containing media data, or None if an error occurs.
+            list: Media records, or None if an error occurs.
         """
-        query = """
-            SELECT * FROM stream_data 
-            WHERE media_cast ILIKE %s 
-            AND category ILIKE %s 
-            AND release_year > %s 
-            ORDER BY release_year DESC
+        conditions, params = media_filters(actor_name, release_year, category, match,
+                                           **column_filters(options))
+        return self.get_media_page(conditions, params, **options)
+
+    def get_facet_counts(self, actor_name=None, release_year=None, category=None,
+                         match="exact", **columns):
+        """
+        Counts the media matching a filter by genre, release decade,
+        platform and media type, in one query using GROUPING SETS, so the
+        filter page can show how many results each narrower search has.
+        A missing or empty filter is left out.
+        Args:
+            actor_name (str): The name of the actor to filter by.
+            release_year (int): The year to filter media released after.
+            category (str): The genre or category to filter by.
+            match (str): "exact" or "prefix", see media_filters().
+            **columns: Optional platform and media_type, see media_filters().
+        Returns:
+            dict: Facet name -> list of (value, count), see facet_lists(),
+            or None if an error occurs.
+        """
+        conditions, params = media_filters(actor_name, release_year, category, match, **columns)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        results = self.execute_query(FACET_QUERY.format(where=where), tuple(params))
+        return facet_lists(results) if results is not None else None
+
+    def get_media_summaries(self, actor_name=None, release_year=None, category=None,
+                            match="exact", **options):
+        """
+        Lists media like get_media_by_advanced_filter(), but fetches only the
+        title, release year, description and id of each entry, which is all
+        the list pages show. Leaving out the cast lists and other columns
+        cuts the bytes sent by the database and the memory each row takes.
+        A missing or empty filter is left out.
+        Args:
+            actor_name (str): The name of the actor to filter by.
+            release_year (int): The year to filter media released after.
+            category (str): The genre or category to filter by.
+            match (str): "exact" or "prefix", see media_filters().
+            **options: Optional platform and media_type, see media_filters(),
+                and limit, after and before, see get_media_page().
+        Returns:
+            list: MediaSummary records, or None if an error occurs.
+        """
+        conditions, params = media_filters(actor_name, release_year, category, match,
+                                           **column_filters(options))
+        return self.get_media_page(conditions, params, MediaSummary, **options)
+
+    def stream_media(self, actor_name=None, release_year=None, category=None,
+                     itersize=STREAM_ITERSIZE, **options):
+        """
+        Streams every media entry matching the given filters in catalog order,
+        without holding the whole result in memory. A missing filter is left out.
+        Args:
+            actor_name (str): The name of the actor to filter by.
+            release_year (int): The year to filter media released after.
+            category (str): The genre or category to filter by.
+            itersize (int): Rows fetched from the server per round trip.
+            **options: Optional keyword arguments:
+                record (type): Media (the default), or MediaSummary to
+                    fetch only the summary columns.
+                match (str): "exact" (the default) or "prefix", see media_filters().
+                platform, media_type (str): Column filters, see media_filters().
+        Yields:
+            Media: Each matching entry as it arrives, as a record of the given type.
         """
-        return self.execute_query(query, (f"%{actor_name}%", f"%{category}%", release_year))
+        record = options.get("record", Media)
+        conditions, params = media_filters(actor_name, release_year, category,
+                                           options.get("match", "exact"),
+                                           **column_filters(options))
+        query = media_list_query(conditions, columns=RECORD_COLUMNS[record])
+        for row in self.stream_query(query, tuple(params), itersize):
+            yield record(*row)
 
     def get_all_media_titles(self):
         """
@@ -145,7 +773,7 @@ class DataSource:
             list: A list of movie titles, or an empty list if none found.
         """
         query = """
-            SELECT title, release_year FROM stream_data
+            SELECT title, release_year FROM media
             ORDER BY release_year DESC
         """
         results = self.execute_query(query)
@@ -157,35 +785,71 @@ class DataSource:
 
     def get_all_actors(self):
         """
-        Retrieves all unique actors from the database.
+        Retrieves all unique actors from the actor list built by the loader.
         Returns:
             list: A sorted list of unique actor names, or an empty list if none found.
         """
         query = """
-            SELECT media_cast FROM stream_data WHERE media_cast IS NOT NULL
+            SELECT actor FROM actors ORDER BY actor
         """
-        results = self.execute_query(query)
-        if results is None:
-            return []
-
-        actor_set = set()
-        for row in results:
-            if row[0]:
-                actors = [actor.strip() for actor in row[0].split(',')]
-                actor_set.update(actors)
+        return self.get_vocabulary(query)
 
-        return sorted(actor_set)
+    def search_text(self, query, limit=20, offset=0):
+        """
+        Retrieves media whose title or description matches a keyword search,
+        best matches first. Title matches outrank description matches.
+        Args:
+            query (str): Search words; quoted phrases, "or" and -word are allowed.
+            limit (int): Maximum number of results.
+            offset (int): Number of best matches to skip, for paging.
+        Returns:
+            list: Media records, or None if an error occurs.
+        """
+        sql = f"""
+            SELECT {MEDIA_COLUMNS}
+            FROM media m, websearch_to_tsquery('english', %s) q
+            WHERE m.search_vector @@ q
+            ORDER BY ts_rank(m.search_vector, q) DESC, m.release_year DESC, m.id
+            LIMIT %s OFFSET %s
+        """
+        results = self.execute_query(sql, (query, limit, offset))
+        return None if results is None else Media.from_rows(results)
 
     def get_media_from_title(self, title):
         """
-        Retrieves media data based on the title.
+        Retrieves media data based on the title, ignoring case.
         Args:
             title (str): The title of the media to search for.
         Returns:
-            tuple: A tuple containing media data if found, or None if not found.
+            Media: The media entry if found, or None if not found.
         """
-        query = """
-            SELECT * FROM stream_data WHERE title ILIKE %s
+        query = f"""
+            SELECT {MEDIA_COLUMNS} FROM media m
+            WHERE lower(m.title) = lower(%s)
+            ORDER BY m.id LIMIT 1
         """
         result = self.execute_query(query, (title,))
-        return result[0] if result else None
+        return Media(*result[0]) if result else None
+
+    def get_similar_titles(self, title, limit=5, threshold=SIMILARITY_THRESHOLD):
+        """
+        Retrieves the media whose titles are most like the given one, for
+        suggesting titles when a lookup finds nothing, e.g. after a typo.
+        Titles are compared by pg_trgm trigram similarity, and the trigram
+        index on media.title finds the closest ones without a scan.
+        Args:
+            title (str): The title that was looked up.
+            limit (int): Maximum number of suggestions.
+            threshold (float): Least similarity, from 0 to 1, of a suggestion.
+        Returns:
+            list: MediaSummary records, most similar first, or None if an
+            error occurs.
+        """
+        query = f"""
+            SELECT {SUMMARY_COLUMNS} FROM media m
+            WHERE m.title %% %s AND similarity(m.title, %s) >= %s
+            ORDER BY m.title <-> %s, m.id
+            LIMIT %s
+        """
+        results = self.execute_query(query, (title, title, threshold, title, limit))
+        return MediaSummary.from_rows(results) if results is not None else None
@@ -0,0 +1,113 @@
+"""
+Module providing a cache of rendered template fragments.
+
+Parts of a page that depend only on the catalog, such as the category
+dropdown, are rendered once per catalog version and reused until the next
+reload. Templates wrap such a part in a call block:
+
+    {% call cache_fragment("category_options", categories) %} ... {% endcall %}
+
+Fragments are kept in memory only, with no spill to disk: only the latest
+catalog version of each fragment is kept, so the cache holds one entry per
+fragment name, and at most max_entries (32 by default) of those, least
+recently used first out. A fragment's size grows with its data, not with
+the number of entries; the category dropdown, one option per genre, is a
+few kilobytes for the catalog's ~120 genres.
+"""
+
+import threading
+from collections import OrderedDict
+from markupsafe import Markup
+
+
+class FragmentCache:
+    """Keeps rendered fragments keyed by fragment name and catalog version."""
+
+    def __init__(self, max_entries=32):
+        """
+        Creates an empty cache.
+
+        Args:
+            max_entries (int): Most fragments kept.
+        """
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def render(self, name, version, caller):
+        """
+        Returns a fragment's cached output, rendering it on a miss.
+
+        Args:
+            name (str): Fragment name, unique across templates.
+            version (int): The catalog version the fragment was built from,
+                or None to render without caching.
+            caller (callable): Renders the fragment, e.g. a Jinja call
+                block's caller.
+        Returns:
+            Markup: The rendered fragment.
+        """
+        if version is None:
+            return caller()
+        html = self.get(name, version)
+        if html is None:
+            html = str(caller())
+            self.put(name, version, html)
+        return Markup(html)
+
+    def get(self, name, version):
+        """
+        Looks up a fragment.
+
+        Args:
+            name (str): Fragment name.
+            version (int): Catalog version.
+        Returns:
+            str: The rendered fragment, or None on a miss.
+        """
+        key = (name, version)
+        with self._lock:
+            html = self._entries.get(key)
+            if html is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return html
+
+    def put(self, name, version, html):
+        """
+        Stores a fragment, dropping the same fragment's older versions and
+        the least recently used fragments beyond max_entries.
+
+        Args:
+            name (str): Fragment name.
+            version (int): Catalog version.
+            html (str): The rendered fragment.
+        """
+        with self._lock:
+            for stale in [key for key in self._entries if key[0] == name and key[1] != version]:
+                del self._entries[stale]
+            self._entries[(name, version)] = html
+            self._entries.move_to_end((name, version))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drops every fragment."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Reports cache size and effectiveness.
+
+        Returns:
+            dict: Hit and miss counters, plus the number of fragments kept
+            and the bound.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(entries=len(self._entries), max_entries=self.max_entries)
+        return stats
@@ -0,0 +1,84 @@
+"""
+Module for HTTP caching of pages that only change when the catalog is reloaded.
+
+The loader stamps every reload with a catalog version (microseconds since
+the epoch). A page's ETag is derived from its route, its arguments and that
+version, so it changes exactly when the page's data can have changed, and
+its Last-Modified time is the moment the catalog was loaded.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timezone
+
+
+def make_etag(endpoint, view_args, query_args, version):
+    """
+    Builds a strong entity tag for a page.
+
+    Args:
+        endpoint (str): The Flask endpoint name.
+        view_args (dict): Arguments taken from the URL path.
+        query_args (list): (name, value) pairs from the query string.
+        version (int): The catalog version.
+    Returns:
+        str: The tag, without quotes.
+    """
+    key = json.dumps([endpoint, sorted((view_args or {}).items()), sorted(query_args), version],
+                     ensure_ascii=False, default=str, separators=(",", ":"))
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+
+def version_time(version):
+    """
+    Converts a catalog version to the time the catalog was loaded.
+
+    Args:
+        version (int): Microseconds since the epoch, as stamped by the loader.
+    Returns:
+        datetime: The load time in UTC, truncated to whole seconds as
+        HTTP dates are.
+    """
+    return datetime.fromtimestamp(int(version) // 1_000_000, tz=timezone.utc)
+
+
+class DataVersion:
+    """
+    Reads a data source's catalog version, at most once per interval, so
+    checking a request's cache validators costs no query most of the time.
+    """
+
+    def __init__(self, datasource, interval=5.0):
+        """
+        Args:
+            datasource: A DataSource or MemoryDataSource.
+            interval (float): Seconds a version read is reused for.
+        """
+        self.datasource = datasource
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._version = None
+        self._next_check = 0.0
+
+    def get(self):
+        """
+        Returns the current catalog version.
+
+        Returns:
+            int: The version, or None if it could not be read.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_check:
+                return self._version
+            self._next_check = now + self.interval
+        try:
+            version = self.datasource.get_data_version()
+        except ConnectionError as e:
+            print("Could not read the catalog version:", e)
+            version = None
+        with self._lock:
+            self._version = version
+        return version
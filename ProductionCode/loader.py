@@ -0,0 +1,292 @@
+"""
+Module for building the StreamSearch database from the platform CSV files.
+
+Streams the Netflix, Amazon Prime, Disney+ and Hulu CSVs into the schema in
+Data/createtable.sql using COPY, adds the keys and indexes in
+Data/createindexes.sql, and swaps the new tables in for the old ones in a
+single transaction, so the site keeps serving the old data until the new
+data is complete. Run from the project root with:
+
+    python -m ProductionCode.loader
+"""
+
+import csv
+import io
+import os
+import time
+from ProductionCode.datasource import DataSource
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Data")
+SCHEMA_FILE = os.path.join(DATA_DIR, "createtable.sql")
+INDEX_FILE = os.path.join(DATA_DIR, "createindexes.sql")
+
+PLATFORM_FILES = {
+    "Amazon Prime": os.path.join(DATA_DIR, "amazon_prime_titles.csv"),
+    "Disney+": os.path.join(DATA_DIR, "disney_plus_titles.csv"),
+    "Hulu": os.path.join(DATA_DIR, "hulu_titles.csv"),
+    "Netflix": os.path.join(DATA_DIR, "netflix_titles.csv"),
+}
+
+TABLE_COLUMNS = {
+    "media": ("id", "media_type", "title", "media_cast", "release_year",
+              "category", "media_description", "platform"),
+    "actors": ("id", "actor"),
+    "genres": ("id", "genre"),
+    "directors": ("id", "director"),
+    "media_to_actors": ("media_id", "actor_id"),
+    "media_to_genres": ("media_id", "genre_id"),
+    "media_to_directors": ("media_id", "director_id"),
+    "catalog_version": ("version", "loaded_at"),
+}
+
+# Link table, vocabulary table, and position of the names in a platform row.
+LINKS = (
+    ("media_to_actors", "actors", 2),
+    ("media_to_genres", "genres", 4),
+    ("media_to_directors", "directors", 7),
+)
+
+# Tables from earlier schemas that a reload removes.
+LEGACY_TABLES = ("stream_data",)
+
+LOAD_SCHEMA = "streamsearch_load"
+BATCH_SIZE = 5000
+
+
+def split_names(field):
+    """
+    Splits a comma-separated CSV field into trimmed, non-empty names.
+
+    Args:
+        field (str): e.g. "Brendan Gleeson, Taylor Kitsch".
+    Returns:
+        list: e.g. ["Brendan Gleeson", "Taylor Kitsch"].
+    """
+    return [name.strip() for name in (field or "").split(",") if name.strip()]
+
+
+def read_platform_rows(platform_files=None):
+    """
+    Reads every platform CSV and maps its columns onto the media table.
+
+    Args:
+        platform_files (dict): Platform name -> CSV path. Defaults to the
+            four CSVs in Data/.
+    Yields:
+        tuple: (media_type, title, media_cast, release_year, category,
+        media_description, platform, director) for each CSV row.
+    """
+    for platform, path in (platform_files or PLATFORM_FILES).items():
+        with open(path, newline="", encoding="utf-8") as csv_file:
+            for row in csv.DictReader(csv_file):
+                yield (
+                    row["type"] or None,
+                    row["title"],
+                    row["cast"] or None,
+                    int(row["release_year"]) if row["release_year"] else None,
+                    row["listed_in"] or None,
+                    row["description"] or None,
+                    platform,
+                    row["director"] or None,
+                )
+
+
+class Vocabulary:
+    """Assigns stable ids to names, treating names differing only in case as one."""
+
+    def __init__(self):
+        self.ids = {}
+        self.rows = []
+
+    def id_for(self, name):
+        """
+        Returns the id for a name, adding the name if it is new.
+
+        Args:
+            name (str): The name to look up.
+        Returns:
+            int: The name's id.
+        """
+        key = name.lower()
+        if key not in self.ids:
+            self.ids[key] = len(self.rows)
+            self.rows.append((len(self.rows), name))
+        return self.ids[key]
+
+
+class CatalogBuilder:
+    """
+    Splits platform rows into the normalized tables while they stream past.
+
+    Media rows are yielded one at a time so they can be copied as they are
+    read; names and link rows are collected for copying afterwards.
+    """
+
+    def __init__(self):
+        self.vocabularies = {vocabulary: Vocabulary() for _, vocabulary, _ in LINKS}
+        self.links = {table: [] for table, _, _ in LINKS}
+
+    def media_rows(self, platform_rows):
+        """
+        Numbers platform rows and records the names each one links to.
+
+        Args:
+            platform_rows (iterable): Rows as yielded by read_platform_rows().
+        Yields:
+            tuple: A media row in TABLE_COLUMNS["media"] order.
+        """
+        for media_id, row in enumerate(platform_rows):
+            for table, vocabulary, column in LINKS:
+                ids = dict.fromkeys(self.vocabularies[vocabulary].id_for(name)
+                                    for name in split_names(row[column]))
+                self.links[table].extend((media_id, name_id) for name_id in ids)
+            yield (media_id,) + row[:7]
+
+    def other_tables(self):
+        """
+        Returns the vocabulary and link tables; call after media_rows() is exhausted.
+
+        Returns:
+            dict: Table name -> list of row tuples.
+        """
+        tables = {name: vocabulary.rows for name, vocabulary in self.vocabularies.items()}
+        tables.update(self.links)
+        return tables
+
+
+def build_catalog(platform_rows):
+    """
+    Splits raw platform rows into the normalized tables in memory.
+
+    Args:
+        platform_rows (iterable): Rows as yielded by read_platform_rows().
+    Returns:
+        dict: Table name -> list of row tuples, in TABLE_COLUMNS order.
+    """
+    builder = CatalogBuilder()
+    catalog = {"media": list(builder.media_rows(platform_rows))}
+    catalog.update(builder.other_tables())
+    return catalog
+
+
+def run_sql_file(cursor, path):
+    """Executes every statement in a .sql file."""
+    with open(path, encoding="utf-8") as sql_file:
+        cursor.execute(sql_file.read())
+
+
+def copy_rows(cursor, table, rows, batch_size=BATCH_SIZE):
+    """
+    Copies rows into a table with COPY FROM STDIN, batch_size rows at a time.
+
+    Args:
+        cursor: An open psycopg2 cursor.
+        table (str): Table name from TABLE_COLUMNS.
+        rows (iterable): Row tuples in TABLE_COLUMNS[table] order; None is NULL.
+        batch_size (int): Rows buffered per COPY.
+    Returns:
+        int: Number of rows copied.
+    """
+    statement = f"COPY {table} ({', '.join(TABLE_COLUMNS[table])}) FROM STDIN WITH (FORMAT csv)"
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    count = 0
+
+    def flush():
+        buffer.seek(0)
+        cursor.copy_expert(statement, buffer)
+        buffer.seek(0)
+        buffer.truncate()
+
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % batch_size == 0:
+            flush()
+    if count % batch_size:
+        flush()
+    return count
+
+
+def swap_in(cursor, target_schema):
+    """
+    Replaces the live tables with the freshly loaded ones.
+
+    Args:
+        cursor: A cursor inside the loading transaction.
+        target_schema (str): Schema the application reads from.
+    """
+    old_tables = ", ".join(f"{target_schema}.{table}"
+                           for table in LEGACY_TABLES + tuple(TABLE_COLUMNS))
+    cursor.execute(f"DROP TABLE IF EXISTS {old_tables} CASCADE")
+    for table in TABLE_COLUMNS:
+        cursor.execute(f"ALTER TABLE {LOAD_SCHEMA}.{table} SET SCHEMA {target_schema}")
+    cursor.execute(f"DROP SCHEMA {LOAD_SCHEMA}")
+
+
+def load_catalog(connection, platform_rows, batch_size=BATCH_SIZE):
+    """
+    Rebuilds every table from the platform rows in one transaction and
+    stamps the result with a new catalog version.
+
+    The new tables are created and filled in a separate schema, indexed,
+    and only then moved over the live ones, so readers see either the old
+    catalog or the new one and are only blocked for the final swap.
+
+    Args:
+        connection: An open psycopg2 connection.
+        platform_rows (iterable): Rows as yielded by read_platform_rows().
+        batch_size (int): Rows buffered per COPY.
+    Returns:
+        dict: Table name -> (rows copied, seconds taken).
+    """
+    builder = CatalogBuilder()
+    report = {}
+    with connection:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT current_schema()")
+            target_schema = cursor.fetchone()[0]
+            cursor.execute(f"DROP SCHEMA IF EXISTS {LOAD_SCHEMA} CASCADE")
+            cursor.execute(f"CREATE SCHEMA {LOAD_SCHEMA}")
+            # Installed before the search path changes, so the extension
+            # lands in public, where the app finds similarity() and %, and
+            # not in the load schema, which is dropped after the swap.
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm SCHEMA public")
+            cursor.execute(f"SET LOCAL search_path TO {LOAD_SCHEMA}")
+            run_sql_file(cursor, SCHEMA_FILE)
+
+            started = time.perf_counter()
+            count = copy_rows(cursor, "media", builder.media_rows(platform_rows), batch_size)
+            report["media"] = (count, time.perf_counter() - started)
+            for table, rows in builder.other_tables().items():
+                started = time.perf_counter()
+                count = copy_rows(cursor, table, rows, batch_size)
+                report[table] = (count, time.perf_counter() - started)
+
+            cursor.execute("INSERT INTO catalog_version (version) VALUES (%s)",
+                           (time.time_ns() // 1000,))
+            started = time.perf_counter()
+            run_sql_file(cursor, INDEX_FILE)
+            report["indexes"] = (0, time.perf_counter() - started)
+            swap_in(cursor, target_schema)
+    return report
+
+
+def main():
+    """Rebuilds the database from the CSVs in Data/ and reports load rates."""
+    connection = DataSource.open_connection()
+    started = time.perf_counter()
+    try:
+        report = load_catalog(connection, read_platform_rows())
+    finally:
+        connection.close()
+    elapsed = time.perf_counter() - started
+    total = sum(count for count, _ in report.values())
+    for table, (count, seconds) in report.items():
+        rate = f" ({count / seconds:,.0f} rows/sec)" if count and seconds else ""
+        print(f"{table}: {count} rows in {seconds:.2f}s{rate}")
+    print(f"total: {total} rows in {elapsed:.2f}s ({total / elapsed:,.0f} rows/sec)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Module defining the record types media queries return.
+
+Media holds a whole media row and MediaSummary the few columns the list
+pages show. Fields are read by name (media.title) rather than by position,
+so callers do not depend on the order of the columns in a query.
+"""
+
+from collections import namedtuple
+
+MEDIA_FIELDS = ("media_type", "title", "media_cast", "release_year",
+                "category", "media_description", "platform", "id")
+
+
+class Media:  # pylint: disable=too-many-instance-attributes
+    """
+    One media entry, with one attribute per field in MEDIA_FIELDS.
+
+    Fields live in __slots__ rather than a per-instance __dict__, which
+    keeps each record about as small as the tuple it is built from. There
+    is one attribute per media column, hence more than pylint's default.
+    Iterating a Media yields its fields in MEDIA_FIELDS order, for CSV
+    output and the like.
+    """
+
+    __slots__ = MEDIA_FIELDS
+
+    def __init__(self, *values):
+        """
+        Args:
+            *values: The fields in MEDIA_FIELDS order, as selected by
+                MEDIA_COLUMNS.
+        """
+        if len(values) != len(MEDIA_FIELDS):
+            raise TypeError(f"Media takes {len(MEDIA_FIELDS)} fields, got {len(values)}")
+        (self.media_type, self.title, self.media_cast, self.release_year,
+         self.category, self.media_description, self.platform, self.id) = values
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Builds records from query result rows.
+
+        Args:
+            rows (iterable): Tuples in MEDIA_FIELDS order, e.g. cursor.fetchall().
+        Returns:
+            list: Media records, in the same order.
+        """
+        return [cls(*row) for row in rows]
+
+    def as_dict(self):
+        """
+        Returns:
+            dict: Field name -> value.
+        """
+        return {field: getattr(self, field) for field in MEDIA_FIELDS}
+
+    def __iter__(self):
+        return (getattr(self, field) for field in MEDIA_FIELDS)
+
+    def __len__(self):
+        return len(MEDIA_FIELDS)
+
+    def __eq__(self, other):
+        if not isinstance(other, Media):
+            return NotImplemented
+        return tuple(self) == tuple(other)
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        return f"Media({', '.join(f'{field}={getattr(self, field)!r}' for field in MEDIA_FIELDS)})"
+
+
+class MediaSummary(namedtuple("MediaSummary",
+                              ["title", "release_year", "media_description", "id"])):
+    """The fields of a media entry shown in list pages, see SUMMARY_COLUMNS."""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Builds records from query result rows.
+
+        Args:
+            rows (iterable): (title, release_year, media_description, id) tuples.
+        Returns:
+            list: MediaSummary records, in the same order.
+        """
+        return [cls._make(row) for row in rows]
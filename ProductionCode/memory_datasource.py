@@ -0,0 +1,476 @@
+"""
+Module for answering media queries from memory, without PostgreSQL.
+
+MemoryDataSource reads the platform CSVs once at start-up and offers the
+same query methods as DataSource, returning rows of the same shape. Columns
+are kept as parallel lists indexed by media id, with inverted indexes from
+word to media ids, and one array of media ids sorted in catalog order.
+Filters are answered by a BitmapIndex over positions in that array, so the
+bits of a filter's result read lowest first are already in catalog order
+and keyset pages are a binary search and a mask.
+"""
+
+import html
+import re
+import time
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from itertools import islice
+from ProductionCode.bitmap_index import (BitmapIndex, bit_positions, filter_expression,
+                                         range_bitmap)
+from ProductionCode.datasource import (FACETS, SIMILARITY_THRESHOLD, STREAM_ITERSIZE,
+                                       column_filters, facet_lists)
+from ProductionCode.loader import build_catalog, read_platform_rows
+from ProductionCode.media import MEDIA_FIELDS, Media, MediaSummary
+
+WORD = re.compile(r"\w+")
+# What pg_trgm counts as a word: runs of letters and digits.
+TRIGRAM_WORD = re.compile(r"[^\W_]+")
+
+
+def catalog_key(release_year, title, media_id):
+    """
+    Sort key matching the database's catalog order: newest first (with
+    unknown years first, as PostgreSQL sorts NULLs in descending order),
+    then by title, then by id.
+
+    Args:
+        release_year (int): Release year, or None.
+        title (str): Title.
+        media_id (int): Media id.
+    Returns:
+        tuple: A key that sorts in catalog order.
+    """
+    if release_year is None:
+        return (0, 0, title, media_id)
+    return (1, -release_year, title, media_id)
+
+
+def trigrams(text):
+    """
+    Splits text into its set of trigrams the way pg_trgm does: each
+    lower-cased word is padded with two spaces in front and one behind.
+
+    Args:
+        text (str): Any text, or None.
+    Returns:
+        set: The distinct trigrams.
+    """
+    found = set()
+    for word in TRIGRAM_WORD.findall((text or "").lower()):
+        padded = f"  {word} "
+        found.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return found
+
+
+def words(text):
+    """
+    Splits text into the set of its lower-cased words.
+
+    Args:
+        text (str): Any text, or None.
+    Returns:
+        set: The distinct words.
+    """
+    return set(WORD.findall((text or "").lower()))
+
+
+class MemoryDataSource:
+    """Serves media queries from in-memory columns built from the platform CSVs."""
+
+    def __init__(self, platform_files=None):
+        """
+        Loads and indexes the catalog.
+
+        Args:
+            platform_files (dict): Platform name -> CSV path. Defaults to the
+                four CSVs in Data/.
+        """
+        catalog = build_catalog(read_platform_rows(platform_files))
+        media = catalog["media"]
+        self.columns = {field: [row[i + 1] for row in media]
+                        for i, field in enumerate(MEDIA_FIELDS[:-1])}
+        self.order = sorted(range(len(media)), key=self._catalog_key)
+        self._keys = [self._catalog_key(media_id) for media_id in self.order]
+        self._rank = [0] * len(media)
+        for rank, media_id in enumerate(self.order):
+            self._rank[media_id] = rank
+
+        self._names = {}
+        self._index = {"titles": {}, "title_words": {}, "text_words": {},
+                       "title_trigrams": {}, "title_trigram_counts": [],
+                       "filters": self._filter_index(catalog)}
+        for media_id in range(len(media)):
+            self._index_text(media_id)
+        self.version = time.time_ns() // 1000
+
+    def _filter_index(self, catalog):
+        """
+        Builds the BitmapIndex of actors, genres, platforms, media types,
+        decades and release years, over catalog positions.
+        """
+        filters = BitmapIndex(len(self.order))
+        for field, vocabulary, link_table in (("actor", "actors", "media_to_actors"),
+                                              ("genre", "genres", "media_to_genres")):
+            names = dict(catalog[vocabulary])
+            self._names[vocabulary] = sorted(names.values())
+            filters.add_field(field, ((self._rank[media_id], names[name_id])
+                                      for media_id, name_id in catalog[link_table]),
+                              postings=field == "actor")
+        years = self.columns["release_year"]
+        for field, values in (("platform", self.columns["platform"]),
+                              ("media_type", self.columns["media_type"]),
+                              ("decade", [year // 10 * 10 if year is not None else None
+                                          for year in years])):
+            filters.add_field(field, zip(self._rank, values))
+        filters.add_years(zip(self._rank, years))
+        return filters
+
+    def _index_text(self, media_id):
+        """Adds a media id's title and description to the text indexes."""
+        title = self.columns["title"][media_id]
+        self._index["titles"].setdefault(title.lower(), media_id)
+        description = self.columns["media_description"][media_id]
+        for word in words(title):
+            self._index["title_words"].setdefault(word, set()).add(media_id)
+        for word in words(title) | words(description):
+            self._index["text_words"].setdefault(word, set()).add(media_id)
+        title_trigrams = trigrams(title)
+        self._index["title_trigram_counts"].append(len(title_trigrams))
+        for trigram in title_trigrams:
+            self._index["title_trigrams"].setdefault(trigram, []).append(media_id)
+
+    def _catalog_key(self, media_id):
+        """Returns the catalog_key() of a media id."""
+        return catalog_key(self.columns["release_year"][media_id],
+                           self.columns["title"][media_id], media_id)
+
+    def _row(self, media_id):
+        """Returns the Media record of a media id."""
+        return Media(*(self.columns[field][media_id] for field in MEDIA_FIELDS[:-1]), media_id)
+
+    def _summary(self, media_id):
+        """Returns a MediaSummary of a media id."""
+        columns = self.columns
+        return MediaSummary(columns["title"][media_id], columns["release_year"][media_id],
+                            columns["media_description"][media_id], media_id)
+
+    def _select(self, actor_name=None, release_year=None, category=None, match="exact",
+                **columns):
+        """
+        Finds the catalog positions of media matching every given filter.
+        A missing or empty filter is left out, as in media_filters().
+
+        Returns:
+            int: The bitmap of matching catalog positions (indexes into self.order).
+        """
+        return self._index["filters"].evaluate(
+            filter_expression(actor_name, release_year, category, match, **columns))
+
+    def get_media_page(self, bits, record=None, **paging):
+        """
+        Helper method that cuts one keyset page out of a filter's matches.
+
+        Args:
+            bits (int): The bitmap of matching catalog positions, from _select().
+            record (callable): Builds a result from a media id; defaults
+                to a full Media record.
+            **paging: Optional keyword arguments:
+                limit (int): Maximum number of rows, or None for all of them.
+                after (tuple): (release_year, title, id) of the row just
+                    before the wanted rows.
+                before (tuple): (release_year, title, id) of the row just
+                    after the wanted rows; ignored when after is given.
+        Returns:
+            list: Records in catalog order.
+        """
+        record = record or self._row
+        limit, after, before = (paging.get(name) for name in ("limit", "after", "before"))
+        if after:
+            bits &= ~range_bitmap(0, bisect_right(self._keys, catalog_key(*after)))
+        elif before:
+            bits &= range_bitmap(0, bisect_left(self._keys, catalog_key(*before)))
+            if limit is not None:
+                ranks = list(islice(bit_positions(bits, reverse=True), limit))
+                return [record(self.order[rank]) for rank in reversed(ranks)]
+        return [record(self.order[rank]) for rank in islice(bit_positions(bits), limit)]
+
+    def find_media(self, expression, record=None, **paging):
+        """
+        Retrieves media matching any combination of filters, such as
+        ("and", ("genre", "Drama"), ("not", ("platform", "Netflix"))).
+        Leaves may filter by actor, genre, platform, media_type or decade,
+        or be ("after", year); see bitmap_index for the syntax.
+
+        Args:
+            expression (tuple): The filter.
+            record (type): Media (the default) or MediaSummary.
+            **paging: Optional limit, after and before, see get_media_page().
+        Returns:
+            list: Records in catalog order.
+        Raises:
+            KeyError: If the expression names an unknown field.
+            ValueError: If an operator is misused or a match mode unknown.
+        """
+        build = self._summary if record is MediaSummary else self._row
+        return self.get_media_page(self._index["filters"].evaluate(expression), build,
+                                   **paging)
+
+    def get_media_later_than(self, release_year, limit=None, after=None, before=None):
+        """
+        Retrieves all media released after a specified year.
+
+        Args:
+            release_year (int): The year to filter media by.
+            limit, after, before: Paging arguments, see get_media_page().
+        Returns:
+            list: Media records.
+        """
+        return self.get_media_page(self._select(release_year=release_year),
+                                   limit=limit, after=after, before=before)
+
+    def get_media_by_actor(self, actor_name, limit=None, after=None, before=None,
+                           match="exact"):
+        """
+        Retrieves media featuring an actor, matching the whole name ignoring case,
+        or with match="prefix" the start of it.
+
+        Args:
+            actor_name (str): The name of the actor to filter media by.
+            limit, after, before: Paging arguments, see get_media_page().
+            match (str): "exact" or "prefix".
+        Returns:
+            list: Media records.
+        """
+        return self.get_media_page(self._select(actor_name=actor_name, match=match),
+                                   limit=limit, after=after, before=before)
+
+    def get_media_by_category(self, category, limit=None, after=None, before=None,
+                              match="exact"):
+        """
+        Retrieves media in a genre, matching the whole genre ignoring case,
+        or with match="prefix" the start of it.
+
+        Args:
+            category (str): The genre or category to filter media by.
+            limit, after, before: Paging arguments, see get_media_page().
+            match (str): "exact" or "prefix".
+        Returns:
+            list: Media records.
+        """
+        return self.get_media_page(self._select(category=category, match=match),
+                                   limit=limit, after=after, before=before)
+
+    def get_media_by_advanced_filter(self, actor_name, release_year, category, match="exact",
+                                     **options):
+        """
+        Retrieves media based on actor name, category, and release year,
+        and optionally platform and media type.
+        An empty actor name, category, platform or media type leaves that filter out.
+
+        Args:
+            actor_name (str): The name of the actor to filter by.
+            release_year (int): The year to filter media released after.
+            category (str): The genre or category to filter media by.
+            match (str): "exact" or "prefix".
+            **options: Optional platform and media_type, and limit, after
+                and before, see get_media_page().
+        Returns:
+            list: Media records.
+        """
+        bits = self._select(actor_name, release_year, category, match, **column_filters(options))
+        return self.get_media_page(bits, **options)
+
+    def get_media_summaries(self, actor_name=None, release_year=None, category=None,
+                            match="exact", **options):
+        """
+        Lists media like get_media_by_advanced_filter(), as MediaSummary
+        records of just the title, release year, description and id.
+        A missing or empty filter is left out.
+
+        Args:
+            actor_name (str): The name of the actor to filter by.
+            release_year (int): The year to filter media released after.
+            category (str): The genre or category to filter by.
+            match (str): "exact" or "prefix".
+            **options: Optional platform and media_type, and limit, after
+                and before, see get_media_page().
+        Returns:
+            list: MediaSummary records in catalog order.
+        """
+        bits = self._select(actor_name, release_year, category, match, **column_filters(options))
+        return self.get_media_page(bits, self._summary, **options)
+
+    def get_facet_counts(self, actor_name=None, release_year=None, category=None,
+                         match="exact", **columns):
+        """
+        Counts the media matching a filter by genre, release decade,
+        platform and media type. A missing or empty filter is left out.
+
+        Args:
+            actor_name (str): The name of the actor to filter by.
+            release_year (int): The year to filter media released after.
+            category (str): The genre or category to filter by.
+            match (str): "exact" or "prefix".
+            **columns: Optional platform and media_type.
+        Returns:
+            dict: Facet name -> list of (value, count), see facet_lists().
+        """
+        bits = self._select(actor_name, release_year, category, match, **columns)
+        filters = self._index["filters"]
+        return facet_lists((facet, value, count) for facet in FACETS
+                           for value, count in filters.counts(facet, bits))
+
+    def stream_media(self, actor_name=None, release_year=None, category=None,
+                     itersize=STREAM_ITERSIZE, **options):
+        """
+        Yields every media entry matching the given filters in catalog order.
+        A missing filter is left out.
+
+        Args:
+            actor_name (str): The name of the actor to filter by.
+            release_year (int): The year to filter media released after.
+            category (str): The genre or category to filter by.
+            itersize (int): Unused; accepted for compatibility with DataSource.
+            **options: Optional record (Media or MediaSummary), match
+                ("exact" or "prefix"), platform and media_type, as for
+                DataSource.stream_media().
+        Yields:
+            Media: Each matching entry, as a record of the given type.
+        """
+        del itersize
+        build = self._summary if options.get("record") is MediaSummary else self._row
+        bits = self._select(actor_name, release_year, category, options.get("match", "exact"),
+                            **column_filters(options))
+        for rank in bit_positions(bits):
+            yield build(self.order[rank])
+
+    def search_text(self, query, limit=20, offset=0):
+        """
+        Retrieves media whose title or description contains every search word,
+        best matches first. Media with more of the words in the title rank
+        higher. Words starting with "-" exclude media containing them.
+        Unlike the database search, words are matched exactly, not stemmed.
+
+        Args:
+            query (str): Search words.
+            limit (int): Maximum number of results.
+            offset (int): Number of best matches to skip, for paging.
+        Returns:
+            list: Media records.
+        """
+        wanted, unwanted = set(), set()
+        for term in query.lower().split():
+            (unwanted if term.startswith("-") else wanted).update(WORD.findall(term))
+        if not wanted:
+            return []
+        text_words = self._index["text_words"]
+        ids = set.intersection(*(text_words.get(word, set()) for word in wanted))
+        for word in unwanted:
+            ids -= text_words.get(word, set())
+        title_words = self._index["title_words"]
+        ranked = sorted(
+            ids,
+            key=lambda media_id: (
+                -sum(media_id in title_words.get(word, ()) for word in wanted),
+                self._rank[media_id],
+            ),
+        )
+        return [self._row(media_id) for media_id in ranked[offset:offset + limit]]
+
+    def get_media_from_title(self, title):
+        """
+        Retrieves media data based on the title, ignoring case.
+
+        Args:
+            title (str): The title of the media to search for.
+        Returns:
+            Media: The media entry if found, or None if not found.
+        """
+        media_id = self._index["titles"].get(title.lower())
+        return self._row(media_id) if media_id is not None else None
+
+    def get_similar_titles(self, title, limit=5, threshold=SIMILARITY_THRESHOLD):
+        """
+        Retrieves the media whose titles are most like the given one, by
+        trigram similarity as pg_trgm computes it.
+
+        Args:
+            title (str): The title that was looked up.
+            limit (int): Maximum number of suggestions.
+            threshold (float): Least similarity, from 0 to 1, of a suggestion.
+        Returns:
+            list: MediaSummary records, most similar first.
+        """
+        wanted = trigrams(title)
+        if not wanted:
+            return []
+        shared = Counter()
+        for trigram in wanted:
+            shared.update(self._index["title_trigrams"].get(trigram, ()))
+        counts = self._index["title_trigram_counts"]
+        scored = []
+        for media_id, count in shared.items():
+            similarity = count / (len(wanted) + counts[media_id] - count)
+            if similarity >= threshold:
+                scored.append((-similarity, media_id))
+        scored.sort()
+        return [self._summary(media_id) for _, media_id in scored[:limit]]
+
+    def get_all_categories(self):
+        """
+        Retrieves all unique categories.
+
+        Returns:
+            list: A sorted list of unique categories.
+        """
+        return list(self._names["genres"])
+
+    def get_all_actors(self):
+        """
+        Retrieves all unique actor names.
+
+        Returns:
+            list: A sorted list of unique actor names.
+        """
+        return list(self._names["actors"])
+
+    def get_all_media_titles(self):
+        """
+        Retrieves all media titles, newest first.
+
+        Returns:
+            list: A list of media titles.
+        """
+        return [html.unescape("".join(self.columns["title"][media_id].splitlines()))
+                for media_id in self.order]
+
+    def get_data_version(self):
+        """
+        Returns the version stamp of the loaded catalog: the time it was loaded.
+
+        Returns:
+            int: The catalog version.
+        """
+        return self.version
+
+    def pool_stats(self):
+        """
+        There is no connection pool; returns an empty dict like DataSource before connecting.
+        """
+        return {}
+
+    def cache_stats(self):
+        """
+        There is no query cache; returns an empty dict like DataSource without one.
+        """
+        return {}
+
+    def prepared_stats(self):
+        """
+        There are no prepared statements; returns an empty dict.
+        """
+        return {}
+
+    def close(self):
+        """Nothing to close; present for compatibility with DataSource."""
@@ -0,0 +1,273 @@
+"""
+Module for collecting latency metrics and exposing them in Prometheus format.
+
+DataSource records every query here and the Flask app records every request;
+REGISTRY.render() produces the text served at /metrics. Set
+STREAMSEARCH_SLOW_QUERY_MS (or SLOW_QUERY_MS in psql_config.py) to also
+print every query slower than that many milliseconds.
+"""
+
+import contextvars
+import functools
+import hashlib
+import os
+import re
+import threading
+import ProductionCode.psql_config as config
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000, 50000)
+
+LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+# Gathered queries add to one request's timings from several threads.
+_request_timings_lock = threading.Lock()
+
+
+def normalize_sql(query):
+    """
+    Reduces a query to its shape: literals become ? and whitespace collapses.
+
+    Args:
+        query (str): SQL text.
+    Returns:
+        str: The normalized query.
+    """
+    return " ".join(LITERAL.sub("?", query).split())
+
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint(query):
+    """
+    Returns a short, stable identifier for a query's shape.
+
+    Args:
+        query (str): SQL text.
+    Returns:
+        str: 12 hex digits identifying normalize_sql(query).
+    """
+    return hashlib.sha1(normalize_sql(query).encode("utf-8")).hexdigest()[:12]
+
+
+def result_bytes(rows):
+    """
+    Estimates the bytes fetched for a result: text and binary fields by
+    length, everything else as 8 bytes.
+
+    Args:
+        rows (list): Result rows.
+    Returns:
+        int: Estimated size of the result's values.
+    """
+    size = 0
+    for row in rows:
+        for value in row:
+            size += len(value) if isinstance(value, (str, bytes)) else 8
+    return size
+
+
+def slow_query_threshold():
+    """
+    Returns the slow-query log threshold.
+
+    Returns:
+        float: Seconds, or None if the slow-query log is off.
+    """
+    setting = os.environ.get("STREAMSEARCH_SLOW_QUERY_MS")
+    if not setting:
+        setting = getattr(config, "SLOW_QUERY_MS", None)
+    return float(setting) / 1000 if setting is not None else None
+
+
+def start_request_timing():
+    """
+    Starts collecting database and template time for the current request,
+    and the number of database errors it ran into.
+
+    Returns:
+        dict: The timings, updated by add_request_time(), and the "errors"
+        count, updated by add_request_error().
+    """
+    timings = {"db": 0.0, "render": 0.0, "errors": 0}
+    _request_timings.set(timings)
+    return timings
+
+
+def add_request_time(kind, seconds):
+    """
+    Adds time spent on "db" or "render" work to the current request, if any.
+
+    Args:
+        kind (str): "db" or "render".
+        seconds (float): Time spent.
+    """
+    timings = _request_timings.get()
+    if timings is not None:
+        with _request_timings_lock:
+            timings[kind] += seconds
+
+
+def add_request_error():
+    """
+    Counts a database error against the current request, if any, e.g. a
+    failed query whose result was replaced by None or an empty list.
+    """
+    timings = _request_timings.get()
+    if timings is not None:
+        with _request_timings_lock:
+            timings["errors"] += 1
+
+
+def _escape(value):
+    """Escapes a label value for the Prometheus text format."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    """Formats label pairs as {name="value",...}."""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+class Histogram:
+    """Counts observations into cumulative buckets, as Prometheus histograms do."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """Records one observation."""
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        """Yields the Prometheus sample lines for this histogram."""
+        for bound, count in zip(self.buckets, self.counts):
+            yield f"{name}_bucket{_format_labels(labels + (('le', repr(float(bound))),))} {count}"
+        yield f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {self.count}"
+        yield f"{name}_sum{_format_labels(labels)} {self.total}"
+        yield f"{name}_count{_format_labels(labels)} {self.count}"
+
+
+class MetricsRegistry:
+    """Thread-safe collection of labelled histograms and counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _series(self, name, kind, help_text, labels):
+        """Returns the series dict for a metric, registering it if new."""
+        metric = self._metrics.setdefault(name, {"kind": kind, "help": help_text, "series": {}})
+        return metric["series"], tuple(sorted(labels.items()))
+
+    def observe(self, name, value, help_text="", buckets=LATENCY_BUCKETS, **labels):
+        """
+        Records a value in a histogram.
+
+        Args:
+            name (str): Metric name.
+            value (float): The observation, e.g. seconds or rows.
+            help_text (str): Description shown in /metrics.
+            buckets (tuple): Upper bounds, used when the series is new.
+            **labels: Label values identifying the series.
+        """
+        with self._lock:
+            series, key = self._series(name, "histogram", help_text, labels)
+            if key not in series:
+                series[key] = Histogram(buckets)
+            series[key].observe(value)
+
+    def increment(self, name, amount=1, help_text="", **labels):
+        """
+        Adds to a counter.
+
+        Args:
+            name (str): Metric name, ending in _total by convention.
+            amount (float): How much to add.
+            help_text (str): Description shown in /metrics.
+            **labels: Label values identifying the series.
+        """
+        with self._lock:
+            series, key = self._series(name, "counter", help_text, labels)
+            series[key] = series.get(key, 0) + amount
+
+    def clear(self):
+        """Forgets every metric."""
+        with self._lock:
+            self._metrics.clear()
+
+    def render(self, gauges=None):
+        """
+        Renders every metric in the Prometheus text exposition format.
+
+        Args:
+            gauges (dict): Extra name -> value gauges to append, e.g.
+                connection pool statistics read at scrape time.
+        Returns:
+            str: The exposition text.
+        """
+        lines = []
+        with self._lock:
+            for name, metric in sorted(self._metrics.items()):
+                if metric["help"]:
+                    lines.append(f"# HELP {name} {metric['help']}")
+                lines.append(f"# TYPE {name} {metric['kind']}")
+                for labels, value in sorted(metric["series"].items()):
+                    if metric["kind"] == "histogram":
+                        lines.extend(value.samples(name, labels))
+                    else:
+                        lines.append(f"{name}{_format_labels(labels)} {value}")
+        for name, value in sorted((gauges or {}).items()):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def record_query(query, seconds, rows, fetched=None):
+    """
+    Records one database query: its duration, row count and bytes fetched,
+    labelled by fingerprint, and prints it if it is slower than the
+    slow-query threshold.
+
+    Args:
+        query (str): SQL text.
+        seconds (float): Time the query took, including fetching.
+        rows (list): Rows fetched, or None if the query failed.
+        fetched (tuple): (row count, bytes) counted while the rows were
+            streamed, for a query whose rows were not kept; rows is then
+            an empty list, or None if the query failed part way.
+    """
+    query_id = fingerprint(query)
+    count, size = fetched or (len(rows or ()), None)
+    REGISTRY.observe("streamsearch_query_duration_seconds", seconds,
+                     "Database query latency.", fingerprint=query_id)
+    if rows is None:
+        REGISTRY.increment("streamsearch_query_errors_total", 1,
+                           "Database queries that failed.", fingerprint=query_id)
+        add_request_error()
+    else:
+        REGISTRY.observe("streamsearch_query_rows", count, "Rows returned per query.",
+                         ROW_BUCKETS, fingerprint=query_id)
+        REGISTRY.increment("streamsearch_query_bytes_total",
+                           result_bytes(rows) if size is None else size,
+                           "Estimated bytes fetched.", fingerprint=query_id)
+    add_request_time("db", seconds)
+
+    threshold = slow_query_threshold()
+    if threshold is not None and seconds >= threshold:
+        REGISTRY.increment("streamsearch_slow_queries_total", 1,
+                           "Queries slower than the slow-query threshold.")
+        print(f"Slow query ({seconds * 1000:.1f} ms, {count} rows, "
+              f"{query_id}): {normalize_sql(query)}")
@@ -0,0 +1,97 @@
+"""
+Module for keyset pagination of media lists.
+
+Media lists are ordered newest first, then by title, with the media id as a
+tie-breaker. A page is fetched by asking for the rows after (or before) the
+(release_year, title, id) key of the last (or first) row already shown, so
+every page costs the same however deep into the list it is.
+"""
+
+import base64
+import binascii
+import json
+from collections import namedtuple
+
+Page = namedtuple("Page", ["rows", "next_cursor", "prev_cursor"])
+
+
+def row_key(row):
+    """
+    Returns the keyset position of a media row.
+
+    Args:
+        row (Media): A media record as returned by the DataSource list
+            methods, or a MediaSummary.
+    Returns:
+        tuple: (release_year, title, id).
+    """
+    return (row.release_year, row.title, row.id)
+
+
+def encode_cursor(key):
+    """
+    Turns a keyset position into an opaque, URL-safe token.
+
+    Args:
+        key (tuple): (release_year, title, id).
+    Returns:
+        str: The token.
+    """
+    data = json.dumps(list(key), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    """
+    Turns a token from encode_cursor() back into a keyset position.
+
+    Args:
+        token (str): The token, typically from a query string.
+    Returns:
+        tuple: (release_year, title, id), or None if the token is malformed.
+    """
+    try:
+        data = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        year, title, media_id = json.loads(data)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        return None
+    if not isinstance(year, int) or not isinstance(title, str) or not isinstance(media_id, int):
+        return None
+    return (year, title, media_id)
+
+
+def fetch_page(fetch, limit, after=None, before=None):
+    """
+    Fetches one page of a media list and works out its neighbours.
+
+    Args:
+        fetch (callable): A DataSource list method with its filters already
+            bound, called with limit, after and before keyword arguments.
+        limit (int): Rows per page.
+        after (str): Token of the row just before the wanted page.
+        before (str): Token of the row just after the wanted page; ignored
+            when after is given.
+    Returns:
+        Page: The rows plus tokens for the next and previous pages (None
+        when there is no such page). Malformed tokens fetch the first page.
+    """
+    after_key = decode_cursor(after) if after else None
+    before_key = decode_cursor(before) if before and not after_key else None
+    rows = fetch(limit=limit + 1, after=after_key, before=before_key) or []
+
+    if before_key:
+        has_prev = len(rows) > limit
+        rows = rows[-limit:]
+        has_next = True
+    else:
+        has_next = len(rows) > limit
+        rows = rows[:limit]
+        has_prev = after_key is not None
+
+    if not rows:
+        return Page(rows, None, None)
+    return Page(
+        rows,
+        encode_cursor(row_key(rows[-1])) if has_next else None,
+        encode_cursor(row_key(rows[0])) if has_prev else None,
+    )
@@ -0,0 +1,165 @@
+"""
+Module providing a bounded, thread-safe cache of query results.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_key(query, params=None):
+    """
+    Builds a cache key that ignores differences in query whitespace.
+
+    Args:
+        query (str): SQL query text.
+        params (tuple or list): Parameters for the query's placeholders.
+    Returns:
+        tuple: (normalized query, params as a tuple).
+    """
+    return " ".join(query.split()), tuple(params or ())
+
+
+class QueryCache:
+    """
+    Keeps recent query results in memory, least recently used first out.
+
+    The cache is bounded both by number of entries and by the total number
+    of rows held. Entries expire after ttl seconds, and the whole cache is
+    emptied when the catalog version it was filled from changes.
+    """
+
+    def __init__(self, max_entries=1024, max_rows=200000, ttl=300.0,
+                 version_check_interval=5.0):
+        """
+        Creates an empty cache.
+
+        Args:
+            max_entries (int): Most results kept at once.
+            max_rows (int): Most rows kept across all results; a single
+                result larger than this is never cached.
+            ttl (float): Seconds a result stays fresh.
+            version_check_interval (float): Seconds between catalog version
+                checks, see version_check_due().
+        """
+        self.settings = {
+            "max_entries": max_entries,
+            "max_rows": max_rows,
+            "ttl": ttl,
+            "version_check_interval": version_check_interval,
+        }
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._rows = 0
+        self._version = None
+        self._next_version_check = 0.0
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+
+    def get(self, key):
+        """
+        Looks up a fresh result.
+
+        Args:
+            key (tuple): A key from make_key().
+        Returns:
+            list: A copy of the cached rows, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                self._remove(key)
+                self._stats["expirations"] += 1
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return list(entry[1])
+
+    def put(self, key, rows):
+        """
+        Stores a result, evicting the least recently used ones to make room.
+
+        Args:
+            key (tuple): A key from make_key().
+            rows (list): The query's result rows.
+        """
+        rows = tuple(rows)
+        if len(rows) > self.settings["max_rows"]:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.settings["ttl"], rows)
+            self._rows += len(rows)
+            while (len(self._entries) > self.settings["max_entries"]
+                   or self._rows > self.settings["max_rows"]):
+                self._remove(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        """Drops every cached result."""
+        with self._lock:
+            self._entries.clear()
+            self._rows = 0
+            self._stats["invalidations"] += 1
+
+    def version_check_due(self):
+        """
+        Tells the caller whether it is time to re-read the catalog version.
+        Returns True at most once per version_check_interval.
+
+        Returns:
+            bool: True if the caller should call set_version() now.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_version_check:
+                return False
+            self._next_version_check = now + self.settings["version_check_interval"]
+            return True
+
+    def set_version(self, version):
+        """
+        Records the current catalog version, clearing the cache if it changed.
+
+        Args:
+            version (int): The catalog version, or None if it could not be read.
+        """
+        if version is None:
+            return
+        with self._lock:
+            changed = self._version is not None and version != self._version
+            self._version = version
+        if changed:
+            self.clear()
+
+    def stats(self):
+        """
+        Reports cache size and effectiveness.
+
+        Returns:
+            dict: Hit, miss, eviction, expiration and invalidation counters
+            plus the current size, bounds and catalog version.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(
+                entries=len(self._entries),
+                rows=self._rows,
+                version=self._version,
+                **self.settings,
+            )
+        return stats
+
+    def _remove(self, key):
+        """Drops one entry; the caller holds the lock."""
+        _, rows = self._entries.pop(key)
+        self._rows -= len(rows)
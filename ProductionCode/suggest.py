@@ -0,0 +1,131 @@
+"""
+Module providing an in-memory autocomplete index over titles or actor names.
+"""
+
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from math import ceil
+
+
+def normalize(text):
+    """
+    Normalizes text for matching: case-folded with whitespace collapsed.
+
+    Args:
+        text (str): Raw text.
+    Returns:
+        str: The normalized text.
+    """
+    return " ".join(text.casefold().split())
+
+
+def trigrams(text):
+    """
+    Splits normalized text into the set of its padded character trigrams.
+
+    Args:
+        text (str): Normalized text.
+    Returns:
+        set: Trigrams of the text, padded so short words still produce some.
+    """
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SuggestionIndex:
+    """
+    Ranks autocomplete suggestions for a fixed list of values.
+
+    Prefix lookups binary-search two sorted arrays: one of whole values and
+    one of (word, value) pairs, which together act as a flattened prefix trie.
+    When prefixes do not fill the requested number of suggestions, a trigram
+    index supplies infix and typo-tolerant matches ranked by similarity.
+    """
+
+    def __init__(self, values, min_similarity=0.3):
+        """
+        Builds the index.
+
+        Args:
+            values (iterable of str): Values to suggest; duplicates are dropped.
+            min_similarity (float): Lowest trigram similarity worth suggesting.
+        """
+        self.values = list(dict.fromkeys(value for value in values if value))
+        self.min_similarity = min_similarity
+        self._normalized = [normalize(value) for value in self.values]
+        self._by_value = sorted((norm, i) for i, norm in enumerate(self._normalized))
+        self._by_word = sorted(
+            (word, i)
+            for i, norm in enumerate(self._normalized)
+            for word in set(norm.split())
+        )
+        self._trigram_counts = []
+        self._postings = defaultdict(list)
+        for i, norm in enumerate(self._normalized):
+            grams = trigrams(norm)
+            self._trigram_counts.append(len(grams))
+            for gram in grams:
+                self._postings[gram].append(i)
+
+    def __len__(self):
+        return len(self.values)
+
+    def suggest(self, query, limit=10):
+        """
+        Returns the best suggestions for a partially typed query.
+
+        Values starting with the query rank first, then values with a word
+        starting with the query, then values sharing enough trigrams with it.
+
+        Args:
+            query (str): What the user has typed so far.
+            limit (int): Maximum number of suggestions.
+        Returns:
+            list: Up to limit matching values, best first.
+        """
+        query = normalize(query)
+        if not query or limit <= 0:
+            return []
+
+        found = dict.fromkeys(self._prefix_matches(self._by_value, query, limit))
+        if len(found) < limit:
+            first_word = query.split()[0]
+            for i in self._prefix_matches(self._by_word, first_word):
+                if i not in found and query in self._normalized[i]:
+                    found[i] = None
+                    if len(found) >= limit:
+                        break
+        if len(found) < limit:
+            for i in self._similar(query, limit - len(found), exclude=found):
+                found[i] = None
+        return [self.values[i] for i in list(found)[:limit]]
+
+    @staticmethod
+    def _prefix_matches(keys, prefix, limit=None):
+        """Yields value ids whose sorted key starts with prefix, in key order."""
+        position = bisect_left(keys, (prefix, -1))
+        yielded = 0
+        while position < len(keys) and keys[position][0].startswith(prefix):
+            yield keys[position][1]
+            yielded += 1
+            if limit is not None and yielded >= limit:
+                return
+            position += 1
+
+    def _similar(self, query, limit, exclude):
+        """Returns ids of the values most similar to query by trigram overlap."""
+        grams = trigrams(query)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+        # similarity can never exceed count / len(grams), so skip hopeless ids
+        min_count = ceil(self.min_similarity * len(grams))
+        scored = []
+        for i, count in shared.items():
+            if count < min_count or i in exclude:
+                continue
+            similarity = count / (len(grams) + self._trigram_counts[i] - count)
+            if similarity >= self.min_similarity:
+                scored.append((-similarity, self._normalized[i], i))
+        scored.sort()
+        return [i for _, _, i in scored[:limit]]
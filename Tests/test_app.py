@@ -4,9 +4,17 @@ test_app.py
 This module contains unit tests for the flask app of the media 
 filtering application.
 """
+import gzip
+import os
+import re
+import tempfile
+import threading
 import unittest
 from unittest.mock import patch
+from psycopg2 import DatabaseError
+import app as webapp
 from app import app
+from ProductionCode.media import Media, MediaSummary
 
 class BaseTestCase(unittest.TestCase):
     """Base test case to set up the Flask test client."""
@@ -37,17 +45,16 @@ class TestErrorHandling(BaseTestCase):
 class TestFilterFunctions(BaseTestCase):
     """Test filter functions with mocked data source."""
 
-    @patch('app.ds.get_media_by_actor')
+    @patch('app.ds.get_media_summaries')
     def test_actor_filter_valid_result(self, mock_get_movies):
         """Test actor filter with a known actor using mock."""
-        mock_get_movies.return_value = mock_get_movies.return_value = [
-            ("movie", "The Grand Seduction", "BRENDAN GLEESON", 2013,
-              "Comedy", "A comedy set in Newfoundland.", "Netflix")
+        mock_get_movies.return_value = [
+            MediaSummary("The Grand Seduction", 2013, "A comedy set in Newfoundland.", 1)
         ]
         response = self.client.get('/actor/BRENDAN_GLEESON')
         self.assertIn("The Grand Seduction", response.data.decode())
 
-    @patch('app.ds.get_media_by_actor')
+    @patch('app.ds.get_media_summaries')
     def test_actor_filter_no_result(self, mock_get_movies):
         """Test actor filter with no results."""
         mock_get_movies.return_value = []
@@ -55,23 +62,23 @@ class TestFilterFunctions(BaseTestCase):
         response = self.client.get('/actor/UNKNOWN_ACTOR')
         self.assertIn("No results found for actor", response.data.decode())
 
-    @patch('app.ds.get_media_by_actor')
+    @patch('app.ds.get_media_summaries')
     def test_actor_filter_lookup_error(self, mock_get_movies):
         """Test actor filter route when a LookupError is raised."""
         mock_get_movies.side_effect = LookupError("DB error")
         response = self.client.get('/actor/ERROR_ACTOR')
         self.assertIn("Could not find actor: ERROR_ACTOR", response.data.decode())
 
-    @patch('app.ds.get_media_later_than')
+    @patch('app.ds.get_media_summaries')
     def test_year_filter_valid_result(self, mock_get_movies):
         """Test year filter with mocked results."""
         mock_get_movies.return_value = [
-            ("movie", "Some Movie", "Another Actor", 2021, "Drama", "A futuristic drama.", "Prime")
+            MediaSummary("Some Movie", 2021, "A futuristic drama.", 2)
         ]
         response = self.client.get('/year/2019')
         self.assertIn("Some Movie", response.data.decode())
 
-    @patch('app.ds.get_media_later_than')
+    @patch('app.ds.get_media_summaries')
     def test_year_filter_no_result(self, mock_get_movies):
         """Test year filter with no results."""
         mock_get_movies.return_value = []
@@ -79,7 +86,7 @@ class TestFilterFunctions(BaseTestCase):
         response = self.client.get('/year/2050')
         self.assertIn("No movies found released after 2050", response.data.decode())
 
-    @patch('app.ds.get_media_later_than')
+    @patch('app.ds.get_media_summaries')
     def test_year_filter_lookup_error(self, mock_get_movies):
         """Test year filter route when a LookupError is raised."""
         mock_get_movies.side_effect = LookupError("DB error")
@@ -87,17 +94,16 @@ class TestFilterFunctions(BaseTestCase):
         self.assertIn("Could not find titles after year: 2010", response.data.decode())
 
 
-    @patch('app.ds.get_media_by_category')
+    @patch('app.ds.get_media_summaries')
     def test_category_filter_valid_result(self, mock_get_movies):
         """Test category filter with mocked results."""
         mock_get_movies.return_value = [
-            ("movie", "Action Movie", "Some Actor", 2022, "Action",
-              "An action-packed thriller.", "Hulu")
+            MediaSummary("Action Movie", 2022, "An action-packed thriller.", 3)
         ]
         response = self.client.get('/category/Action')
         self.assertIn("Action Movie", response.data.decode())
 
-    @patch('app.ds.get_media_by_category')
+    @patch('app.ds.get_media_summaries')
     def test_category_filter_no_result(self, mock_get_movies):
         """Test category filter with no results."""
         mock_get_movies.return_value = []
@@ -105,79 +111,691 @@ class TestFilterFunctions(BaseTestCase):
         response = self.client.get('/category/UnknownCategory')
         self.assertIn("No movies found in category: UnknownCategory", response.data.decode())
 
-    @patch('app.ds.get_media_by_category')
+    @patch('app.ds.get_media_summaries')
     def test_category_filter_lookup_error(self, mock_get_movies):
         """Test category filter route when a LookupError is raised."""
         mock_get_movies.side_effect = LookupError("DB error")
         response = self.client.get('/category/Drama')
         self.assertIn("Could not find movies in category: Drama", response.data.decode())
 
+    @patch.dict('app.suggestion_indexes', clear=True)
     @patch('ProductionCode.datasource.DataSource.get_all_categories')
     @patch('ProductionCode.datasource.DataSource.get_all_actors')
     @patch('ProductionCode.datasource.DataSource.get_all_media_titles')
     def test_filter_form(self, mock_titles, mock_get_actors, mock_get_categories):
         """
-        Test the filter form is rendered correctly and that
-        available movie categories and actors are retrieved and 
-        displayed from the database.
+        Test the filter form is rendered correctly with the movie categories
+        from the database, and that the autocomplete lists are loaded into
+        the suggestion indexes instead of being embedded in the page.
         """
         mock_get_categories.return_value = ['Comedy', 'Action']
-        mock_get_actors.return_value = ['Brad Pitt', 'Sandra Bullock']
-        mock_titles.return_value = ['Movie A', 'Movie B']
+        mock_get_actors.return_value = ['Actor Z']
+        mock_titles.return_value = ['Movie Only Listed Once']
 
         response = self.client.get('/filter')
         self.assertIn("Comedy", response.data.decode())
         self.assertIn("Action", response.data.decode())
-        self.assertIn("Brad Pitt", response.data.decode())
-        self.assertIn("Sandra Bullock", response.data.decode())
+        self.assertIn("/api/suggest", response.data.decode())
+        self.assertNotIn("Actor Z", response.data.decode())
+        self.assertNotIn("Movie Only Listed Once", response.data.decode())
+        self.assertIn('<option value="Hulu">', response.data.decode())
+        self.assertIn('<option value="TV Show">', response.data.decode())
+
+        self.client.get('/filter')
+        mock_get_actors.assert_called_once()
+        mock_titles.assert_called_once()
+
+    @patch.dict('app.suggestion_indexes', clear=True)
+    @patch('ProductionCode.datasource.DataSource.get_all_categories')
+    @patch('ProductionCode.datasource.DataSource.get_all_actors')
+    @patch('ProductionCode.datasource.DataSource.get_all_media_titles')
+    def test_filter_form_queries_run_concurrently(self, mock_titles, mock_get_actors,
+                                                  mock_get_categories):
+        """
+        Test the three lists behind the filter form are fetched at the same time.
+        """
+        barrier = threading.Barrier(3, timeout=5)
+
+        def wait_for_others(result):
+            barrier.wait()
+            return result
+
+        mock_get_categories.side_effect = lambda: wait_for_others(['Comedy'])
+        mock_get_actors.side_effect = lambda: wait_for_others(['Actor Z'])
+        mock_titles.side_effect = lambda: wait_for_others(['Movie A'])
+
+        response = self.client.get('/filter')
+        self.assertIn("Comedy", response.data.decode())
+        self.assertFalse(barrier.broken)
 
+    @patch('ProductionCode.datasource.DataSource.get_all_categories')
+    def test_filter_form_database_error(self, mock_get_categories):
+        """
+        Test the filter form still renders when the category list fails.
+        """
+        mock_get_categories.side_effect = DatabaseError("DB error")
+        with patch('builtins.print'):
+            response = self.client.get('/filter')
+        self.assertIn("Keyword Search", response.data.decode())
+
+    @patch('app.ds.get_facet_counts', return_value=None)
     @patch('app.ds.get_media_by_advanced_filter')
-    def test_filter_results_all_filters(self, mock_filter):
+    def test_filter_results_all_filters(self, mock_filter, _mock_facets):
         """
         Test when all query parameters are provided,
         the correct database method is called and the results are displayed.
         """
-        mock_filter.return_value = [("movie", "Movie Title A", "Actor",
-                                      2020, "Drama", "Description", "Netflix")]
+        mock_filter.return_value = [Media("movie", "Movie Title A", "Actor",
+                                            2020, "Drama", "Description", "Netflix", 1)]
         response = self.client.get('/filter/results?actor=Actor&year=2021&category=Drama')
         self.assertIn("Movie Title A", response.data.decode())
 
+    @patch('app.ds.get_facet_counts', return_value=None)
     @patch('app.ds.get_media_by_advanced_filter')
-
-    def test_filter_results_actor_category(self, mock_filter):
+    def test_filter_results_actor_category(self, mock_filter, _mock_facets):
         """
         Test with only actor and category filters,
         the correct database method is called and the results are displayed.
         """
-        mock_filter.return_value = [("movie", "Action Star", "Some Actor", 2022,
-                                      "Action", "Explosive movie", "Hulu")]
+        mock_filter.return_value = [Media("movie", "Action Star", "Some Actor", 2022,
+                                            "Action", "Explosive movie", "Hulu", 2)]
         response = self.client.get('/filter/results?actor=Some+Actor&category=Action')
         self.assertIn("Action Star", response.data.decode())
-        mock_filter.assert_called_with("Some Actor", "0", "Action")
+        mock_filter.assert_called_with("Some Actor", "0", "Action",
+                                       match="exact", limit=51, after=None, before=None)
 
+    @patch('app.ds.get_facet_counts', return_value=None)
     @patch('app.ds.get_media_by_advanced_filter')
-    def test_filter_results_actor_year(self, mock_filter):
+    def test_filter_results_actor_year(self, mock_filter, _mock_facets):
         """
         Test /filter/results with actor and year filters,
         the correct database method is called and the results are displayed.
         """
-        mock_filter.return_value = [("movie", "Comeback", "Old Actor", 2019,
-                                      "Drama", "A comeback role", "Netflix")]
+        mock_filter.return_value = [Media("movie", "Comeback", "Old Actor", 2019,
+                                            "Drama", "A comeback role", "Netflix", 3)]
         response = self.client.get('/filter/results?actor=Old+Actor&year=2020')
         self.assertIn("Comeback", response.data.decode())
-        mock_filter.assert_called_with("Old Actor", "2019", "")
+        mock_filter.assert_called_with("Old Actor", "2019", "",
+                                       match="exact", limit=51, after=None, before=None)
 
+    @patch('app.ds.get_facet_counts', return_value=None)
     @patch('app.ds.get_media_by_advanced_filter')
-    def test_filter_results_category_year(self, mock_filter):
+    def test_filter_results_category_year(self, mock_filter, _mock_facets):
         """
         Test /filter/results with category and year filters,
         the correct database method is called and the results are displayed.
         """
-        mock_filter.return_value = [("movie", "Future Flick", "Lead", 2030,
-                                      "Sci-Fi", "Set in space", "Disney+")]
+        mock_filter.return_value = [Media("movie", "Future Flick", "Lead", 2030,
+                                            "Sci-Fi", "Set in space", "Disney+", 4)]
         response = self.client.get('/filter/results?category=Sci-Fi&year=2029')
         self.assertIn("Future Flick", response.data.decode())
-        mock_filter.assert_called_with("", "2028", "Sci-Fi")
+        mock_filter.assert_called_with("", "2028", "Sci-Fi",
+                                       match="exact", limit=51, after=None, before=None)
+
+class TestFacets(BaseTestCase):
+    """Test the facet counts shown with the filter results."""
+
+    @patch('app.ds.get_facet_counts')
+    @patch('app.ds.get_media_by_advanced_filter')
+    def test_facets_shown_with_narrowing_links(self, mock_filter, mock_facets):
+        """Test that facet counts are listed and link to a narrower search."""
+        mock_filter.return_value = [Media("Movie", "Comeback", "Old Actor", 2019,
+                                          "Drama", "A comeback role", "Netflix", 3)]
+        mock_facets.return_value = {"genre": [("Drama", 12), ("Comedy", 3)],
+                                    "decade": [(2010, 10), (1990, 5)],
+                                    "platform": [("Netflix", 15)],
+                                    "media_type": [("Movie", 15)]}
+        page = self.client.get('/filter/results?actor=Old+Actor').data.decode()
+        self.assertIn('href="/filter/results?actor=Old+Actor&amp;category=Comedy">Comedy</a> (3)',
+                      page)
+        self.assertIn("2010s (10)", page)
+        self.assertIn('href="/filter/results?actor=Old+Actor&amp;platform=Netflix">'
+                      'Netflix</a> (15)', page)
+        self.assertIn('href="/filter/results?actor=Old+Actor&amp;type=Movie">Movie</a> (15)', page)
+        mock_facets.assert_called_once_with("Old Actor", "0", "", match="exact")
+
+    @patch('app.ds.get_facet_counts', return_value=None)
+    @patch('app.ds.get_media_by_advanced_filter', return_value=[])
+    def test_platform_and_type_filters(self, mock_filter, mock_facets):
+        """Test that ?platform= and ?type= narrow both the results and the facets."""
+        self.client.get('/filter/results?category=Drama&platform=Hulu&type=TV+Show')
+        mock_filter.assert_called_once_with("", "0", "Drama", match="exact", platform="Hulu",
+                                            media_type="TV Show", limit=51, after=None,
+                                            before=None)
+        mock_facets.assert_called_once_with("", "0", "Drama", match="exact", platform="Hulu",
+                                            media_type="TV Show")
+
+    @patch('app.ds.get_facet_counts', side_effect=DatabaseError("facets failed"))
+    @patch('app.ds.get_media_by_advanced_filter')
+    def test_results_without_facets(self, mock_filter, _mock_facets):
+        """Test that results are still shown when the facet query fails."""
+        mock_filter.return_value = [Media("Movie", "Comeback", "Old Actor", 2019,
+                                          "Drama", "A comeback role", "Netflix", 3)]
+        with patch('builtins.print') as mock_print:
+            page = self.client.get('/filter/results?actor=Old+Actor').data.decode()
+        self.assertIn("Comeback", page)
+        self.assertNotIn('id="facets"', page)
+        mock_print.assert_called_once()
+
+class TestPagination(BaseTestCase):
+    """Test keyset pagination of the list routes."""
+
+    @staticmethod
+    def make_rows(count, year=2020):
+        """Returns count media rows from the same year, ordered by title."""
+        return [Media("movie", f"Title {i:03}", "Actor", year, "Drama", "Description",
+                      "Netflix", i) for i in range(count)]
+
+    @staticmethod
+    def make_summaries(count, year=2020):
+        """Returns count media summaries from the same year, ordered by title."""
+        return [MediaSummary(f"Title {i:03}", year, "Description", i) for i in range(count)]
+
+    @patch('app.ds.get_media_summaries')
+    def test_first_page_links_to_next(self, mock_get_movies):
+        """Test that a full first page shows 50 rows and a next link only."""
+        mock_get_movies.return_value = self.make_summaries(51)
+        page = self.client.get('/year/2019').data.decode()
+        self.assertIn("Title 049", page)
+        self.assertNotIn("Title 050", page)
+        self.assertIn("after=", page)
+        self.assertNotIn("before=", page)
+        mock_get_movies.assert_called_with(release_year=2018, match="exact",
+                                           limit=51, after=None, before=None)
+
+    @patch('app.ds.get_media_summaries')
+    def test_next_link_fetches_following_page(self, mock_get_movies):
+        """Test that following the next link asks for rows after the last one shown."""
+        mock_get_movies.return_value = self.make_summaries(51)
+        first = self.client.get('/year/2019').data.decode()
+        next_link = re.search(r'href="([^"]+)">Next', first).group(1)
+
+        mock_get_movies.return_value = self.make_summaries(3)
+        second = self.client.get(next_link.replace("&amp;", "&")).data.decode()
+        self.assertIn("before=", second)
+        self.assertNotIn(">Next<", second)
+        self.assertEqual(mock_get_movies.call_args.kwargs["after"], (2020, "Title 049", 49))
+
+    @patch('app.ds.get_facet_counts', return_value=None)
+    @patch('app.ds.get_media_by_advanced_filter')
+    def test_filter_results_keeps_filters_in_links(self, mock_filter, _mock_facets):
+        """Test that page links on the filter results keep the search filters."""
+        mock_filter.return_value = self.make_rows(51)
+        page = self.client.get('/filter/results?actor=Actor&category=Drama').data.decode()
+        self.assertIn('id="next_page"', page)
+        self.assertIn("actor=Actor", page)
+        self.assertIn("category=Drama", page)
+
+class TestHttpCaching(BaseTestCase):
+    """Test ETag, Last-Modified and Cache-Control handling on catalog routes."""
+
+    VERSION = 1_700_000_000_000_000
+
+    @patch('app.data_version.get', return_value=VERSION)
+    @patch('app.ds.get_media_summaries')
+    def test_validators_and_policy(self, mock_get_movies, _mock_version):
+        """Test that a catalog page carries an ETag, Last-Modified and Cache-Control."""
+        mock_get_movies.return_value = [MediaSummary("Movie", 2020, "About it.", 1)]
+        response = self.client.get('/category/Drama')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.headers['ETag'].startswith('W/'))
+        self.assertEqual(response.headers['Last-Modified'], 'Tue, 14 Nov 2023 22:13:20 GMT')
+        self.assertEqual(response.headers['Cache-Control'], 'public, max-age=300')
+
+    @patch('app.data_version.get', return_value=VERSION)
+    @patch('app.ds.get_media_summaries')
+    def test_matching_etag_gets_304_without_query(self, mock_get_movies, _mock_version):
+        """Test that a revalidation with a current ETag skips the view."""
+        mock_get_movies.return_value = [MediaSummary("Movie", 2020, "About it.", 1)]
+        etag = self.client.get('/actor/Emma').headers['ETag']
+        mock_get_movies.reset_mock()
+
+        response = self.client.get('/actor/Emma', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+        self.assertEqual(response.headers['ETag'], etag)
+        self.assertEqual(response.headers['Cache-Control'], 'public, max-age=300')
+        mock_get_movies.assert_not_called()
+
+    @patch('app.data_version.get', return_value=VERSION)
+    @patch('app.ds.get_media_summaries')
+    def test_if_modified_since(self, mock_get_movies, _mock_version):
+        """Test that a client holding the page since the last load gets 304."""
+        mock_get_movies.return_value = []
+        response = self.client.get(
+            '/year/2000', headers={'If-Modified-Since': 'Tue, 14 Nov 2023 22:13:20 GMT'})
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(
+            '/year/2000', headers={'If-Modified-Since': 'Mon, 13 Nov 2023 00:00:00 GMT'})
+        self.assertEqual(response.status_code, 200)
+
+    @patch('app.data_version.get')
+    @patch('app.ds.get_media_summaries', return_value=[])
+    def test_new_version_changes_etag(self, _mock_get_movies, mock_version):
+        """Test that a reload invalidates tags handed out before it."""
+        mock_version.return_value = self.VERSION
+        etag = self.client.get('/category/Drama').headers['ETag']
+        mock_version.return_value = self.VERSION + 1
+        response = self.client.get('/category/Drama', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    @patch('app.data_version.get', return_value=VERSION)
+    @patch('app.ds.get_all_categories', return_value=['Drama'])
+    @patch('app.get_suggestion_index')
+    def test_filter_form_policy(self, _mock_index, _mock_categories, _mock_version):
+        """Test that the search form is cached longer than result pages."""
+        response = self.client.get('/filter')
+        self.assertEqual(response.headers['Cache-Control'], 'public, max-age=3600')
+
+    @patch('app.data_version.get', return_value=None)
+    @patch('app.ds.get_media_summaries', return_value=[])
+    def test_unknown_version_is_not_cached(self, _mock_get_movies, _mock_version):
+        """Test that nothing is cached while the catalog version cannot be read."""
+        response = self.client.get('/category/Drama')
+        self.assertNotIn('ETag', response.headers)
+        self.assertNotIn('Cache-Control', response.headers)
+
+    @patch('app.data_version.get', return_value=VERSION)
+    @patch('app.ds.get_media_summaries', return_value=None)
+    def test_failed_query_is_not_cached(self, _mock_get_movies, _mock_version):
+        """Test that a page rendered after a failed query gets no validators."""
+        response = self.client.get('/actor/Tom Hanks')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response.headers)
+        self.assertEqual(response.headers['Cache-Control'], 'no-store')
+
+    @patch('app.data_version.get', return_value=VERSION)
+    @patch('app.ds.get_facet_counts', return_value=None)
+    @patch('app.ds.get_media_by_advanced_filter', side_effect=DatabaseError("down"))
+    def test_gathered_error_is_not_cached(self, _mock_filter, _mock_facets, _mock_version):
+        """Test that an error in a concurrently run query also prevents caching."""
+        with patch('builtins.print'):
+            response = self.client.get('/filter/results?category=Drama')
+        self.assertNotIn('ETag', response.headers)
+        self.assertEqual(response.headers['Cache-Control'], 'no-store')
+
+    @patch('app.data_version.get', return_value=VERSION)
+    @patch('app.ds.get_facet_counts', return_value=None)
+    @patch('app.ds.connect')
+    def test_streamed_error_is_not_cached(self, mock_connect, _mock_facets, _mock_version):
+        """Test that a whole listing whose cursor fails is not cached either."""
+        conn = mock_connect.return_value.getconn.return_value
+        conn.cursor.return_value.__enter__.return_value.execute.side_effect = DatabaseError("down")
+        with patch('builtins.print'):
+            response = self.client.get('/filter/results?category=Drama&all=1')
+        self.assertNotIn('ETag', response.headers)
+        self.assertEqual(response.headers['Cache-Control'], 'no-store')
+
+class TestFragmentCache(BaseTestCase):
+    """Test that catalog-only template fragments render once per catalog version."""
+
+    def setUp(self):
+        super().setUp()
+        webapp.fragment_cache.clear()
+
+    @patch('app.data_version.get')
+    @patch('app.ds.get_all_categories')
+    @patch('app.get_suggestion_index')
+    def test_category_options_cached_per_version(self, _mock_index, mock_categories,
+                                                  mock_version):
+        """Test that the category dropdown is reused until the version changes."""
+        mock_version.return_value = 1
+        mock_categories.return_value = ['Drama']
+        self.assertIn('value="Drama"', self.client.get('/filter').data.decode())
+
+        mock_categories.return_value = ['Comedy']
+        self.assertIn('value="Drama"', self.client.get('/filter').data.decode())
+
+        mock_version.return_value = 2
+        page = self.client.get('/filter').data.decode()
+        self.assertIn('value="Comedy"', page)
+        self.assertNotIn('value="Drama"', page)
+
+    @patch('app.data_version.get', return_value=1)
+    @patch('app.ds.get_all_categories')
+    @patch('app.get_suggestion_index')
+    def test_failed_category_options_not_cached(self, _mock_index, mock_categories,
+                                                _mock_version):
+        """Test that a dropdown left empty by a database error is rendered again."""
+        mock_categories.side_effect = DatabaseError("down")
+        with patch('builtins.print'):
+            self.assertNotIn('value="Drama"', self.client.get('/filter').data.decode())
+
+        mock_categories.side_effect = None
+        mock_categories.return_value = ['Drama']
+        self.assertIn('value="Drama"', self.client.get('/filter').data.decode())
+
+class TestStreaming(BaseTestCase):
+    """Test that result listings are streamed, and whole listings read through a stream."""
+
+    @patch('app.ds.get_media_summaries')
+    def test_page_is_streamed_with_all_link(self, mock_get_movies):
+        """Test that a listing page is streamed and links to the whole listing."""
+        mock_get_movies.return_value = [MediaSummary(f"Movie {i}", 2020, "About it.", i)
+                                        for i in range(webapp.PAGE_SIZE + 1)]
+        response = self.client.get('/category/Drama')
+        self.assertTrue(response.is_streamed)
+        page = response.data.decode()
+        self.assertIn("Movie 0", page)
+        self.assertIn('href="/category/Drama?all=1">All</a>', page)
+
+    @patch('app.ds.get_media_summaries')
+    @patch('app.ds.stream_media')
+    def test_all_streams_every_row(self, mock_stream, mock_get_movies):
+        """Test that ?all=1 lists every match from stream_media instead of a page."""
+        mock_stream.return_value = iter([MediaSummary(f"Movie {i}", 2020, "About it.", i)
+                                         for i in range(500)])
+        response = self.client.get('/actor/Emma?all=1')
+        page = response.data.decode()
+        self.assertIn("Movie 0", page)
+        self.assertIn("Movie 499", page)
+        self.assertNotIn("Next</a>", page)
+        mock_stream.assert_called_once_with(actor_name="Emma", match="exact",
+                                            record=MediaSummary)
+        mock_get_movies.assert_not_called()
+
+    @patch('app.ds.stream_media', return_value=iter([]))
+    def test_all_without_results(self, _mock_stream):
+        """Test that an empty whole listing gets the no results message."""
+        response = self.client.get('/year/2050?all=1')
+        self.assertIn("No movies found released after 2050", response.data.decode())
+
+    @patch('app.ds.get_facet_counts', return_value=None)
+    @patch('app.ds.stream_media')
+    def test_filter_results_all(self, mock_stream, _mock_facets):
+        """Test that the filter results page streams every match with ?all=1."""
+        mock_stream.return_value = iter([
+            Media("Movie", f"Film {i}", "Cast", 2020, "Drama", "About it.", "Netflix", i)
+            for i in range(200)])
+        response = self.client.get('/filter/results?category=Drama&all=1')
+        self.assertTrue(response.is_streamed)
+        page = response.data.decode()
+        self.assertIn("Film 199", page)
+        self.assertEqual(page.count('<ul class="result">'), 1)
+        self.assertLess(page.index("Film 199"), page.rindex('</ul>'))
+        mock_stream.assert_called_once_with('', '0', 'Drama', match='exact')
+
+    @patch('app.ds.get_facet_counts', return_value=None)
+    @patch('app.ds.stream_media')
+    def test_filter_results_all_counts_facets_first(self, mock_stream, mock_facets):
+        """
+        Test that ?all=1 reads the facet counts before its stream takes a
+        connection, so a request never holds one connection while waiting for another.
+        """
+        facets_read = []
+
+        def rows(*_args, **_kwargs):
+            facets_read.append(mock_facets.called)
+            yield Media("Movie", "Film", "Cast", 2020, "Drama", "About it.", "Netflix", 1)
+        mock_stream.side_effect = rows
+        self.client.get('/filter/results?category=Drama&all=1').close()
+        self.assertEqual(facets_read, [True])
+
+    @patch('app.ds.get_media_summaries', return_value=[])
+    def test_prefix_match_mode(self, mock_get_movies):
+        """Test that ?match=prefix is passed on and unknown modes fall back to exact."""
+        self.client.get('/actor/Tom?match=prefix')
+        self.assertEqual(mock_get_movies.call_args.kwargs["match"], "prefix")
+        self.client.get('/actor/Tom?match=anything')
+        self.assertEqual(mock_get_movies.call_args.kwargs["match"], "exact")
+
+    @patch('app.data_version.get', return_value=1)
+    @patch('app.ds.connect')
+    def test_failed_stream_reported(self, mock_connect, _mock_version):
+        """Test that a ?all=1 listing whose cursor fails says so and is not cached."""
+        conn = mock_connect.return_value.getconn.return_value
+        conn.cursor.return_value.__enter__.return_value.execute.side_effect = DatabaseError("down")
+        with patch('builtins.print'):
+            response = self.client.get('/actor/Tom Hanks?all=1')
+        self.assertEqual(response.data.decode(), webapp.LISTING_ERROR_MESSAGE)
+        self.assertNotIn('ETag', response.headers)
+        self.assertEqual(response.headers['Cache-Control'], 'no-store')
+
+    def test_buffered(self):
+        """Test that small pieces are joined into chunks of about the given size."""
+        self.assertEqual(list(webapp.buffered(["ab", "cd", "e", "fgh", "i"], 4)),
+                         ["abcd", "efgh", "i"])
+
+class TestCompression(BaseTestCase):
+    """Test that pages and static files are sent compressed to clients accepting gzip."""
+
+    @patch('app.data_version.get', return_value=1)
+    @patch('app.ds.get_media_summaries')
+    def test_result_page_is_gzipped(self, mock_get_movies, _mock_version):
+        """Test that a large results page is gzipped and revalidates by its encoded ETag."""
+        mock_get_movies.return_value = [MediaSummary(f"Movie {i}", 2020, "About it.", i)
+                                        for i in range(50)]
+        response = self.client.get('/category/Drama', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertIn("Movie 49", gzip.decompress(response.data).decode())
+
+        etag = response.headers['ETag']
+        self.assertTrue(etag.endswith('-gzip"'))
+        response = self.client.get('/category/Drama', headers={'Accept-Encoding': 'gzip',
+                                                               'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], etag)
+
+    def test_precompressed_stylesheet(self):
+        """Test that the stylesheet's precompressed copy is sent when there is one."""
+        with tempfile.TemporaryDirectory() as tempdir:
+            compressed = os.path.join(tempdir, 'stylesheet.css.gz')
+            with open(compressed, 'wb') as output:
+                output.write(gzip.compress(b"body { margin: 0; }"))
+            with patch('app.precompressed_path', return_value=(compressed, 'gzip')):
+                response = self.client.get('/static/stylesheet.css',
+                                           headers={'Accept-Encoding': 'gzip'})
+                self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+                self.assertEqual(response.mimetype, 'text/css')
+                self.assertEqual(gzip.decompress(response.data), b"body { margin: 0; }")
+                response.close()
+
+    def test_stylesheet_without_gzip(self):
+        """Test that clients not accepting gzip get the stylesheet as it is."""
+        response = self.client.get('/static/stylesheet.css')
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertIn(b"{", response.data)
+        response.close()
+
+    def test_static_path_outside_folder(self):
+        """Test that a static path leading out of the static folder is not found."""
+        with patch('builtins.print'):
+            response = self.client.get('/static/..%2fapp.py')
+        self.assertIn("404 - StreamSearch", response.data.decode())
+
+class TestTitleSearch(BaseTestCase):
+    """Test the title page route and its suggestions when no title matches."""
+
+    @patch('app.ds.get_similar_titles')
+    @patch('app.ds.get_media_from_title')
+    def test_title_found(self, mock_title, mock_similar):
+        """Test that a matching title is shown without looking for similar ones."""
+        mock_title.return_value = Media("Movie", "The Matrix", "Keanu Reeves", 1999,
+                                        "Action", "A hacker learns the truth.", "Hulu", 3)
+        page = self.client.get('/search?title_choice=the+matrix').data.decode()
+        self.assertIn("Keanu Reeves", page)
+        mock_similar.assert_not_called()
+
+    @patch('app.ds.get_similar_titles')
+    @patch('app.ds.get_media_from_title', return_value=None)
+    def test_did_you_mean(self, _mock_title, mock_similar):
+        """Test that a missed title lists similar titles once each, linked to their pages."""
+        mock_similar.return_value = [MediaSummary("The Matrix", 1999, "About it.", 3),
+                                     MediaSummary("The Matrix", 1999, "About it.", 9),
+                                     MediaSummary("The Matrix Reloaded", 2003, "More.", 4)]
+        page = self.client.get('/search?title_choice=The+Matrx').data.decode()
+        self.assertIn("Did you mean", page)
+        self.assertEqual(page.count('href="/search?title_choice=The+Matrix"'), 1)
+        self.assertIn("The Matrix Reloaded", page)
+        mock_similar.assert_called_once_with("The Matrx", webapp.SIMILAR_TITLES)
+
+    @patch('app.ds.get_similar_titles', return_value=None)
+    @patch('app.ds.get_media_from_title', return_value=None)
+    def test_no_similar_titles(self, _mock_title, _mock_similar):
+        """Test that a miss with nothing similar just says no results were found."""
+        page = self.client.get('/search?title_choice=zzzz').data.decode()
+        self.assertIn("No results found", page)
+        self.assertNotIn("Did you mean", page)
+
+class TestTextSearch(BaseTestCase):
+    """Test the keyword search route."""
+
+    @patch('app.ds.search_text')
+    def test_text_search_results(self, mock_search):
+        """Test that matching media are listed and the first page is requested."""
+        mock_search.return_value = [Media("movie", "Lighthouse", "Actor", 2019,
+                                           "Horror", "Two keepers on an island.", "Hulu", 5)]
+        response = self.client.get('/search/text?q=lighthouse')
+        self.assertIn("Lighthouse", response.data.decode())
+        self.assertNotIn("next_page", response.data.decode())
+        mock_search.assert_called_with("lighthouse", 21, 0)
+
+    @patch('app.ds.search_text')
+    def test_text_search_paging(self, mock_search):
+        """Test that a full page links to the next one and later pages link back."""
+        mock_search.return_value = [Media("movie", f"Title {i}", "", 2020, "", "", "Hulu", i)
+                                    for i in range(21)]
+        response = self.client.get('/search/text?q=title&page=2')
+        page = response.data.decode()
+        self.assertNotIn("Title 20", page)
+        self.assertIn("page=3", page)
+        self.assertIn("page=1", page)
+        mock_search.assert_called_with("title", 21, 20)
+
+    @patch('app.ds.search_text')
+    def test_text_search_empty_query(self, mock_search):
+        """Test that an empty query does not hit the database."""
+        response = self.client.get('/search/text?q=+')
+        self.assertIn("No matching movies or shows found", response.data.decode())
+        mock_search.assert_not_called()
+
+class TestAdminCache(BaseTestCase):
+    """Test for the cache statistics route."""
+
+    @patch('app.fragment_cache.stats', return_value={"hits": 2})
+    @patch('app.ds.prepared_stats', return_value={"plan_reuses": 5})
+    @patch('app.ds.pool_stats', return_value={"size": 1})
+    @patch('app.ds.cache_stats', return_value={"hits": 3, "misses": 1})
+    def test_cache_stats(self, _mock_cache, _mock_pool, _mock_prepared, _mock_fragments):
+        """Test that cache, pool and prepared statement counters are returned as JSON."""
+        response = self.client.get('/admin/cache')
+        self.assertEqual(response.get_json(),
+                         {"query_cache": {"hits": 3, "misses": 1}, "pool": {"size": 1},
+                          "prepared_statements": {"plan_reuses": 5},
+                          "fragment_cache": {"hits": 2}})
+
+class TestMetrics(BaseTestCase):
+    """Test for the Prometheus metrics route."""
+
+    @patch('app.ds.pool_stats', return_value={"in_use": 2})
+    @patch('app.ds.cache_stats', return_value={})
+    @patch('app.ds.get_media_summaries', return_value=[])
+    def test_metrics(self, _mock_category, _mock_cache, _mock_pool):
+        """Test that requests are timed by endpoint and pool gauges are reported."""
+        self.client.get('/category/Drama')
+        response = self.client.get('/metrics')
+        text = response.data.decode()
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        self.assertIn('streamsearch_request_duration_seconds_count{endpoint="search_by_category",'
+                      'method="GET",status="200"}', text)
+        self.assertIn('streamsearch_request_db_seconds_count{endpoint="search_by_category"}', text)
+        self.assertIn('streamsearch_pool_in_use 2', text)
+
+    @patch('app.metrics.REGISTRY.observe')
+    @patch('app.ds.get_facet_counts')
+    @patch('app.ds.get_media_by_advanced_filter')
+    def test_gathered_query_time(self, mock_filter, mock_facets, mock_observe):
+        """Test that queries run concurrently count towards their request's database time."""
+        def query(seconds, result):
+            def run(*_args, **_kwargs):
+                webapp.metrics.add_request_time('db', seconds)
+                return result
+            return run
+        mock_filter.side_effect = query(0.5, [])
+        mock_facets.side_effect = query(0.25, None)
+        self.client.get('/filter/results?category=Drama').close()
+        db_seconds = [call.args[1] for call in mock_observe.call_args_list
+                      if call.args[0] == 'streamsearch_request_db_seconds']
+        self.assertEqual(db_seconds, [0.75])
+
+    @patch('app.metrics.REGISTRY.observe')
+    @patch('app.ds.get_facet_counts', return_value=None)
+    @patch('app.ds.stream_media')
+    def test_streamed_page_timed_when_closed(self, mock_stream, _mock_facets, mock_observe):
+        """Test that a streamed page's time is recorded once it has been sent."""
+        def rows():
+            webapp.metrics.add_request_time('db', 0.5)
+            yield MediaSummary("Movie", 2020, "About it.", 1)
+        mock_stream.side_effect = lambda *args, **kwargs: rows()
+        with self.client.get('/filter/results?category=Drama&all=1') as response:
+            mock_observe.assert_not_called()
+            self.assertIn("Movie", response.data.decode())
+        observed = {call.args[0]: call.args[1] for call in mock_observe.call_args_list}
+        self.assertEqual(observed['streamsearch_request_db_seconds'], 0.5)
+        self.assertGreater(observed['streamsearch_request_render_seconds'], 0)
+
+class TestSuggest(BaseTestCase):
+    """Test the autocomplete suggestion endpoint."""
+
+    def setUp(self):
+        super().setUp()
+        self.indexes = patch.dict('app.suggestion_indexes', clear=True)
+        self.indexes.start()
+        self.addCleanup(self.indexes.stop)
+
+    @patch('app.ds.get_all_actors')
+    def test_actor_suggestions(self, mock_actors):
+        """Test that actor suggestions match the typed prefix."""
+        mock_actors.return_value = ['Brad Pitt', 'Sandra Bullock', 'Emma Stone']
+        response = self.client.get('/api/suggest?field=actor&q=sand')
+        self.assertEqual(response.get_json(), ['Sandra Bullock'])
+
+    @patch('app.ds.get_all_media_titles')
+    def test_title_suggestions_accept_term(self, mock_titles):
+        """Test that jQuery UI's default "term" argument is accepted."""
+        mock_titles.return_value = ['Movie A', 'Another Movie', 'Show B']
+        response = self.client.get('/api/suggest?field=title&term=movie')
+        self.assertEqual(response.get_json(), ['Movie A', 'Another Movie'])
+
+    @patch('app.ds.get_all_media_titles')
+    def test_index_built_once(self, mock_titles):
+        """Test that the suggestion index is built once and then reused."""
+        mock_titles.return_value = ['Movie A']
+        self.client.get('/api/suggest?field=title&q=mov')
+        self.client.get('/api/suggest?field=title&q=movi')
+        mock_titles.assert_called_once()
+
+    @patch('app.data_version.get')
+    @patch('app.ds.get_all_media_titles')
+    def test_index_rebuilt_for_new_version(self, mock_titles, mock_version):
+        """Test that a reload is picked up, and an unreadable version keeps the last index."""
+        mock_version.return_value = 1
+        mock_titles.return_value = ['Movie A']
+        self.client.get('/api/suggest?field=title&q=mov')
+
+        mock_version.return_value = 2
+        mock_titles.return_value = ['Movie B']
+        response = self.client.get('/api/suggest?field=title&q=mov')
+        self.assertEqual(response.get_json(), ['Movie B'])
+
+        mock_version.return_value = None
+        response = self.client.get('/api/suggest?field=title&q=mov')
+        self.assertEqual(response.get_json(), ['Movie B'])
+        self.assertEqual(mock_titles.call_count, 2)
+
+    @patch('app.ds.get_all_media_titles')
+    def test_suggestion_limit(self, mock_titles):
+        """Test that the limit argument caps the number of suggestions."""
+        mock_titles.return_value = [f'Movie {i}' for i in range(20)]
+        response = self.client.get('/api/suggest?field=title&q=movie&limit=3')
+        self.assertEqual(len(response.get_json()), 3)
+
+    def test_unknown_field(self):
+        """Test that an unsupported field is rejected."""
+        response = self.client.get('/api/suggest?field=director&q=abc')
+        self.assertEqual(response.status_code, 400)
 
 if __name__ == '__main__':
     unittest.main()
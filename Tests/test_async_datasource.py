@@ -0,0 +1,67 @@
+"""
+Unit tests for the AsyncDataSource class in async_datasource.py.
+"""
+import contextvars
+import threading
+import unittest
+from unittest.mock import MagicMock
+from ProductionCode.async_datasource import DEFAULT_WORKERS, AsyncDataSource
+from ProductionCode.datasource import DataSource
+
+REQUEST = contextvars.ContextVar("request", default=None)
+
+
+class TestAsyncDataSource(unittest.TestCase):
+    """Tests for awaiting DataSource methods on a thread pool."""
+
+    def setUp(self):
+        """Wraps a mock data source."""
+        self.ds = MagicMock()
+        self.ads = AsyncDataSource(self.ds, max_workers=3)
+
+    def tearDown(self):
+        """Stops the worker threads."""
+        self.ads.close()
+
+    def test_methods_are_awaitable(self):
+        """Test that wrapped methods run with their arguments and return results."""
+        self.ds.get_media_by_actor.return_value = [("Movie A",)]
+        results = self.ads.gather(self.ads.get_media_by_actor("Actor Y", limit=5))
+        self.assertEqual(results, [[("Movie A",)]])
+        self.ds.get_media_by_actor.assert_called_once_with("Actor Y", limit=5)
+
+    def test_errors_returned_in_place(self):
+        """Test that one failing call does not hide the others' results."""
+        self.ds.get_all_actors.side_effect = LookupError("DB error")
+        self.ds.get_all_categories.return_value = ["Comedy"]
+        actors, categories = self.ads.gather(self.ads.get_all_actors(),
+                                             self.ads.get_all_categories())
+        self.assertIsInstance(actors, LookupError)
+        self.assertEqual(categories, ["Comedy"])
+
+    def test_calls_run_concurrently(self):
+        """Test that gathered calls run at the same time on separate threads."""
+        barrier = threading.Barrier(3, timeout=5)
+        results = self.ads.gather(*(self.ads.call(barrier.wait) for _ in range(3)))
+        self.assertEqual(sorted(results), [0, 1, 2])
+
+    def test_calls_see_context_variables(self):
+        """Test that calls run in a copy of the caller's context."""
+        REQUEST.set("request 1")
+        try:
+            self.assertEqual(self.ads.gather(self.ads.call(REQUEST.get)), ["request 1"])
+        finally:
+            REQUEST.set(None)
+
+    def test_workers_match_connection_pool(self):
+        """Test that a DataSource gets one worker per pooled connection by default."""
+        ads = AsyncDataSource(DataSource(max_connections=7))
+        self.assertEqual(ads.executor._max_workers, 7)  # pylint: disable=protected-access
+        ads.close()
+        ads = AsyncDataSource(object())
+        self.assertEqual(ads.executor._max_workers,  # pylint: disable=protected-access
+                         DEFAULT_WORKERS)
+        ads.close()
+
+if __name__ == '__main__':
+    unittest.main()
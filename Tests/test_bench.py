@@ -0,0 +1,54 @@
+"""
+Unit tests for the helpers in Benchmarks/bench.py.
+"""
+import unittest
+from Benchmarks import bench
+
+
+def report(**p95s):
+    """Builds a minimal results JSON with the given p95 latencies."""
+    return {"results": {case: {"p95_ms": p95} for case, p95 in p95s.items()}}
+
+
+class TestBenchmarkHelpers(unittest.TestCase):
+    """Tests for scaling data, summarizing timings and spotting regressions."""
+
+    def test_scaled_rows(self):
+        """Test that copies keep every column except a renamed title."""
+        rows = [("Movie", "Title", "Cast", 2020, "Drama", "Desc", "Hulu", None)]
+        scaled = list(bench.scaled_rows(rows, 3))
+        self.assertEqual([row[1] for row in scaled], ["Title", "Title (2)", "Title (3)"])
+        self.assertEqual({row[2:] for row in scaled}, {rows[0][2:]})
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles."""
+        values = list(range(1, 101))
+        self.assertEqual(bench.percentile(values, 0.50), 50)
+        self.assertEqual(bench.percentile(values, 0.99), 99)
+        self.assertEqual(bench.percentile([7], 0.95), 7)
+        self.assertEqual(bench.percentile([], 0.95), 0.0)
+
+    def test_measure(self):
+        """Test that measurements count calls and items."""
+        stats = bench.measure(lambda: [1, 2, 3], repeat=4)
+        self.assertEqual(stats["calls"], 4)
+        self.assertEqual(stats["items_per_call"], 3)
+        self.assertLessEqual(stats["p50_ms"], stats["p99_ms"])
+
+    def test_benchmark_records(self):
+        """Test that every record type is timed and measured on the same rows."""
+        results = bench.benchmark_records(repeat=2, rows=100)
+        self.assertEqual(set(results), {"records.tuple", "records.dict", "records.Media"})
+        self.assertEqual(results["records.Media"]["items_per_call"], 100)
+        self.assertLess(results["records.Media"]["kb"], results["records.dict"]["kb"])
+
+    def test_compare(self):
+        """Test that only slowdowns past both thresholds are regressions."""
+        baseline = report(slower=10.0, noisy=0.1, faster=5.0)
+        current = report(slower=12.0, noisy=0.3, faster=4.0, new=1.0)
+        self.assertEqual(bench.compare(baseline, current, 0.1),
+                         [("slower", 10.0, 12.0)])
+        self.assertEqual(bench.compare(baseline, current, 0.5), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+"""
+Unit tests for the bitmap indexes in bitmap_index.py.
+"""
+import unittest
+from ProductionCode.bitmap_index import (BitmapIndex, bit_positions, filter_expression,
+                                         range_bitmap, to_bitmap)
+
+# (genre, platform, release year) of each entry, by position.
+ENTRIES = [
+    ("Drama", "Hulu", 2020),
+    ("Comedy", "Netflix", 2018),
+    ("Drama", "Netflix", 2015),
+    ("Documentary", "Hulu", None),
+    ("Comedy", "Hulu", 2001),
+]
+
+
+class TestBitmaps(unittest.TestCase):
+    """Tests for building and reading bitmaps."""
+
+    def test_to_bitmap(self):
+        """Test that a bitmap has exactly the given bits set."""
+        self.assertEqual(to_bitmap([0, 3, 9]), 0b1000001001)
+        self.assertEqual(to_bitmap([]), 0)
+        self.assertEqual(range_bitmap(2, 5), 0b11100)
+        self.assertEqual(range_bitmap(5, 2), 0)
+
+    def test_bit_positions(self):
+        """Test that set bits are read in order, either way, across empty bytes."""
+        positions = [0, 7, 8, 100, 1000, 1001]
+        bits = to_bitmap(positions)
+        self.assertEqual(list(bit_positions(bits)), positions)
+        self.assertEqual(list(bit_positions(bits, reverse=True)), positions[::-1])
+        self.assertEqual(list(bit_positions(0)), [])
+
+
+class TestBitmapIndex(unittest.TestCase):
+    """Tests for evaluating filter expressions."""
+
+    def setUp(self):
+        self.index = BitmapIndex(len(ENTRIES))
+        self.index.add_field("genre", enumerate(genre for genre, _, _ in ENTRIES))
+        self.index.add_field("platform", enumerate(platform for _, platform, _ in ENTRIES))
+        self.index.add_field("actor", [(0, "Emma Stone"), (2, "Emma Thompson"), (2, "Tom Hanks")],
+                             postings=True)
+        self.index.add_years(enumerate(year for _, _, year in ENTRIES))
+
+    def matches(self, expression):
+        """Returns the positions matching an expression."""
+        return list(bit_positions(self.index.evaluate(expression)))
+
+    def test_lookup(self):
+        """Test that values match ignoring case, whole or by prefix."""
+        self.assertEqual(self.matches(("genre", "drama")), [0, 2])
+        self.assertEqual(self.matches(("genre", "Do", "prefix")), [3])
+        self.assertEqual(self.matches(("actor", "EMMA STONE")), [0])
+        self.assertEqual(self.matches(("actor", "emma", "prefix")), [0, 2])
+        self.assertEqual(self.matches(("genre", "Horror")), [])
+
+    def test_boolean_operators(self):
+        """Test that and, or and not combine filters."""
+        self.assertEqual(self.matches(("and", ("genre", "Comedy"), ("platform", "Hulu"))), [4])
+        self.assertEqual(self.matches(("or", ("genre", "Comedy"), ("actor", "Tom Hanks"))),
+                         [1, 2, 4])
+        self.assertEqual(self.matches(("not", ("platform", "Hulu"))), [1, 2])
+        self.assertEqual(self.matches(("and",)), [0, 1, 2, 3, 4])
+        self.assertEqual(self.matches(("and", ("genre", "Drama"),
+                                       ("not", ("or", ("platform", "Netflix"),
+                                                ("genre", "Comedy"))))), [0])
+
+    def test_released_after(self):
+        """Test that year filters keep later years and drop unknown ones."""
+        self.assertEqual(self.matches(("after", 2015)), [0, 1])
+        self.assertEqual(self.matches(("after", 1900)), [0, 1, 2, 4])
+        self.assertEqual(self.matches(("after", 2020)), [])
+
+    def test_filter_expression(self):
+        """Test that empty filters are left out of list query expressions."""
+        self.assertEqual(filter_expression("", None, ""), ("and",))
+        self.assertEqual(filter_expression("Tom Hanks", 2000, "dr", "prefix"),
+                         ("and", ("after", 2000), ("actor", "Tom Hanks", "prefix"),
+                          ("genre", "dr", "prefix")))
+
+    def test_counts(self):
+        """Test that matches are counted per value, with values as first indexed."""
+        bits = self.index.evaluate(("after", 2010))
+        self.assertEqual(sorted(self.index.counts("genre", bits)), [("Comedy", 1), ("Drama", 2)])
+
+    def test_errors(self):
+        """Test that unknown fields, match modes and malformed nots are rejected."""
+        with self.assertRaises(KeyError):
+            self.index.evaluate(("director", "Nobody"))
+        with self.assertRaises(ValueError):
+            self.index.evaluate(("genre", "Drama", "fuzzy"))
+        with self.assertRaises(ValueError):
+            self.index.evaluate(("not", ("genre", "Drama"), ("genre", "Comedy")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,11 +3,13 @@ test_cl.py
 Unit tests for the command-line interface of the StreamSearch application.
 """
 
+import json
 import unittest
 import sys
 from unittest.mock import patch
 from io import StringIO
 import cl
+from ProductionCode.media import Media
 
 class MockDataSource:
     """
@@ -20,19 +22,32 @@ class MockDataSource:
         self.category_results = [["Title B", "2021", "Drama"]]
         self.year_results = [["Title C", "2023", "Comedy"]]
         self.combo_results = [["Title D", "2024", "Action"]]
+        self.text_results = [["Title E", "2020", "Mystery"]]
         self.empty_results = []
+        self.catalog = [Media("movie", f"Title {i}", "", 2020, "Drama", "", "Hulu", i)
+                        for i in range(5)]
 
-    def get_media_by_actor(self, actor):
+    def get_media_by_actor(self, actor, match="exact"):
         """
-        Return mock results if the actor matches 'Actor X', otherwise empty list.
+        Return mock results if the actor matches 'Actor X' (or, with
+        match="prefix", starts it), otherwise empty list.
         """
-        return self.actor_results if actor == "Actor X" else self.empty_results
+        if actor == "Actor X" or (match == "prefix" and "Actor X".startswith(actor)):
+            return self.actor_results
+        return self.empty_results
 
-    def get_media_by_category(self, category):
+    def get_media_by_category(self, category, limit=None, after=None, before=None,
+                              match="exact"):
         """
         Return mock results if the category matches 'Drama', otherwise empty list.
+        When paged, returns rows of a five-row catalog after the cursor instead.
         """
-        return self.category_results if category == "Drama" else self.empty_results
+        del match
+        if limit is None:
+            return self.category_results if category == "Drama" else self.empty_results
+        del before
+        start = after[2] + 1 if after else 0
+        return self.catalog[start:start + limit]
 
     def get_media_later_than(self, year):
         """
@@ -40,15 +55,49 @@ class MockDataSource:
         """
         return self.year_results if year == 2022 else self.empty_results
 
-    def get_media_by_advanced_filter(self, actor, year, category):
+    def get_media_by_advanced_filter(self, actor, year, category, match="exact", **options):
         """
         Return mock results if all three filters match specific expected values,
-        otherwise empty list.
+        or if the platform and type filters are Hulu movies, otherwise empty list.
         """
+        del match
+        columns = {column: options[column] for column in ("platform", "media_type")
+                   if column in options}
+        if columns:
+            hulu_movies = columns == {"platform": "Hulu", "media_type": "Movie"}
+            return self.combo_results if hulu_movies else self.empty_results
         if actor == "Actor X" and year == 2023 and category == "Action":
             return self.combo_results
         return self.empty_results
 
+    def search_text(self, query, limit=20, offset=0):
+        """
+        Return mock results if the query matches 'lighthouse', otherwise empty list.
+        """
+        if query != "lighthouse":
+            return self.empty_results
+        return (self.text_results * 3)[offset:offset + limit]
+
+    def stream_media(self, actor=None, year=None, category=None, match="exact", **columns):
+        """
+        Yield the mock results for whichever filters are given, one at a time.
+        """
+        if columns:
+            yield from self.get_media_by_advanced_filter(actor, year, category, **columns)
+        elif actor and not category and not year:
+            yield from self.get_media_by_actor(actor, match)
+        elif category and not actor and not year:
+            yield from self.get_media_by_category(category)
+        elif year and not actor and not category:
+            yield from self.get_media_later_than(year)
+        else:
+            yield from self.get_media_by_advanced_filter(actor, year, category)
+
+    def close(self):
+        """
+        Nothing to close.
+        """
+
 
 class TestCommandLineInterface(unittest.TestCase):
     """
@@ -59,7 +108,7 @@ class TestCommandLineInterface(unittest.TestCase):
         """
         Set up a patched version of the DataSource.
         """
-        self.patcher = patch("cl.DataSource", new=MockDataSource)
+        self.patcher = patch("cl.create_datasource", new=MockDataSource)
         self.patcher.start()
 
         self.captured_output = StringIO()
@@ -97,6 +146,13 @@ class TestCommandLineInterface(unittest.TestCase):
         output = self.call_main_with_args(["-a", "Actor X"])
         self.assertIn("Title A | 2022 | Action", output)
 
+        # A partial name matches only with --prefix.
+        self.captured_output.seek(0)
+        self.captured_output.truncate()
+        self.assertEqual(self.call_main_with_args(["-a", "Actor"]), "No matching results found.")
+        self.assertIn("Title A | 2022 | Action",
+                      self.call_main_with_args(["-a", "Actor", "--prefix"]))
+
     def test_filter_by_category(self):
         """
         Test filtering by category only.
@@ -121,9 +177,114 @@ class TestCommandLineInterface(unittest.TestCase):
         output = self.call_main_with_args(["-a", "Actor X", "-c", "Action", "-y", "2023"])
         self.assertIn("Title D | 2024 | Action", output)
 
+        # Platform and type filters go through the advanced filter, paged or not.
+        for extra in ([], ["-l", "5"]):
+            self.captured_output.seek(0)
+            self.captured_output.truncate()
+            output = self.call_main_with_args(["--platform", "Hulu", "--type", "Movie"] + extra)
+            self.assertIn("Title D | 2024 | Action", output)
+
     def test_no_results(self):
         """
         Test that the CLI properly handles when no results match the filter.
         """
         output = self.call_main_with_args(["-c", "Fantasy"])
         self.assertIn("No matching results found", output)
+
+    def test_text_search(self):
+        """
+        Test keyword search.
+        Should list every match returned by search_text(), read in batches.
+        """
+        output = self.call_main_with_args(["-t", "lighthouse"])
+        self.assertEqual(output.count("Title E | 2020 | Mystery"), 3)
+
+        ds = MockDataSource()
+        ds.text_results = [[f"Title {i}", "2020", "Mystery"] for i in range(4)]
+        matches = list(cl.all_text_matches(ds, "lighthouse", batch_size=5))
+        self.assertEqual(len(matches), 12)
+        self.assertEqual(matches[-1], ["Title 3", "2020", "Mystery"])
+
+    def test_text_search_overrides_filters(self):
+        """
+        Test that a keyword search ignores the other filters.
+        """
+        output = self.call_main_with_args(["-t", "lighthouse", "-c", "Drama"])
+        self.assertIn("Title E | 2020 | Mystery", output)
+        self.assertNotIn("Title B", output)
+
+    def test_limit_first_page(self):
+        """
+        Test that --limit shows only the first page of results.
+        """
+        output = self.call_main_with_args(["-c", "Drama", "-l", "2"])
+        self.assertIn("Title 0", output)
+        self.assertIn("Title 1", output)
+        self.assertNotIn("Title 2", output)
+
+    def test_limit_later_page(self):
+        """
+        Test that --page walks forward through the results.
+        """
+        output = self.call_main_with_args(["-c", "Drama", "-l", "2", "-p", "3"])
+        self.assertIn("Title 4", output)
+        self.assertNotIn("Title 3", output)
+
+    def test_page_past_end(self):
+        """
+        Test that a page beyond the last result shows no results.
+        """
+        output = self.call_main_with_args(["-c", "Drama", "-l", "2", "-p", "4"])
+        self.assertIn("No matching results found", output)
+
+    def test_text_search_page(self):
+        """
+        Test that keyword search pages by offset.
+        """
+        output = self.call_main_with_args(["-t", "lighthouse", "-l", "2", "-p", "2"])
+        self.assertEqual(output.count("Title E"), 1)
+
+    def test_csv_format(self):
+        """
+        Test that --format csv prints a header row and quotes fields as needed.
+        """
+        output = self.call_main_with_args(["-c", "Drama", "-f", "csv"])
+        self.assertEqual(output.splitlines(), ["media_type,title,media_cast", "Title B,2021,Drama"])
+
+    def test_jsonl_format(self):
+        """
+        Test that --format jsonl prints one JSON object per result.
+        """
+        output = self.call_main_with_args(["-y", "2022", "-f", "jsonl"])
+        self.assertEqual(json.loads(output),
+                         {"media_type": "Title C", "title": "2023", "media_cast": "Comedy"})
+
+    def test_machine_format_no_results(self):
+        """
+        Test that the no-results message stays out of csv output.
+        """
+        with patch("sys.stderr", new=StringIO()) as stderr:
+            output = self.call_main_with_args(["-c", "Fantasy", "-f", "csv"])
+        self.assertEqual(output, "")
+        self.assertIn("No matching results found", stderr.getvalue())
+
+    def test_results_printed_as_they_arrive(self):
+        """
+        Test that each row is printed before the next one is produced.
+        """
+        seen = []
+
+        def rows():
+            yield ("Title A",)
+            seen.append(self.captured_output.getvalue())
+            yield ("Title B",)
+
+        cl.display_results(rows())
+        self.assertEqual(seen, ["Title A\n"])
+
+    def test_invalid_limit(self):
+        """
+        Test that a non-positive --limit is rejected.
+        """
+        output = self.call_main_with_args(["-c", "Drama", "-l", "0"])
+        self.assertIn("must be positive", output)
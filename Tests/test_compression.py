@@ -0,0 +1,174 @@
+"""
+Unit tests for response compression and static file precompression in compression.py.
+"""
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+import zlib
+from ProductionCode.compression import (CompressionMiddleware, choose_encoding, is_compressible,
+                                        precompress, precompressed_path)
+
+PAGE = b"<p>" + b"A catalog row. " * 200 + b"</p>"
+
+
+def wsgi_app(status="200 OK", headers=None, body=(PAGE,)):
+    """Returns a WSGI app that always sends the given response."""
+    def application(_environ, start_response):
+        start_response(status, headers if headers is not None else
+                       [("Content-Type", "text/html; charset=utf-8"),
+                        ("Content-Length", str(sum(map(len, body)))),
+                        ("ETag", '"abc"')])
+        return list(body)
+    return application
+
+
+def call(application, **environ):
+    """Calls a WSGI app and returns (status, headers dict, body bytes)."""
+    started = {}
+
+    def start_response(status, headers, _exc_info=None):
+        started["status"], started["headers"] = status, dict(headers)
+
+    environ.setdefault("REQUEST_METHOD", "GET")
+    body = b"".join(application(environ, start_response))
+    return started["status"], started["headers"], body
+
+
+class TestChooseEncoding(unittest.TestCase):
+    """Tests for negotiating a Content-Encoding."""
+
+    def test_prefers_first_accepted(self):
+        """Test that the best encoding the client accepts is chosen."""
+        self.assertEqual(choose_encoding("gzip, deflate, br", ("br", "gzip")), "br")
+        self.assertEqual(choose_encoding("gzip, deflate", ("br", "gzip")), "gzip")
+
+    def test_quality_values(self):
+        """Test that q=0 refuses an encoding and a wildcard accepts the rest."""
+        self.assertEqual(choose_encoding("br;q=0, gzip;q=0.5", ("br", "gzip")), "gzip")
+        self.assertEqual(choose_encoding("*", ("br", "gzip")), "br")
+        self.assertIsNone(choose_encoding("identity", ("br", "gzip")))
+        self.assertIsNone(choose_encoding(None, ("gzip",)))
+        self.assertIsNone(choose_encoding("gzip", ()))
+
+    def test_is_compressible(self):
+        """Test that text types are compressed and binary ones are not."""
+        self.assertTrue(is_compressible("text/html; charset=utf-8"))
+        self.assertTrue(is_compressible("application/json"))
+        self.assertFalse(is_compressible("image/png"))
+        self.assertFalse(is_compressible(None))
+
+
+class TestCompressionMiddleware(unittest.TestCase):
+    """Tests for compressing responses on the fly."""
+
+    def test_compresses_large_html(self):
+        """Test that a large page is gzipped and its headers updated."""
+        status, headers, body = call(CompressionMiddleware(wsgi_app()),
+                                     HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(status, "200 OK")
+        self.assertEqual(headers["Content-Encoding"], "gzip")
+        self.assertEqual(headers["Vary"], "Accept-Encoding")
+        self.assertEqual(headers["ETag"], '"abc-gzip"')
+        self.assertNotIn("Content-Length", headers)
+        self.assertEqual(gzip.decompress(body), PAGE)
+        self.assertLess(len(body), len(PAGE))
+
+    def test_streamed_body_is_compressed(self):
+        """Test that a body sent in chunks without a length is compressed whole."""
+        application = wsgi_app(headers=[("Content-Type", "text/html")],
+                               body=(b"<p>one</p>", b"<p>two</p>"))
+        _, headers, body = call(CompressionMiddleware(application), HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(headers["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(body), b"<p>one</p><p>two</p>")
+
+    def test_streamed_chunks_are_flushed(self):
+        """Test that each chunk of a streamed body can be decoded as soon as it arrives."""
+        application = wsgi_app(headers=[("Content-Type", "text/html")],
+                               body=(b"<p>one</p>", b"<p>two</p>"))
+        started = []
+        chunks = CompressionMiddleware(application)(
+            {"REQUEST_METHOD": "GET", "HTTP_ACCEPT_ENCODING": "gzip"},
+            lambda status, headers, exc_info=None: started.append(status))
+        decoder = zlib.decompressobj(31)
+        self.assertEqual(decoder.decompress(next(chunks)), b"<p>one</p>")
+        self.assertEqual(decoder.decompress(next(chunks)), b"<p>two</p>")
+
+    def test_leaves_small_binary_and_encoded_alone(self):
+        """Test that responses not worth compressing pass through unchanged."""
+        cases = [
+            wsgi_app(body=(b"<p>short</p>",)),
+            wsgi_app(headers=[("Content-Type", "image/png"), ("Content-Length", str(len(PAGE)))]),
+            wsgi_app(headers=[("Content-Type", "text/css"), ("Content-Encoding", "gzip")]),
+            wsgi_app(headers=[("Content-Type", "text/html"),
+                              ("Cache-Control", "no-transform")]),
+            wsgi_app(status="404 NOT FOUND"),
+        ]
+        for application in cases:
+            _, headers, body = call(CompressionMiddleware(application),
+                                    HTTP_ACCEPT_ENCODING="gzip")
+            self.assertIn(body, (b"<p>short</p>", PAGE))
+            self.assertEqual(headers["Vary"], "Accept-Encoding")
+
+    def test_client_without_gzip(self):
+        """Test that clients not accepting an encoding get the plain page."""
+        _, headers, body = call(CompressionMiddleware(wsgi_app()))
+        self.assertNotIn("Content-Encoding", headers)
+        self.assertEqual(body, PAGE)
+
+    def test_revalidation_matches_app_etag(self):
+        """Test that a compressed ETag is matched back to the app's own tag."""
+        seen = {}
+
+        def application(environ, start_response):
+            seen["if_none_match"] = environ.get("HTTP_IF_NONE_MATCH")
+            start_response("304 NOT MODIFIED", [("ETag", '"abc"')])
+            return []
+
+        status, headers, _ = call(CompressionMiddleware(application),
+                                  HTTP_ACCEPT_ENCODING="gzip",
+                                  HTTP_IF_NONE_MATCH='"abc-gzip"')
+        self.assertEqual(seen["if_none_match"], '"abc"')
+        self.assertEqual(status, "304 NOT MODIFIED")
+        self.assertEqual(headers["ETag"], '"abc-gzip"')
+
+
+class TestPrecompress(unittest.TestCase):
+    """Tests for writing and finding precompressed static files."""
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tempdir, "stylesheet.css")
+        with open(self.path, "wb") as css:
+            css.write(b"body { margin: 0; }\n" * 100)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_precompress_writes_gzip(self):
+        """Test that a gzip copy is written that decompresses to the original."""
+        written = precompress(self.path)
+        self.assertIn(self.path + ".gz", written)
+        with open(self.path + ".gz", "rb") as compressed, open(self.path, "rb") as original:
+            self.assertEqual(gzip.decompress(compressed.read()), original.read())
+
+    def test_precompressed_path(self):
+        """Test that a fresh copy is found only for clients that accept it."""
+        self.assertEqual(precompressed_path(self.path, "gzip"), (None, None))
+        precompress(self.path)
+        self.assertEqual(precompressed_path(self.path, "gzip"), (self.path + ".gz", "gzip"))
+        self.assertEqual(precompressed_path(self.path, "identity"), (None, None))
+        self.assertEqual(precompressed_path(self.path + ".missing", "gzip"), (None, None))
+
+    def test_stale_copy_is_ignored(self):
+        """Test that a copy older than the original is not served."""
+        precompress(self.path)
+        for extension in (".gz", ".br"):
+            if os.path.exists(self.path + extension):
+                os.utime(self.path + extension, (0, 0))
+        self.assertEqual(precompressed_path(self.path, "gzip, br"), (None, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
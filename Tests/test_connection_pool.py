@@ -0,0 +1,130 @@
+"""
+Unit tests for the ConnectionPool class in connection_pool.py.
+Uses mock connections so no database is needed.
+"""
+import threading
+import unittest
+from unittest.mock import MagicMock
+import psycopg2
+from ProductionCode.connection_pool import ConnectionPool, PoolClosedError, PoolTimeoutError
+
+
+def make_connection():
+    """Returns a mock connection that reports itself as open."""
+    conn = MagicMock()
+    conn.closed = 0
+    return conn
+
+
+class TestConnectionPool(unittest.TestCase):
+    """Tests for borrowing, returning and replacing pooled connections."""
+
+    def setUp(self):
+        """Sets up a connection factory that records every connection it opens."""
+        self.opened = []
+
+        def connect():
+            conn = make_connection()
+            self.opened.append(conn)
+            return conn
+
+        self.connect = connect
+
+    def test_min_size_opened_up_front(self):
+        """Test that min_size connections are opened when the pool is created."""
+        pool = ConnectionPool(self.connect, min_size=2, max_size=4)
+        self.assertEqual(len(self.opened), 2)
+        self.assertEqual(pool.stats()["idle"], 2)
+
+    def test_connection_reused(self):
+        """Test that a returned connection is handed out again."""
+        pool = ConnectionPool(self.connect, min_size=1, max_size=2)
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            pass
+        self.assertIs(first, second)
+        self.assertEqual(len(self.opened), 1)
+        first.rollback.assert_called()
+
+    def test_grows_up_to_max_size(self):
+        """Test that concurrent borrowers get separate connections up to max_size."""
+        pool = ConnectionPool(self.connect, min_size=0, max_size=2, wait_timeout=0.01)
+        first = pool.getconn()
+        second = pool.getconn()
+        self.assertIsNot(first, second)
+        with self.assertRaises(PoolTimeoutError):
+            pool.getconn()
+        self.assertEqual(pool.stats()["timeouts"], 1)
+
+    def test_waiter_gets_returned_connection(self):
+        """Test that a borrower blocked on a full pool is woken by putconn()."""
+        pool = ConnectionPool(self.connect, min_size=1, max_size=1, wait_timeout=5)
+        conn = pool.getconn()
+        timer = threading.Timer(0.05, pool.putconn, args=(conn,))
+        timer.start()
+        self.assertIs(pool.getconn(), conn)
+        timer.join()
+        stats = pool.stats()
+        self.assertEqual(stats["waits"], 1)
+        self.assertGreater(stats["wait_seconds_max"], 0)
+
+    def test_closed_connection_replaced(self):
+        """Test that a connection found closed is discarded and replaced."""
+        pool = ConnectionPool(self.connect, min_size=1, max_size=1)
+        self.opened[0].closed = 1
+        conn = pool.getconn()
+        self.assertIs(conn, self.opened[1])
+        self.assertEqual(pool.stats()["discarded"], 1)
+
+    def test_idle_connection_health_checked(self):
+        """Test that an idle connection failing its ping is replaced."""
+        pool = ConnectionPool(self.connect, min_size=1, max_size=1,
+                              health_check_interval=0)
+        stale = self.opened[0]
+        stale.cursor.return_value.__enter__.return_value.execute.side_effect = (
+            psycopg2.OperationalError("server closed the connection")
+        )
+        conn = pool.getconn()
+        self.assertIsNot(conn, stale)
+        stale.close.assert_called_once()
+
+    def test_operational_error_discards_connection(self):
+        """Test that a connection-level error inside connection() discards it."""
+        pool = ConnectionPool(self.connect, min_size=1, max_size=1)
+        with self.assertRaises(psycopg2.OperationalError):
+            with pool.connection():
+                raise psycopg2.OperationalError("connection dropped")
+        self.assertEqual(pool.stats()["size"], 0)
+        self.opened[0].close.assert_called_once()
+
+    def test_failed_connect_frees_slot(self):
+        """Test that a failing connection factory does not leak pool capacity."""
+        pool = ConnectionPool(MagicMock(side_effect=ConnectionError("down")),
+                              min_size=0, max_size=1)
+        with self.assertRaises(ConnectionError):
+            pool.getconn()
+        self.assertEqual(pool.stats()["size"], 0)
+
+    def test_closeall_closes_borrowed_on_return(self):
+        """Test that a connection borrowed before closeall() is closed when returned."""
+        pool = ConnectionPool(self.connect, min_size=2, max_size=2)
+        borrowed = pool.getconn()
+        idle, = [conn for conn in self.opened if conn is not borrowed]
+        pool.closeall()
+        idle.close.assert_called_once()
+        borrowed.close.assert_not_called()
+
+        pool.putconn(borrowed)
+        borrowed.close.assert_called_once()
+        self.assertEqual((pool.stats()["size"], pool.stats()["idle"]), (0, 0))
+        with self.assertRaises(PoolClosedError):
+            pool.getconn()
+
+    def test_invalid_sizes(self):
+        """Test that inconsistent pool sizes are rejected."""
+        with self.assertRaises(ValueError):
+            ConnectionPool(self.connect, min_size=3, max_size=2)
+
+if __name__ == '__main__':
+    unittest.main()
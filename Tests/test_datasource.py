@@ -5,12 +5,20 @@ Uses mock objects to simulate database interactions.
 import unittest
 from unittest.mock import patch, MagicMock
 import psycopg2
-from ProductionCode.datasource import DataSource
+from ProductionCode.datasource import (DataSource, PreparingConnection, media_filters,
+                                       prepared_form)
+from ProductionCode.media import Media, MediaSummary
+from ProductionCode.connection_pool import ConnectionPool
+from ProductionCode.query_cache import QueryCache
 
-class TestDataSource(unittest.TestCase):
+
+def media_row(title, release_year=2020, media_id=1):
+    """Returns a database row for the media columns, as the cursor would."""
+    return ("Movie", title, "Actor", release_year, "Drama", "Description", "Netflix", media_id)
+
+class DataSourceTestCase(unittest.TestCase):
     """
-    Unit tests for the DataSource class in datasource.py.
-    Uses mock objects to simulate database interactions.
+    Shared setup for DataSource tests: a mock connection and cursor.
     """
 
     def setUp(self):
@@ -18,6 +26,7 @@ class TestDataSource(unittest.TestCase):
         Sets up a mock database connection and cursor.
         """
         self.mock_conn = MagicMock()
+        self.mock_conn.closed = 0
         self.mock_cursor = self.mock_conn.cursor.return_value
 
     def get_connected_datasource(self, mock_connect):
@@ -29,6 +38,13 @@ class TestDataSource(unittest.TestCase):
         ds.connect()
         return ds
 
+
+class TestDataSource(DataSourceTestCase):
+    """
+    Unit tests for the DataSource class in datasource.py.
+    Uses mock objects to simulate database interactions.
+    """
+
     @patch('ProductionCode.datasource.psycopg2.connect')
     def test_connect_success(self, mock_connect):
         """
@@ -36,50 +52,52 @@ class TestDataSource(unittest.TestCase):
         """
         mock_connect.return_value = self.mock_conn
         ds = DataSource()
-        conn = ds.connect()
+        pool = ds.connect()
 
-        self.assertEqual(conn, self.mock_conn)
+        self.assertIsInstance(pool, ConnectionPool)
+        self.assertEqual(ds.pool_stats()["size"], 1)
+        mock_connect.assert_called_once()
 
     @patch('ProductionCode.datasource.psycopg2.connect')
     def test_get_media_later_than(self, mock_connect):
         """
         Test get_movies_later_than returns expected movie data.
         """
-        self.mock_cursor.fetchall.return_value = [('Movie A', 2022)]
+        self.mock_cursor.fetchall.return_value = [media_row('Movie A', 2022)]
         ds = self.get_connected_datasource(mock_connect)
         result = ds.get_media_later_than(2020)
 
-        self.assertEqual(result, [('Movie A', 2022)])
+        self.assertEqual(result, [Media(*media_row('Movie A', 2022))])
 
     @patch('ProductionCode.datasource.psycopg2.connect')
     def test_get_media_by_actor(self, mock_connect):
         """
         Test get_movie_titles_by_actor returns movies matching actor name.
         """
-        self.mock_cursor.fetchall.return_value = [('Movie X', 'Actor Y')]
+        self.mock_cursor.fetchall.return_value = [media_row('Movie X')]
         ds = self.get_connected_datasource(mock_connect)
         result = ds.get_media_by_actor("Actor Y")
 
-        self.assertEqual(result, [('Movie X', 'Actor Y')])
+        self.assertEqual(result, [Media(*media_row('Movie X'))])
 
     @patch('ProductionCode.datasource.psycopg2.connect')
     def test_media_by_category(self, mock_connect):
         """
         Test get_movies_by_category returns movies matching category.
         """
-        self.mock_cursor.fetchall.return_value = [('Movie B', '2021')]
+        self.mock_cursor.fetchall.return_value = [media_row('Movie B', 2021)]
         ds = self.get_connected_datasource(mock_connect)
         result = ds.get_media_by_category("Horror")
 
-        self.assertEqual(result, [('Movie B', '2021')])
+        self.assertEqual(result, [Media(*media_row('Movie B', 2021))])
 
     @patch('ProductionCode.datasource.psycopg2.connect')
     def test_get_all_categories(self, mock_connect):
         """
-        Test get_all_categories returns unique categories split from comma-separated values.
+        Test get_all_categories returns the genre list in query order.
         """
-        self.mock_cursor.fetchall.return_value = [("Action, Drama",), ("Comedy",),
-                                                   ("Drama, Sci-Fi",)]
+        self.mock_cursor.fetchall.return_value = [("Action",), ("Comedy",),
+                                                   ("Drama",), ("Sci-Fi",)]
         ds = self.get_connected_datasource(mock_connect)
         result = ds.get_all_categories()
 
@@ -90,11 +108,11 @@ class TestDataSource(unittest.TestCase):
         """
         Test get_3_filter_media returns media filtered by actor, year, and category.
         """
-        self.mock_cursor.fetchall.return_value = [('Movie Z', 2023)]
+        self.mock_cursor.fetchall.return_value = [media_row('Movie Z', 2023)]
         ds = self.get_connected_datasource(mock_connect)
         result = ds.get_media_by_advanced_filter("Actor A", "2020", "Thriller")
 
-        self.assertEqual(result, [('Movie Z', 2023)])
+        self.assertEqual(result, [Media(*media_row('Movie Z', 2023))])
 
     @patch('ProductionCode.datasource.psycopg2.connect')
     def test_connect_database_error(self, mock_connect):
@@ -211,7 +229,8 @@ class TestDataSource(unittest.TestCase):
                 '1',
                 'Genre X',
                 'Movie about Actor X in Genre X.',
-                'Platform X'
+                'Platform X',
+                1
             ),
             (
                 'Movie',
@@ -220,21 +239,23 @@ class TestDataSource(unittest.TestCase):
                 '1',
                 'Genre Y',
                 'Movie about Actor Y in Genre Y.',
-                'Platform Y'
+                'Platform Y',
+                2
             )
         ]
         ds = self.get_connected_datasource(mock_connect)
         result = ds.get_media_from_title('Movie X')
         self.assertEqual(
             result,
-            (
+            Media(
                 'Movie',
                 'Movie X',
                 'Actor X',
                 '1',
                 'Genre X',
                 'Movie about Actor X in Genre X.',
-                'Platform X'
+                'Platform X',
+                1
             )
         )
 
@@ -244,9 +265,10 @@ class TestDataSource(unittest.TestCase):
         Test get_all_actors returns sorted list of unique actors.
         """
         self.mock_cursor.fetchall.return_value = [
-            ("Actor A, Actor B",),
+            ("Actor A",),
+            ("Actor B",),
             ("Actor C",),
-            ("Actor B, Actor D",)
+            ("Actor D",)
         ]
         ds = self.get_connected_datasource(mock_connect)
         result = ds.get_all_actors()
@@ -267,11 +289,583 @@ class TestDataSource(unittest.TestCase):
     @patch("ProductionCode.datasource.psycopg2.connect")
     def test_get_media_from_title(self, mock_connect):
         """Tests get_media_from_title method with a specific title."""
-        self.mock_cursor.fetchall.return_value = [('The Matrix', 1999)]
+        self.mock_cursor.fetchall.return_value = [media_row('The Matrix', 1999)]
         ds = self.get_connected_datasource(mock_connect)
 
         result = ds.get_media_from_title("The Matrix")
-        self.assertEqual(result, ('The Matrix', 1999))
+        self.assertEqual(result, Media(*media_row('The Matrix', 1999)))
+        query, params = self.mock_cursor.execute.call_args[0]
+        self.assertIn("lower(m.title) = lower(%s)", query)
+        self.assertNotIn("ILIKE", query)
+        self.assertEqual(params, ("The Matrix",))
+
+    @patch("ProductionCode.datasource.psycopg2.connect")
+    def test_get_similar_titles(self, mock_connect):
+        """Tests get_similar_titles ranks by trigram distance above the threshold."""
+        self.mock_cursor.fetchall.return_value = [("The Matrix", 1999, "About it.", 3)]
+        ds = self.get_connected_datasource(mock_connect)
+
+        result = ds.get_similar_titles("The Matrx", limit=3, threshold=0.4)
+        self.assertEqual(result, [MediaSummary("The Matrix", 1999, "About it.", 3)])
+        query, params = self.mock_cursor.execute.call_args[0]
+        self.assertIn("m.title %% %s", query)
+        self.assertIn("ORDER BY m.title <-> %s", query)
+        self.assertEqual(params, ("The Matrx", "The Matrx", 0.4, "The Matrx", 3))
+
+    @patch("ProductionCode.datasource.psycopg2.connect")
+    def test_get_similar_titles_query_error(self, mock_connect):
+        """Tests get_similar_titles returns None when the query fails."""
+        self.mock_cursor.execute.side_effect = psycopg2.ProgrammingError("no pg_trgm")
+        ds = self.get_connected_datasource(mock_connect)
+
+        with patch('builtins.print'):
+            self.assertIsNone(ds.get_similar_titles("The Matrx"))
+
+
+class TestDataSourcePool(DataSourceTestCase):
+    """
+    Unit tests for how DataSource borrows connections from its pool.
+    """
+
+    @patch('ProductionCode.datasource.psycopg2.connect')
+    def test_query_returns_connection_to_pool(self, mock_connect):
+        """
+        Test that a connection is handed back to the pool after each query.
+        """
+        self.mock_cursor.fetchall.return_value = []
+        ds = self.get_connected_datasource(mock_connect)
+        ds.get_media_later_than(2020)
+        ds.get_media_by_actor("Actor Y")
+
+        stats = ds.pool_stats()
+        self.assertEqual(stats["in_use"], 0)
+        self.assertEqual(stats["borrows"], 2)
+        mock_connect.assert_called_once()
+
+    @patch('ProductionCode.datasource.psycopg2.connect')
+    def test_query_reconnects_after_dropped_connection(self, mock_connect):
+        """
+        Test that a query is retried on a fresh connection when the pooled
+        connection has dropped.
+        """
+        dead_conn = MagicMock()
+        dead_conn.closed = 0
+        dead_conn.cursor.return_value.execute.side_effect = psycopg2.OperationalError("gone")
+        self.mock_cursor.fetchall.return_value = [media_row('Movie A', 2022)]
+        mock_connect.side_effect = [dead_conn, self.mock_conn]
+
+        ds = DataSource()
+        result = ds.get_media_later_than(2020)
+
+        self.assertEqual(result, [Media(*media_row('Movie A', 2022))])
+        dead_conn.close.assert_called_once()
+        self.assertEqual(ds.pool_stats()["discarded"], 1)
+
+class TestDataSourceQueries(DataSourceTestCase):
+    """
+    Unit tests for the SQL and parameters DataSource sends to the database.
+    """
+
+    @patch('ProductionCode.datasource.psycopg2.connect')
+    def test_get_media_by_actor_exact_name(self, mock_connect):
+        """
+        Test get_media_by_actor looks the actor up by whole name, not substring.
+        """
+        self.mock_cursor.fetchall.return_value = []
+        ds = self.get_connected_datasource(mock_connect)
+        ds.get_media_by_actor("Actor Y")
+
+        query, params = self.mock_cursor.execute.call_args[0]
+        self.assertIn("lower(a.actor) = lower(%s)", query)
+        self.assertEqual(params, ("Actor Y",))
+
+    @patch('ProductionCode.datasource.psycopg2.connect')
+    def test_get_media_by_actor_prefix(self, mock_connect):
+        """
+        Test prefix matching asks for the range of lower-cased names starting with the prefix.
+        """
+        self.mock_cursor.fetchall.return_value = []
+        ds = self.get_connected_datasource(mock_connect)
+        ds.get_media_by_actor("Tom", match="prefix")
+
+        query, params = self.mock_cursor.execute.call_args[0]
+        self.assertIn("lower(a.actor) ~>=~ %s AND lower(a.actor) ~<~ %s", query)
+        self.assertNotIn("LIKE", query)
+        self.assertEqual(params, ("tom", "ton"))
+
+    def test_media_filters_match_modes(self):
+        """
+        Test both name filters follow the match mode and unknown modes are refused.
+        """
+        conditions, params = media_filters("Emma", None, "Dram", match="prefix")
+        self.assertEqual(len(conditions), 2)
+        self.assertIn("lower(g.genre) ~>=~ %s", conditions[1])
+        self.assertEqual(params, ["emma", "emmb", "dram", "dran"])
+        with self.assertRaises(ValueError):
+            media_filters("Emma", match="substring")
+
+    def test_media_filters_columns(self):
+        """
+        Test platform and media type filters compare whole values and unknown columns are refused.
+        """
+        conditions, params = media_filters(release_year=2010, platform="hulu",
+                                           media_type="Movie")
+        self.assertEqual(conditions, ["lower(m.platform) = lower(%s)",
+                                      "lower(m.media_type) = lower(%s)",
+                                      "m.release_year > %s"])
+        self.assertEqual(params, ["hulu", "Movie", 2010])
+        self.assertEqual(media_filters(platform="", media_type=None), ([], []))
+        with self.assertRaises(TypeError):
+            media_filters(director="Nobody")
+
+    @patch('ProductionCode.datasource.psycopg2.connect')
+    def test_advanced_filter_by_platform_and_type(self, mock_connect):
+        """
+        Test platform and media type filters are sent alongside the paging arguments.
+        """
+        self.mock_cursor.fetchall.return_value = []
+        ds = self.get_connected_datasource(mock_connect)
+        ds.get_media_by_advanced_filter("", 2015, "", platform="Hulu", media_type="Movie",
+                                        limit=10)
+
+        query, params = self.mock_cursor.execute.call_args[0]
+        self.assertIn("lower(m.platform) = lower(%s)", query)
+        self.assertIn("lower(m.media_type) = lower(%s)", query)
+        self.assertEqual(params, ("Hulu", "Movie", 2015, 10))
+
+    @patch('ProductionCode.datasource.psycopg2.connect')
+    def test_media_by_advanced_filter_skips_empty_filters(self, mock_connect):
+        """
+        Test get_media_by_advanced_filter only joins the filters it was given.
+        """
+        self.mock_cursor.fetchall.return_value = []
+        ds = self.get_connected_datasource(mock_connect)
+        ds.get_media_by_advanced_filter("", "2020", "Thriller")
+
+        query, params = self.mock_cursor.execute.call_args[0]
+        self.assertNotIn("media_to_actors", query)
+        self.assertIn("media_to_genres", query)
+        self.assertEqual(params, ("2020", "Thriller"))
+
+    @patch('ProductionCode.datasource.psycopg2.connect')
+    def test_get_facet_counts(self, mock_connect):
+        """
+        Test get_facet_counts counts every facet in one GROUPING SETS query.
+        """
+        self.mock_cursor.fetchall.return_value = [
+            ("genre", "Drama", 4), ("genre", "Comedy", 9), ("genre", None, 1),
+            ("decade", "2010", 7), ("decade", "1990", 7),
+            ("platform", "Hulu", 14), ("media_type", "Movie", 14),
+        ]
+        ds = self.get_connected_datasource(mock_connect)
+        facets = ds.get_facet_counts(category="Drama", release_year=1980)
+
+        self.assertEqual(self.mock_cursor.execute.call_count, 1)
+        query, params = self.mock_cursor.execute.call_args[0]
+        self.assertIn("GROUPING SETS", query)
+        self.assertIn("WHERE m.release_year > %s AND m.id IN", query)
+        self.assertEqual(params, (1980, "Drama"))
+        self.assertEqual(facets, {"genre": [("Comedy", 9), ("Drama", 4)],
+                                  "decade": [(1990, 7), (2010, 7)],
+                                  "platform": [("Hulu", 14)],
+                                  "media_type": [("Movie", 14)]})
+
+    @patch('ProductionCode.datasource.psycopg2.connect')
+    def test_get_media_summaries_projects_columns(self, mock_connect):
+        """
+        Test get_media_summaries selects only the listed columns and names them.
+        """
+        self.mock_cursor.fetchall.return_value = [("Movie A", 2022, "About A.", 7)]
+        ds = self.get_connected_datasource(mock_connect)
+        result = ds.get_media_summaries(category="Drama", limit=51)
+
+        query, params = self.mock_cursor.execute.call_args[0]
+        self.assertIn("SELECT m.title, m.release_year, m.media_description, m.id FROM", query)
+        self.assertNotIn("media_cast", query)
+        self.assertEqual(params, ("Drama", 51))
+        self.assertEqual(result[0].title, "Movie A")
+        self.assertEqual(result[0].id, 7)
+
+    @patch('ProductionCode.datasource.psycopg2.connect')
+    def test_search_text(self, mock_connect):
+        """
+        Test search_text ranks full-text matches and passes paging arguments.
+        """
+        self.mock_cursor.fetchall.return_value = [media_row('Movie X')]
+        ds = self.get_connected_datasource(mock_connect)
+        result = ds.search_text("haunted lighthouse", limit=10, offset=20)
+
+        query, params = self.mock_cursor.execute.call_args[0]
+        self.assertEqual(result, [Media(*media_row('Movie X'))])
+        self.assertIn("search_vector @@ q", query)
+        self.assertIn("ts_rank", query)
+        self.assertEqual(params, ("haunted lighthouse", 10, 20))
+    @patch('ProductionCode.datasource.psycopg2.connect')
+    def test_page_after_cursor(self, mock_connect):
+        """
+        Test a page after a cursor continues in catalog order with a limit.
+        """
+        self.mock_cursor.fetchall.return_value = []
+        ds = self.get_connected_datasource(mock_connect)
+        ds.get_media_by_category("Drama", limit=11, after=(2020, "Title", 7))
+
+        query, params = self.mock_cursor.execute.call_args[0]
+        self.assertIn("(m.title, m.id) > (%s, %s)", query)
+        self.assertIn("ORDER BY m.release_year DESC, m.title, m.id LIMIT %s", query)
+        self.assertEqual(params, ("Drama", 2020, 2020, "Title", 7, 11))
+
+    @patch('ProductionCode.datasource.psycopg2.connect')
+    def test_page_before_cursor(self, mock_connect):
+        """
+        Test a page before a cursor is read backwards and returned in catalog order.
+        """
+        self.mock_cursor.fetchall.return_value = [media_row('Movie C'), media_row('Movie B')]
+        ds = self.get_connected_datasource(mock_connect)
+        result = ds.get_media_later_than(2000, limit=2, before=(2020, "Title", 7))
+
+        query, _ = self.mock_cursor.execute.call_args[0]
+        self.assertIn("(m.title, m.id) < (%s, %s)", query)
+        self.assertIn("ORDER BY m.release_year, m.title DESC, m.id DESC", query)
+        self.assertEqual(result, [Media(*media_row('Movie B')), Media(*media_row('Movie C'))])
+
+    @patch('ProductionCode.datasource.psycopg2.connect')
+    def test_no_limit_by_default(self, mock_connect):
+        """
+        Test list methods return every row when no limit is given.
+        """
+        self.mock_cursor.fetchall.return_value = []
+        ds = self.get_connected_datasource(mock_connect)
+        ds.get_media_by_actor("Actor Y")
+
+        query, _ = self.mock_cursor.execute.call_args[0]
+        self.assertNotIn("LIMIT", query)
+
+class TestDataSourceVocabularyCache(DataSourceTestCase):
+    """
+    Unit tests for caching the category and actor lists by catalog version.
+    """
+
+    def get_caching_datasource(self, mock_connect):
+        """
+        Helper function to return a connected DataSource with caching on.
+        """
+        mock_connect.return_value = self.mock_conn
+        ds = DataSource(cache_vocabularies=True)
+        ds.connect()
+        return ds
+
+    @patch('ProductionCode.datasource.psycopg2.connect')
+    def test_get_data_version(self, mock_connect):
+        """
+        Test get_data_version returns the stamp written by the loader.
+        """
+        self.mock_cursor.fetchall.return_value = [(42,)]
+        ds = self.get_connected_datasource(mock_connect)
+        self.assertEqual(ds.get_data_version(), 42)
+
+    @patch('ProductionCode.datasource.psycopg2.connect')
+    def test_cached_until_version_changes(self, mock_connect):
+        """
+        Test the actor list is reused for the same version and reloaded for a new one.
+        """
+        self.mock_cursor.fetchall.side_effect = [
+            [(1,)], [("Actor A",)],
+            [(1,)],
+            [(2,)], [("Actor A",), ("Actor B",)],
+        ]
+        ds = self.get_caching_datasource(mock_connect)
+
+        self.assertEqual(ds.get_all_actors(), ["Actor A"])
+        self.assertEqual(ds.get_all_actors(), ["Actor A"])
+        self.assertEqual(ds.get_all_actors(), ["Actor A", "Actor B"])
+
+    @patch('ProductionCode.datasource.psycopg2.connect')
+    def test_not_cached_without_version(self, mock_connect):
+        """
+        Test nothing is cached when the catalog version cannot be read.
+        """
+        self.mock_cursor.fetchall.side_effect = [
+            [], [("Comedy",)],
+            [], [("Comedy",), ("Drama",)],
+        ]
+        ds = self.get_caching_datasource(mock_connect)
+
+        self.assertEqual(ds.get_all_categories(), ["Comedy"])
+        self.assertEqual(ds.get_all_categories(), ["Comedy", "Drama"])
+
+class TestDataSourceQueryCache(DataSourceTestCase):
+    """
+    Unit tests for serving repeated queries from the query cache.
+    """
+
+    def get_caching_datasource(self, mock_connect):
+        """
+        Helper function to return a connected DataSource with a query cache.
+        """
+        mock_connect.return_value = self.mock_conn
+        ds = DataSource(query_cache=QueryCache())
+        ds.connect()
+        return ds
+
+    @patch('ProductionCode.datasource.psycopg2.connect')
+    def test_repeated_query_served_from_cache(self, mock_connect):
+        """
+        Test the same filter twice reaches the database once (plus the version check).
+        """
+        self.mock_cursor.fetchall.side_effect = [[(1,)], [media_row('Movie A')]]
+        ds = self.get_caching_datasource(mock_connect)
+
+        self.assertEqual(ds.get_media_by_category("Drama"), [Media(*media_row('Movie A'))])
+        self.assertEqual(ds.get_media_by_category("Drama"), [Media(*media_row('Movie A'))])
+        self.assertEqual(self.mock_cursor.execute.call_count, 2)
+        self.assertEqual(ds.cache_stats()["hits"], 1)
+
+    @patch('ProductionCode.datasource.psycopg2.connect')
+    def test_errors_not_cached(self, mock_connect):
+        """
+        Test a failed query is retried on the next call.
+        """
+        self.mock_cursor.fetchall.side_effect = [
+            [(1,)], psycopg2.ProgrammingError("Query error"), [media_row('Movie A')],
+        ]
+        ds = self.get_caching_datasource(mock_connect)
+
+        with patch('builtins.print'):
+            self.assertIsNone(ds.get_media_by_category("Drama"))
+        self.assertEqual(ds.get_media_by_category("Drama"), [Media(*media_row('Movie A'))])
+
+    @patch('ProductionCode.datasource.psycopg2.connect')
+    def test_new_version_invalidates(self, mock_connect):
+        """
+        Test a reload seen at the next version check empties the cache.
+        """
+        self.mock_cursor.fetchall.side_effect = [
+            [(1,)], [media_row('Movie A')],
+            [(2,)], [media_row('Movie B')],
+        ]
+        mock_connect.return_value = self.mock_conn
+        ds = DataSource(query_cache=QueryCache(version_check_interval=0))
+
+        self.assertEqual(ds.get_media_by_category("Drama"), [Media(*media_row('Movie A'))])
+        self.assertEqual(ds.get_media_by_category("Drama"), [Media(*media_row('Movie B'))])
+        self.assertEqual(ds.cache_stats()["version"], 2)
+
+    def test_no_stats_without_cache(self):
+        """
+        Test cache_stats is empty when caching is off.
+        """
+        self.assertEqual(DataSource().cache_stats(), {})
+
+class TestDataSourceStreaming(DataSourceTestCase):
+    """
+    Unit tests for streaming results through a server-side cursor.
+    """
+
+    def setUp(self):
+        """
+        Sets up the named cursor the stream reads from.
+        """
+        super().setUp()
+        self.named_cursor = self.mock_cursor.__enter__.return_value
+        self.named_cursor.__iter__.return_value = iter([media_row("Movie A"), media_row("Movie B")])
+
+    @patch('ProductionCode.datasource.psycopg2.connect')
+    def test_stream_media_uses_named_cursor(self, mock_connect):
+        """
+        Test stream_media reads from a named cursor with the given itersize.
+        """
+        ds = self.get_connected_datasource(mock_connect)
+        rows = ds.stream_media(category="Drama", itersize=50)
+
+        self.mock_conn.cursor.assert_not_called()
+        self.assertEqual(list(rows), [Media(*media_row("Movie A")), Media(*media_row("Movie B"))])
+        self.assertIn("name", self.mock_conn.cursor.call_args[1])
+        self.assertEqual(self.named_cursor.itersize, 50)
+        self.named_cursor.fetchall.assert_not_called()
+
+    @patch('ProductionCode.datasource.psycopg2.connect')
+    def test_stream_media_skips_missing_filters(self, mock_connect):
+        """
+        Test stream_media only filters on what it is given, in catalog order.
+        """
+        ds = self.get_connected_datasource(mock_connect)
+        list(ds.stream_media(actor_name="Actor Y"))
+
+        query, params = self.named_cursor.execute.call_args[0]
+        self.assertNotIn("release_year >", query)
+        self.assertIn("ORDER BY m.release_year DESC, m.title, m.id", query)
+        self.assertEqual(params, ("Actor Y",))
+
+    @patch('ProductionCode.datasource.record_query')
+    @patch('ProductionCode.datasource.psycopg2.connect')
+    def test_stream_media_summaries(self, mock_connect, mock_record):
+        """
+        Test stream_media selects only the summary columns when asked for MediaSummary
+        records, and records the streamed rows once they have all been read.
+        """
+        self.named_cursor.__iter__.return_value = iter([("Movie A", 2020, "About it.", 1)])
+        ds = self.get_connected_datasource(mock_connect)
+        rows = list(ds.stream_media(category="Drama", record=MediaSummary))
+        self.assertEqual(mock_record.call_args[0][2], [])
+        self.assertEqual(mock_record.call_args[1], {"fetched": (1, 32)})
+
+        query = self.named_cursor.execute.call_args[0][0]
+        self.assertTrue(query.startswith(
+            "SELECT m.title, m.release_year, m.media_description, m.id FROM"))
+        self.assertEqual(rows, [MediaSummary("Movie A", 2020, "About it.", 1)])
+
+    @patch('ProductionCode.datasource.psycopg2.connect')
+    def test_stream_returns_connection_when_closed_early(self, mock_connect):
+        """
+        Test a stream abandoned part way hands its connection back to the pool.
+        """
+        ds = self.get_connected_datasource(mock_connect)
+        rows = ds.stream_media(release_year=2000)
+        next(rows)
+        self.assertEqual(ds.pool_stats()["in_use"], 1)
+        rows.close()
+        self.assertEqual(ds.pool_stats()["in_use"], 0)
+
+    @patch('ProductionCode.datasource.record_query')
+    @patch('ProductionCode.datasource.psycopg2.connect')
+    def test_stream_query_error(self, mock_connect, mock_record):
+        """
+        Test a failing stream prints the error, yields nothing and is
+        recorded as a failed query.
+        """
+        self.named_cursor.execute.side_effect = psycopg2.ProgrammingError("Query error")
+        ds = self.get_connected_datasource(mock_connect)
+
+        with patch('builtins.print') as mock_print:
+            rows = list(ds.stream_media(release_year=2000))
+        self.assertEqual(rows, [])
+        mock_print.assert_called_once_with("Query failed: Query error")
+        self.assertIsNone(mock_record.call_args[0][2])
+
+
+class InvalidStatementName(psycopg2.OperationalError):
+    """Stands in for the error raised when a connection lost a prepared plan."""
+    pgcode = '26000'
+
+
+class IndeterminateDatatype(psycopg2.ProgrammingError):
+    """Stands in for the error raised when PREPARE cannot type a parameter."""
+    pgcode = '42P18'
+
+
+class UndefinedTable(psycopg2.ProgrammingError):
+    """Stands in for the error raised when a query names a missing table."""
+    pgcode = '42P01'
+
+
+class TestDataSourcePreparedStatements(DataSourceTestCase):
+    """
+    Unit tests for running queries as prepared statements.
+    """
+
+    def setUp(self):
+        """
+        Sets up a mock connection that tracks prepared statements.
+        """
+        super().setUp()
+        self.mock_conn = MagicMock(spec=PreparingConnection)
+        self.mock_conn.closed = 0
+        self.mock_conn.prepared_statements = set()
+        self.mock_cursor = self.mock_conn.cursor.return_value
+        self.mock_cursor.fetchall.return_value = [media_row('Movie A', 2022)]
+
+    def test_prepared_form(self):
+        """
+        Test placeholders are numbered and the name depends only on the query.
+        """
+        name, sql, count = prepared_form("SELECT %s WHERE a LIKE '%%x' AND b = %s")
+        self.assertEqual(sql, "SELECT $1 WHERE a LIKE '%x' AND b = $2")
+        self.assertEqual(count, 2)
+        self.assertTrue(name.startswith("streamsearch_"))
+        self.assertEqual(name, prepared_form("SELECT %s WHERE a LIKE '%%x' AND b = %s")[0])
+        self.assertNotEqual(name, prepared_form("SELECT 1")[0])
+
+    @patch('ProductionCode.datasource.psycopg2.connect')
+    def test_first_query_prepares_then_executes(self, mock_connect):
+        """
+        Test a query is prepared on first use and run with EXECUTE.
+        """
+        ds = self.get_connected_datasource(mock_connect)
+        result = ds.get_media_by_actor("Actor Y")
+
+        self.assertEqual(result, [Media(*media_row('Movie A', 2022))])
+        prepare, execute = self.mock_cursor.execute.call_args_list
+        self.assertTrue(prepare[0][0].startswith("PREPARE streamsearch_"))
+        self.assertIn("lower(a.actor) = lower($1)", prepare[0][0])
+        self.assertRegex(execute[0][0], r"^EXECUTE streamsearch_\w+ \(%s\)$")
+        self.assertEqual(execute[0][1], ("Actor Y",))
+        self.assertEqual(ds.prepared_stats()["prepares"], 1)
+
+    @patch('ProductionCode.datasource.psycopg2.connect')
+    def test_second_query_reuses_plan(self, mock_connect):
+        """
+        Test a query already prepared on the connection is only executed.
+        """
+        ds = self.get_connected_datasource(mock_connect)
+        ds.get_media_by_actor("Actor Y")
+        ds.get_media_by_actor("Actor Z")
+
+        self.assertEqual(self.mock_cursor.execute.call_count, 3)
+        last_query, last_params = self.mock_cursor.execute.call_args[0]
+        self.assertTrue(last_query.startswith("EXECUTE "))
+        self.assertEqual(last_params, ("Actor Z",))
+        stats = ds.prepared_stats()
+        self.assertEqual((stats["prepares"], stats["executions"], stats["plan_reuses"]),
+                         (1, 2, 1))
+
+    @patch('ProductionCode.datasource.psycopg2.connect')
+    def test_lost_plan_is_prepared_again(self, mock_connect):
+        """
+        Test a connection that lost its plans prepares the query again.
+        """
+        self.mock_cursor.fetchall.return_value = [("Drama",)]
+        ds = self.get_connected_datasource(mock_connect)
+        ds.get_all_categories()
+        self.mock_cursor.execute.side_effect = [InvalidStatementName("gone"), None, None]
+        result = ds.get_all_categories()
+
+        self.assertEqual(result, ['Drama'])
+        self.assertTrue(self.mock_cursor.execute.call_args_list[-2][0][0].startswith("PREPARE"))
+        self.assertEqual(ds.prepared_stats()["reprepares"], 1)
+
+    @patch('ProductionCode.datasource.psycopg2.connect')
+    def test_unpreparable_query_runs_plainly(self, mock_connect):
+        """
+        Test a query the server refuses to prepare runs unprepared from then on.
+        """
+        ds = self.get_connected_datasource(mock_connect)
+        self.mock_cursor.execute.side_effect = [IndeterminateDatatype("no"), None, None]
+        ds.get_media_later_than(2020)
+        ds.get_media_later_than(2021)
+
+        queries = [call[0][0] for call in self.mock_cursor.execute.call_args_list]
+        self.assertTrue(queries[0].startswith("PREPARE"))
+        self.assertIn("m.release_year > %s", queries[1])
+        self.assertIn("m.release_year > %s", queries[2])
+        self.assertEqual(ds.prepared_stats()["unprepared"], 2)
+
+    @patch('ProductionCode.datasource.psycopg2.connect')
+    def test_missing_table_prepared_again(self, mock_connect):
+        """
+        Test a query failing to prepare for a missing table is prepared
+        again on its next run rather than run unprepared for good.
+        """
+        ds = self.get_connected_datasource(mock_connect)
+        self.mock_cursor.execute.side_effect = [UndefinedTable("no media"), None, None]
+        with patch('builtins.print') as mock_print:
+            self.assertIsNone(ds.get_media_later_than(2020))
+        mock_print.assert_called_once_with("Query failed: no media")
+        ds.get_media_later_than(2021)
+
+        queries = [call[0][0] for call in self.mock_cursor.execute.call_args_list]
+        self.assertTrue(queries[1].startswith("PREPARE"))
+        self.assertTrue(queries[2].startswith("EXECUTE"))
+        self.assertEqual(ds.prepared_stats()["unprepared"], 0)
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,59 @@
+"""
+Unit tests for the FragmentCache class in fragment_cache.py.
+"""
+import unittest
+from unittest.mock import MagicMock
+from markupsafe import Markup
+from ProductionCode.fragment_cache import FragmentCache
+
+
+class TestFragmentCache(unittest.TestCase):
+    """Tests for caching rendered fragments in memory."""
+
+    def test_renders_once_per_version(self):
+        """Test that a fragment is rendered on the first use of each version only."""
+        cache = FragmentCache()
+        caller = MagicMock(return_value=Markup("<option>Drama</option>"))
+        self.assertEqual(cache.render("options", 1, caller), "<option>Drama</option>")
+        self.assertIsInstance(cache.render("options", 1, caller), Markup)
+        caller.assert_called_once()
+
+        cache.render("options", 2, caller)
+        self.assertEqual(caller.call_count, 2)
+        self.assertIsNone(cache.get("options", 1))
+        self.assertEqual(cache.stats()["entries"], 1)
+
+    def test_unknown_version_is_not_cached(self):
+        """Test that fragments are rendered every time without a version."""
+        cache = FragmentCache()
+        caller = MagicMock(return_value=Markup("x"))
+        cache.render("options", None, caller)
+        cache.render("options", None, caller)
+        self.assertEqual(caller.call_count, 2)
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_least_recently_used_dropped(self):
+        """Test that the bound evicts the fragment used longest ago."""
+        cache = FragmentCache(max_entries=2)
+        cache.put("a", 1, "A")
+        cache.put("b", 1, "B")
+        cache.get("a", 1)
+        cache.put("c", 1, "C")
+        self.assertEqual(cache.get("a", 1), "A")
+        self.assertIsNone(cache.get("b", 1))
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (2, 1, 2))
+
+    def test_bounded_by_max_entries(self):
+        """Test that many versions and names never keep more than max_entries fragments."""
+        cache = FragmentCache()
+        for version in range(100):
+            cache.put("category_options", version, "<option>Drama</option>" * 120)
+        self.assertEqual(cache.stats()["entries"], 1)
+        for name in range(100):
+            cache.put(f"fragment {name}", 1, "x")
+        self.assertEqual(cache.stats()["entries"], cache.stats()["max_entries"])
+        self.assertEqual(cache.stats()["max_entries"], 32)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+"""
+Unit tests for the HTTP caching helpers in http_cache.py.
+"""
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+from ProductionCode.http_cache import DataVersion, make_etag, version_time
+
+
+class TestValidators(unittest.TestCase):
+    """Tests for building ETags and Last-Modified times."""
+
+    def test_etag_is_stable(self):
+        """Test that the same page and version always get the same tag."""
+        first = make_etag("search_by_actor", {"name": "Emma"}, [("after", "x")], 7)
+        second = make_etag("search_by_actor", {"name": "Emma"}, [("after", "x")], 7)
+        self.assertEqual(first, second)
+        self.assertRegex(first, r"^[0-9a-f]{32}$")
+
+    def test_etag_changes_with_route_args_and_version(self):
+        """Test that any change to the page's inputs changes the tag."""
+        base = make_etag("search_by_actor", {"name": "Emma"}, [], 7)
+        self.assertNotEqual(base, make_etag("search_by_category", {"name": "Emma"}, [], 7))
+        self.assertNotEqual(base, make_etag("search_by_actor", {"name": "Emmy"}, [], 7))
+        self.assertNotEqual(base, make_etag("search_by_actor", {"name": "Emma"}, [("a", "1")], 7))
+        self.assertNotEqual(base, make_etag("search_by_actor", {"name": "Emma"}, [], 8))
+
+    def test_etag_ignores_query_order(self):
+        """Test that reordered query arguments name the same page."""
+        self.assertEqual(make_etag("filter_results", None, [("a", "1"), ("b", "2")], 1),
+                         make_etag("filter_results", None, [("b", "2"), ("a", "1")], 1))
+
+    def test_version_time(self):
+        """Test that a version in microseconds becomes a whole-second UTC time."""
+        self.assertEqual(version_time(1_700_000_000_654_321),
+                         datetime(2023, 11, 14, 22, 13, 20, tzinfo=timezone.utc))
+
+
+class TestDataVersion(unittest.TestCase):
+    """Tests for reading the catalog version at most once per interval."""
+
+    def test_reuses_version_within_interval(self):
+        """Test that repeated reads inside the interval do not query again."""
+        datasource = MagicMock()
+        datasource.get_data_version.side_effect = [1, 2]
+        version = DataVersion(datasource, interval=60)
+        self.assertEqual(version.get(), 1)
+        self.assertEqual(version.get(), 1)
+        datasource.get_data_version.assert_called_once()
+
+    def test_rereads_after_interval(self):
+        """Test that a new version is picked up once the interval passes."""
+        datasource = MagicMock()
+        datasource.get_data_version.side_effect = [1, 2]
+        version = DataVersion(datasource, interval=0)
+        self.assertEqual(version.get(), 1)
+        self.assertEqual(version.get(), 2)
+
+    def test_connection_error(self):
+        """Test that an unreachable database means an unknown version."""
+        datasource = MagicMock()
+        datasource.get_data_version.side_effect = ConnectionError("down")
+        with patch('builtins.print'):
+            self.assertIsNone(DataVersion(datasource).get())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+"""
+Unit tests for the CSV loader in loader.py.
+Uses the CSVs in Dummy_data/ and a mock connection, so no database is needed.
+"""
+import os
+import unittest
+from unittest.mock import MagicMock
+from ProductionCode import loader
+
+DUMMY_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Dummy_data")
+DUMMY_FILES = {
+    "Amazon Prime": os.path.join(DUMMY_DIR, "dummy_amazon.csv"),
+    "Netflix": os.path.join(DUMMY_DIR, "dummy_netflix.csv"),
+}
+
+
+class TestLoader(unittest.TestCase):
+    """Tests for turning platform CSVs into normalized tables."""
+
+    def setUp(self):
+        """Builds the catalog from the dummy Amazon and Netflix CSVs."""
+        self.rows = list(loader.read_platform_rows(DUMMY_FILES))
+        self.catalog = loader.build_catalog(self.rows)
+
+    def test_split_names(self):
+        """Test that names are trimmed and empty entries dropped."""
+        self.assertEqual(loader.split_names(" A,  B ,, C"), ["A", "B", "C"])
+        self.assertEqual(loader.split_names(None), [])
+
+    def test_read_platform_rows(self):
+        """Test that CSV columns are mapped onto the media columns with the platform."""
+        self.assertEqual(len(self.rows), 4)
+        media_type, title, cast, year, category, _, platform, director = self.rows[0]
+        self.assertEqual((media_type, title, year, platform, director),
+                         ("Movie", "The Grand Seduction", 2014, "Amazon Prime", "Don McKellar"))
+        self.assertTrue(cast.startswith("Brendan Gleeson"))
+        self.assertEqual(category, "Comedy, Drama")
+
+    def test_empty_cast_is_null(self):
+        """Test that an empty cast field becomes NULL rather than an empty string."""
+        self.assertIsNone(self.rows[2][2])
+
+    def test_media_ids(self):
+        """Test that media rows get sequential ids."""
+        self.assertEqual([row[0] for row in self.catalog["media"]], [0, 1, 2, 3])
+
+    def test_vocabulary_shared_across_media(self):
+        """Test that a genre used by several titles is stored once."""
+        genres = dict(self.catalog["genres"])
+        self.assertEqual(list(genres.values()).count("Drama"), 1)
+        drama = next(i for i, name in genres.items() if name == "Drama")
+        self.assertIn((0, drama), self.catalog["media_to_genres"])
+        self.assertIn((1, drama), self.catalog["media_to_genres"])
+
+    def test_vocabulary_ignores_case(self):
+        """Test that names differing only in case share one id."""
+        vocabulary = loader.Vocabulary()
+        self.assertEqual(vocabulary.id_for("Don McKellar"), vocabulary.id_for("don mckellar"))
+        self.assertEqual(vocabulary.rows, [(0, "Don McKellar")])
+
+    def test_links_deduplicated(self):
+        """Test that a name repeated within one title is linked once."""
+        catalog = loader.build_catalog([
+            ("Movie", "T", "A, A", 2020, "Drama", "D", "Hulu", None),
+        ])
+        self.assertEqual(catalog["media_to_actors"], [(0, 0)])
+
+    def test_copy_rows_in_batches(self):
+        """Test that rows are sent as CSV, one COPY per batch, with NULLs left empty."""
+        cursor = MagicMock()
+        batches = []
+        cursor.copy_expert.side_effect = lambda statement, buffer: batches.append(buffer.read())
+        rows = [(0, "A"), (1, None), (2, 'Say "hi", x')]
+
+        count = loader.copy_rows(cursor, "actors", rows, batch_size=2)
+
+        self.assertEqual(count, 3)
+        self.assertEqual(batches, ["0,A\r\n1,\r\n", '2,"Say ""hi"", x"\r\n'])
+        statement = cursor.copy_expert.call_args[0][0]
+        self.assertEqual(statement, "COPY actors (id, actor) FROM STDIN WITH (FORMAT csv)")
+
+    def test_load_catalog(self):
+        """
+        Test that every table is copied into the load schema between the
+        schema and index scripts, then swapped in within one transaction.
+        """
+        connection = MagicMock()
+        cursor = connection.cursor.return_value.__enter__.return_value
+        cursor.fetchone.return_value = ("public",)
+
+        report = loader.load_catalog(connection, self.rows)
+
+        statements = [call[0][0] for call in cursor.execute.call_args_list]
+        self.assertIn("SET LOCAL search_path TO streamsearch_load", statements)
+        self.assertLess(statements.index("CREATE EXTENSION IF NOT EXISTS pg_trgm SCHEMA public"),
+                        statements.index("SET LOCAL search_path TO streamsearch_load"))
+        self.assertIn("public.gist_trgm_ops", next(s for s in statements if "trgm_idx" in s))
+        schema = statements.index(next(s for s in statements if "CREATE TABLE media" in s))
+        indexes = statements.index(next(s for s in statements if "CREATE INDEX" in s))
+        drop = statements.index(next(s for s in statements
+                                     if s.startswith("DROP TABLE IF EXISTS public.")))
+        self.assertLess(schema, indexes)
+        self.assertLess(indexes, drop)
+        self.assertIn("public.stream_data", statements[drop])
+        self.assertIn("ALTER TABLE streamsearch_load.media SET SCHEMA public", statements)
+        self.assertEqual(statements[-1], "DROP SCHEMA streamsearch_load")
+
+        copied = [call[0][0].split()[1] for call in cursor.copy_expert.call_args_list]
+        self.assertEqual(sorted(copied + ["catalog_version"]), sorted(loader.TABLE_COLUMNS))
+        self.assertTrue(any("INSERT INTO catalog_version" in s for s in statements))
+        self.assertEqual(report["media"][0], 4)
+        connection.__enter__.assert_called_once()
+        connection.__exit__.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+"""
+Unit tests for the media record types in media.py.
+"""
+import unittest
+from ProductionCode.media import MEDIA_FIELDS, Media, MediaSummary
+
+ROW = ("Movie", "The Grand Seduction", "Brendan Gleeson, Taylor Kitsch", 2014,
+       "Comedy, Drama", "A small fishing village must procure a doctor.", "Amazon Prime", 0)
+
+
+class TestMedia(unittest.TestCase):
+    """Tests for the Media record."""
+
+    def test_fields_by_name(self):
+        """Test that every column is readable by its field name."""
+        media = Media(*ROW)
+        self.assertEqual(media.title, "The Grand Seduction")
+        self.assertEqual(media.release_year, 2014)
+        self.assertEqual(media.id, 0)
+        self.assertEqual(media.as_dict(), dict(zip(MEDIA_FIELDS, ROW)))
+
+    def test_from_rows(self):
+        """Test that a batch of rows becomes records in the same order."""
+        rows = [ROW, ROW[:1] + ("Other",) + ROW[2:]]
+        records = Media.from_rows(rows)
+        self.assertEqual([media.title for media in records], ["The Grand Seduction", "Other"])
+        self.assertEqual(Media.from_rows([]), [])
+
+    def test_sequence_behaviour(self):
+        """Test that records iterate in field order and compare by value."""
+        media = Media(*ROW)
+        self.assertEqual(tuple(media), ROW)
+        self.assertEqual(len(media), len(MEDIA_FIELDS))
+        self.assertEqual(media, Media(*ROW))
+        self.assertEqual(len({media, Media(*ROW)}), 1)
+        self.assertNotEqual(media, ROW)
+
+    def test_slots(self):
+        """Test that records have no per-instance dict and reject unknown fields."""
+        media = Media(*ROW)
+        self.assertFalse(hasattr(media, "__dict__"))
+        with self.assertRaises(AttributeError):
+            media.rating = 5
+
+    def test_wrong_number_of_fields(self):
+        """Test that a row of the wrong shape is rejected."""
+        with self.assertRaises(TypeError):
+            Media("Movie", "Title")
+
+
+class TestMediaSummary(unittest.TestCase):
+    """Tests for the MediaSummary record."""
+
+    def test_from_rows(self):
+        """Test that summary rows become named records."""
+        summary, = MediaSummary.from_rows([("Title", 2020, "About it.", 3)])
+        self.assertEqual((summary.title, summary.release_year, summary.id), ("Title", 2020, 3))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,213 @@
+"""
+Unit tests for the MemoryDataSource class in memory_datasource.py
+and for choosing a backend in backends.py.
+Uses the CSVs in Dummy_data/, so no database is needed.
+"""
+import os
+import unittest
+from unittest.mock import patch
+from ProductionCode.backends import create_datasource
+from ProductionCode.datasource import DataSource
+from ProductionCode.media import Media, MediaSummary
+from ProductionCode.memory_datasource import MemoryDataSource, trigrams
+from ProductionCode.pagination import fetch_page, row_key
+
+DUMMY_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Dummy_data")
+DUMMY_FILES = {
+    "Amazon Prime": os.path.join(DUMMY_DIR, "dummy_amazon.csv"),
+    "Disney+": os.path.join(DUMMY_DIR, "dummy_disney.csv"),
+    "Hulu": os.path.join(DUMMY_DIR, "dummy_hulu.csv"),
+    "Netflix": os.path.join(DUMMY_DIR, "dummy_netflix.csv"),
+}
+
+
+def titles(rows):
+    """Returns the titles of media records."""
+    return [row.title for row in rows]
+
+
+class TestMemoryDataSource(unittest.TestCase):
+    """Tests for answering DataSource queries from the dummy CSVs."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Loads the dummy catalog once."""
+        cls.ds = MemoryDataSource(DUMMY_FILES)
+
+    def test_rows_match_datasource_shape(self):
+        """Test that records have the DataSource fields, ending with the id."""
+        row = self.ds.get_media_from_title("the grand seduction")
+        self.assertIsInstance(row, Media)
+        self.assertEqual((row.media_type, row.title), ("Movie", "The Grand Seduction"))
+        self.assertEqual((row.release_year, row.category, row.platform, row.id),
+                         (2014, "Comedy, Drama", "Amazon Prime", 0))
+        self.assertIsNone(self.ds.get_media_from_title("No Such Title"))
+
+    def test_get_similar_titles(self):
+        """Test that titles are suggested by trigram similarity, best first."""
+        similar = self.ds.get_similar_titles("the grand seducton")
+        self.assertIsInstance(similar[0], MediaSummary)
+        self.assertEqual(similar[0].title, "The Grand Seduction")
+        self.assertEqual(self.ds.get_similar_titles("the grand seducton", threshold=0.99), [])
+        self.assertEqual(self.ds.get_similar_titles("!!"), [])
+
+    def test_trigrams(self):
+        """Test that trigrams are taken per lower-cased word, padded like pg_trgm's."""
+        self.assertEqual(trigrams("Cat"), {"  c", " ca", "cat", "at "})
+        self.assertEqual(trigrams("a-b"), {"  a", " a ", "  b", " b "})
+
+    def test_get_media_later_than(self):
+        """Test that only later media are returned, newest first then by title."""
+        self.assertEqual(titles(self.ds.get_media_later_than(2019)), [
+            "Blood & Water", "Ricky Velez: Here's Everything",
+            "Dick Johnson Is Dead", "Silent Night",
+        ])
+        self.assertEqual(self.ds.get_media_later_than(2021), [])
+
+    def test_get_media_by_actor(self):
+        """Test that actor names match whole cast members ignoring case."""
+        self.assertEqual(titles(self.ds.get_media_by_actor("jim varney")),
+                         ["Ernest Saves Christmas"])
+        self.assertEqual(self.ds.get_media_by_actor("Jim"), [])
+
+    def test_prefix_match(self):
+        """Test that prefix mode matches names starting with the filter, ignoring case."""
+        self.assertEqual(titles(self.ds.get_media_by_actor("jim v", match="prefix")),
+                         ["Ernest Saves Christmas"])
+        self.assertEqual(titles(self.ds.get_media_by_category("COM", match="prefix")),
+                         titles(self.ds.get_media_by_category("Comedy")))
+        self.assertEqual(self.ds.get_media_by_actor("Varney", match="prefix"), [])
+        with self.assertRaises(ValueError):
+            self.ds.get_media_by_actor("Jim", match="substring")
+
+    def test_get_media_by_category(self):
+        """Test that categories match whole genres ignoring case."""
+        self.assertEqual(titles(self.ds.get_media_by_category("comedy")), [
+            "Ricky Velez: Here's Everything", "The Grand Seduction", "Ernest Saves Christmas",
+        ])
+
+    def test_get_media_by_advanced_filter(self):
+        """Test that every given filter applies and empty ones are skipped."""
+        self.assertEqual(titles(self.ds.get_media_by_advanced_filter("", "2000", "Comedy")),
+                         ["Ricky Velez: Here's Everything", "The Grand Seduction"])
+        self.assertEqual(titles(self.ds.get_media_by_advanced_filter(
+            "Brendan Gleeson", 0, "Drama")), ["The Grand Seduction"])
+        self.assertEqual(self.ds.get_media_by_advanced_filter("Jim Varney", 0, "Drama"), [])
+
+    def test_keyset_pages(self):
+        """Test that pages walk forwards and backwards through the catalog."""
+        fetch = self.ds.get_media_later_than
+        first = fetch(0, limit=3)
+        second = fetch(0, limit=3, after=row_key(first[-1]))
+        self.assertEqual(titles(first + second), titles(self.ds.get_media_later_than(0))[:6])
+        self.assertEqual(fetch(0, limit=3, before=row_key(second[0])), first)
+
+    def test_works_with_fetch_page(self):
+        """Test that pagination helpers page the memory backend like the database."""
+        page = fetch_page(lambda **paging: self.ds.get_media_by_category("Comedy", **paging), 2)
+        self.assertEqual(len(page.rows), 2)
+        page = fetch_page(lambda **paging: self.ds.get_media_by_category("Comedy", **paging),
+                          2, after=page.next_cursor)
+        self.assertEqual(titles(page.rows), ["Ernest Saves Christmas"])
+        self.assertIsNone(page.next_cursor)
+
+    def test_get_media_summaries(self):
+        """Test that summaries list the same media as full rows, with fewer fields."""
+        summaries = self.ds.get_media_summaries(release_year=2000, category="Comedy", limit=1)
+        full = self.ds.get_media_by_advanced_filter("", 2000, "Comedy", limit=1)
+        self.assertEqual(summaries[0]._fields, ("title", "release_year", "media_description", "id"))
+        self.assertEqual(tuple(summaries[0]), (full[0].title, full[0].release_year,
+                                               full[0].media_description, full[0].id))
+        page = fetch_page(lambda **paging: self.ds.get_media_summaries(
+            category="Comedy", **paging), 2)
+        self.assertEqual(row_key(page.rows[-1]),
+                         row_key(self.ds.get_media_by_category("Comedy")[1]))
+
+    def test_get_facet_counts(self):
+        """Test that facets count the filtered media by genre, decade, platform and type."""
+        facets = self.ds.get_facet_counts(category="Comedy")
+        self.assertEqual(facets["genre"][0], ("Comedy", 3))
+        self.assertIn(("Drama", 1), facets["genre"])
+        self.assertEqual(sum(count for _, count in facets["platform"]), 3)
+        self.assertEqual(sum(count for _, count in facets["media_type"]), 3)
+        self.assertEqual(sorted(facets["decade"]), [(1980, 1), (2010, 1), (2020, 1)])
+
+    def test_platform_and_type_filters(self):
+        """Test that platform and media type narrow results, facets and streams."""
+        hulu = self.ds.get_media_by_advanced_filter("", None, "", platform="hulu")
+        self.assertTrue(hulu)
+        self.assertEqual({row.platform for row in hulu}, {"Hulu"})
+        movies = self.ds.get_media_summaries(media_type="Movie", platform="Hulu", limit=1)
+        self.assertEqual(titles(movies),
+                         titles(row for row in hulu if row.media_type == "Movie")[:1])
+        facets = self.ds.get_facet_counts(platform="Hulu")
+        self.assertEqual(facets["platform"], [("Hulu", len(hulu))])
+        self.assertEqual(list(self.ds.stream_media(platform="Hulu")), hulu)
+        with self.assertRaises(TypeError):
+            self.ds.get_facet_counts(director="Nobody")
+
+    def test_find_media(self):
+        """Test that any combination of filters can be queried, in catalog order."""
+        comedies = self.ds.get_media_by_category("Comedy")
+        expression = ("and", ("genre", "Comedy"), ("not", ("platform", "Netflix")))
+        self.assertEqual(self.ds.find_media(expression),
+                         [row for row in comedies if row.platform != "Netflix"])
+        either = self.ds.find_media(("or", ("genre", "Comedy"), ("decade", 2020)),
+                                    record=MediaSummary, limit=2)
+        self.assertTrue(all(isinstance(row, MediaSummary) for row in either))
+        self.assertEqual(titles(either), titles(self.ds.find_media(
+            ("or", ("genre", "Comedy"), ("decade", 2020))))[:2])
+        with self.assertRaises(KeyError):
+            self.ds.find_media(("director", "Nobody"))
+
+    def test_stream_media(self):
+        """Test that streaming without filters yields the whole catalog."""
+        self.assertEqual(len(list(self.ds.stream_media())), 8)
+        self.assertEqual(titles(self.ds.stream_media(release_year=2020)),
+                         ["Blood & Water", "Ricky Velez: Here's Everything"])
+        summaries = list(self.ds.stream_media(release_year=2020, record=MediaSummary))
+        self.assertTrue(all(isinstance(row, MediaSummary) for row in summaries))
+        self.assertEqual(titles(summaries), ["Blood & Water", "Ricky Velez: Here's Everything"])
+
+    def test_search_text(self):
+        """Test that every word must match and title matches come first."""
+        self.assertEqual(titles(self.ds.search_text("christmas")), [
+            "Duck the Halls: A Mickey Mouse Christmas Special", "Ernest Saves Christmas",
+        ])
+        self.assertEqual(titles(self.ds.search_text("santa christmas")),
+                         ["Ernest Saves Christmas"])
+        self.assertEqual(titles(self.ds.search_text("christmas -mickey")),
+                         ["Ernest Saves Christmas"])
+        self.assertEqual(titles(self.ds.search_text("christmas", limit=1, offset=1)),
+                         ["Ernest Saves Christmas"])
+
+    def test_vocabularies(self):
+        """Test that category and actor lists are sorted and distinct."""
+        categories = self.ds.get_all_categories()
+        self.assertEqual(categories, sorted(set(categories)))
+        self.assertIn("International TV Shows", categories)
+        self.assertIn("Taylor Kitsch", self.ds.get_all_actors())
+        self.assertEqual(self.ds.get_all_media_titles()[0], "Blood & Water")
+
+
+class TestBackends(unittest.TestCase):
+    """Tests for choosing the backend by configuration."""
+
+    def test_default_is_postgres(self):
+        """Test that PostgreSQL is used unless configured otherwise."""
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertIsInstance(create_datasource(max_connections=2), DataSource)
+
+    @patch("ProductionCode.backends.MemoryDataSource")
+    def test_environment_selects_memory(self, mock_memory):
+        """Test that STREAMSEARCH_BACKEND=memory selects the in-memory backend."""
+        with patch.dict(os.environ, {"STREAMSEARCH_BACKEND": "memory"}):
+            self.assertIs(create_datasource(query_cache=None), mock_memory.return_value)
+
+    def test_unknown_backend(self):
+        """Test that a misspelled backend is reported."""
+        with self.assertRaises(ValueError):
+            create_datasource("mongo")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+"""
+Unit tests for the latency metrics in metrics.py.
+"""
+import os
+import unittest
+from unittest.mock import patch
+from ProductionCode import metrics
+
+
+class TestQueryShapes(unittest.TestCase):
+    """Tests for normalizing and fingerprinting SQL."""
+
+    def test_normalize_sql(self):
+        """Test that literals and layout do not change a query's shape."""
+        self.assertEqual(metrics.normalize_sql("SELECT *\n  FROM media WHERE year > 2010 "
+                                               "AND title = 'It''s'"),
+                         "SELECT * FROM media WHERE year > ? AND title = ?")
+
+    def test_fingerprint(self):
+        """Test that queries of the same shape share a fingerprint."""
+        self.assertEqual(metrics.fingerprint("SELECT 1 FROM media"),
+                         metrics.fingerprint("SELECT 2\nFROM media"))
+        self.assertNotEqual(metrics.fingerprint("SELECT 1 FROM media"),
+                            metrics.fingerprint("SELECT 1 FROM actors"))
+
+    def test_result_bytes(self):
+        """Test that text is counted by length and other values as 8 bytes."""
+        self.assertEqual(metrics.result_bytes([("abc", 2020, None)]), 19)
+
+
+class TestRegistry(unittest.TestCase):
+    """Tests for histograms, counters and the Prometheus text format."""
+
+    def setUp(self):
+        """Creates an empty registry."""
+        self.registry = metrics.MetricsRegistry()
+
+    def test_histogram_render(self):
+        """Test that histogram buckets are cumulative and labelled."""
+        self.registry.observe("latency_seconds", 0.2, "Latency.", buckets=(0.1, 1.0), route="a")
+        self.registry.observe("latency_seconds", 0.05, "Latency.", buckets=(0.1, 1.0), route="a")
+        text = self.registry.render()
+        self.assertIn("# HELP latency_seconds Latency.\n# TYPE latency_seconds histogram", text)
+        self.assertIn('latency_seconds_bucket{route="a",le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{route="a",le="1.0"} 2', text)
+        self.assertIn('latency_seconds_bucket{route="a",le="+Inf"} 2', text)
+        self.assertIn('latency_seconds_count{route="a"} 2', text)
+
+    def test_counter_and_gauges(self):
+        """Test that counters add up and gauges are appended."""
+        self.registry.increment("errors_total", 2, q='say "hi"\n')
+        self.registry.increment("errors_total", 1, q='say "hi"\n')
+        text = self.registry.render({"pool_size": 3})
+        self.assertIn('errors_total{q="say \\"hi\\"\\n"} 3', text)
+        self.assertIn("# TYPE pool_size gauge\npool_size 3", text)
+
+
+class TestRecordQuery(unittest.TestCase):
+    """Tests for recording queries and the slow-query log."""
+
+    def setUp(self):
+        """Starts each test with empty metrics."""
+        metrics.REGISTRY.clear()
+
+    def test_records_latency_rows_and_request_time(self):
+        """Test that a query, fetched or streamed, is recorded and charged to the request."""
+        timings = metrics.start_request_timing()
+        metrics.record_query("SELECT title FROM media", 0.01, [("A",), ("B",)])
+        text = metrics.REGISTRY.render()
+        query_id = metrics.fingerprint("SELECT title FROM media")
+        self.assertIn(f'streamsearch_query_duration_seconds_count{{fingerprint="{query_id}"}} 1',
+                      text)
+        self.assertIn(f'streamsearch_query_rows_sum{{fingerprint="{query_id}"}} 2', text)
+        self.assertIn(f'streamsearch_query_bytes_total{{fingerprint="{query_id}"}} 2', text)
+        self.assertAlmostEqual(timings["db"], 0.01)
+
+        metrics.record_query("SELECT title FROM media", 0.02, [], fetched=(3, 40))
+        text = metrics.REGISTRY.render()
+        self.assertIn(f'streamsearch_query_rows_sum{{fingerprint="{query_id}"}} 5', text)
+        self.assertIn(f'streamsearch_query_bytes_total{{fingerprint="{query_id}"}} 42', text)
+        self.assertAlmostEqual(timings["db"], 0.03)
+
+    def test_failed_query_counted(self):
+        """Test that a failed query increments the error counter and marks the request."""
+        timings = metrics.start_request_timing()
+        metrics.record_query("SELECT 1", 0.01, [])
+        self.assertEqual(timings["errors"], 0)
+        metrics.record_query("SELECT 1", 0.01, None)
+        self.assertIn("streamsearch_query_errors_total", metrics.REGISTRY.render())
+        self.assertEqual(timings["errors"], 1)
+
+    @patch.dict(os.environ, {"STREAMSEARCH_SLOW_QUERY_MS": "50"})
+    def test_slow_query_log(self):
+        """Test that only queries over the threshold are printed."""
+        with patch("builtins.print") as mock_print:
+            metrics.record_query("SELECT 1", 0.01, [])
+            mock_print.assert_not_called()
+            metrics.record_query("SELECT 1\n  FROM media", 0.2, [])
+        message = mock_print.call_args[0][0]
+        self.assertTrue(message.startswith("Slow query (200.0 ms, 0 rows"))
+        self.assertTrue(message.endswith("SELECT ? FROM media"))
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_slow_query_log_off_by_default(self):
+        """Test that the slow-query log is opt-in."""
+        with patch.object(metrics.config, "SLOW_QUERY_MS", None, create=True):
+            self.assertIsNone(metrics.slow_query_threshold())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+Unit tests for keyset pagination helpers in pagination.py.
+"""
+import unittest
+from unittest.mock import MagicMock
+from ProductionCode.media import Media, MediaSummary
+from ProductionCode.pagination import decode_cursor, encode_cursor, fetch_page, row_key
+
+
+def make_rows(start, stop):
+    """Returns media records with ids start..stop-1, all from 2020."""
+    return [Media("movie", f"Title {i:03}", "", 2020, "", "", "Hulu", i)
+            for i in range(start, stop)]
+
+
+class TestCursors(unittest.TestCase):
+    """Tests for encoding and decoding page cursors."""
+
+    def test_round_trip(self):
+        """Test that a key survives encoding, including awkward titles."""
+        key = (1999, 'Crouching Tiger, "Hidden" Dragon / 卧虎藏龙', 12)
+        self.assertEqual(decode_cursor(encode_cursor(key)), key)
+
+    def test_url_safe(self):
+        """Test that tokens need no escaping in a query string."""
+        token = encode_cursor((2020, "???>>>", 1))
+        self.assertRegex(token, r"^[A-Za-z0-9_-]+$")
+
+    def test_malformed_tokens(self):
+        """Test that garbage and wrongly shaped tokens decode to None."""
+        self.assertIsNone(decode_cursor("not a token!"))
+        self.assertIsNone(decode_cursor(encode_cursor(("2020", "A", 1))))
+        self.assertIsNone(decode_cursor("WzFd"))
+
+    def test_row_key(self):
+        """Test that a row's key is its year, title and id."""
+        self.assertEqual(row_key(make_rows(5, 6)[0]), (2020, "Title 005", 5))
+        self.assertEqual(row_key(MediaSummary("Title 005", 2020, "", 5)), (2020, "Title 005", 5))
+
+
+class TestFetchPage(unittest.TestCase):
+    """Tests for fetching a page and linking its neighbours."""
+
+    def test_first_page(self):
+        """Test that the first page has a next cursor but no previous one."""
+        fetch = MagicMock(return_value=make_rows(0, 4))
+        page = fetch_page(fetch, 3)
+        self.assertEqual(len(page.rows), 3)
+        self.assertEqual(decode_cursor(page.next_cursor), (2020, "Title 002", 2))
+        self.assertIsNone(page.prev_cursor)
+        fetch.assert_called_with(limit=4, after=None, before=None)
+
+    def test_last_page(self):
+        """Test that a short page after a cursor links back but not forward."""
+        fetch = MagicMock(return_value=make_rows(3, 5))
+        page = fetch_page(fetch, 3, after=encode_cursor((2020, "Title 002", 2)))
+        self.assertIsNone(page.next_cursor)
+        self.assertEqual(decode_cursor(page.prev_cursor), (2020, "Title 003", 3))
+        fetch.assert_called_with(limit=4, after=(2020, "Title 002", 2), before=None)
+
+    def test_previous_page(self):
+        """Test that paging backwards drops the extra leading row and links both ways."""
+        fetch = MagicMock(return_value=make_rows(2, 6))
+        page = fetch_page(fetch, 3, before=encode_cursor((2020, "Title 006", 6)))
+        self.assertEqual([row.id for row in page.rows], [3, 4, 5])
+        self.assertEqual(decode_cursor(page.prev_cursor), (2020, "Title 003", 3))
+        self.assertEqual(decode_cursor(page.next_cursor), (2020, "Title 005", 5))
+
+    def test_back_to_first_page(self):
+        """Test that paging back to the start has no previous cursor."""
+        fetch = MagicMock(return_value=make_rows(0, 3))
+        page = fetch_page(fetch, 3, before=encode_cursor((2020, "Title 003", 3)))
+        self.assertIsNone(page.prev_cursor)
+        self.assertIsNotNone(page.next_cursor)
+
+    def test_bad_cursor_fetches_first_page(self):
+        """Test that a malformed cursor is ignored."""
+        fetch = MagicMock(return_value=[])
+        page = fetch_page(fetch, 3, after="garbage")
+        self.assertEqual(page.rows, [])
+        fetch.assert_called_with(limit=4, after=None, before=None)
+
+    def test_query_error(self):
+        """Test that a failed query gives an empty page."""
+        page = fetch_page(MagicMock(return_value=None), 3)
+        self.assertEqual(page, ([], None, None))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+"""
+Unit tests for the QueryCache class in query_cache.py.
+"""
+import unittest
+from unittest.mock import patch
+from ProductionCode.query_cache import QueryCache, make_key
+
+
+class TestQueryCache(unittest.TestCase):
+    """Tests for storing, expiring, evicting and invalidating cached results."""
+
+    def test_make_key_ignores_whitespace(self):
+        """Test that queries differing only in layout share a key."""
+        self.assertEqual(make_key("SELECT *\n   FROM media", [1]),
+                         make_key("SELECT * FROM media", (1,)))
+        self.assertNotEqual(make_key("SELECT 1", (1,)), make_key("SELECT 1", (2,)))
+
+    def test_hit_and_miss(self):
+        """Test that a stored result is returned and counted."""
+        cache = QueryCache()
+        self.assertIsNone(cache.get("key"))
+        cache.put("key", [("Movie A",)])
+        self.assertEqual(cache.get("key"), [("Movie A",)])
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_returns_copies(self):
+        """Test that callers changing a result do not change the cache."""
+        cache = QueryCache()
+        cache.put("key", [("Movie A",)])
+        cache.get("key").append(("Movie B",))
+        self.assertEqual(cache.get("key"), [("Movie A",)])
+
+    def test_least_recently_used_evicted(self):
+        """Test that the entry used longest ago goes first when full."""
+        cache = QueryCache(max_entries=2)
+        cache.put("a", [1])
+        cache.put("b", [2])
+        cache.get("a")
+        cache.put("c", [3])
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), [1])
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_row_bound(self):
+        """Test that the total row count is bounded and oversized results are skipped."""
+        cache = QueryCache(max_rows=3)
+        cache.put("a", [1, 2])
+        cache.put("b", [3, 4])
+        self.assertIsNone(cache.get("a"))
+        cache.put("huge", [1, 2, 3, 4])
+        self.assertIsNone(cache.get("huge"))
+        self.assertEqual(cache.stats()["rows"], 2)
+
+    def test_expiry(self):
+        """Test that results older than the ttl are not returned."""
+        cache = QueryCache(ttl=10)
+        with patch("ProductionCode.query_cache.time.monotonic", return_value=100.0):
+            cache.put("key", [1])
+        with patch("ProductionCode.query_cache.time.monotonic", return_value=111.0):
+            self.assertIsNone(cache.get("key"))
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+    def test_version_change_clears(self):
+        """Test that a new catalog version empties the cache and the same one does not."""
+        cache = QueryCache()
+        cache.set_version(1)
+        cache.put("key", [1])
+        cache.set_version(1)
+        cache.set_version(None)
+        self.assertEqual(cache.get("key"), [1])
+        cache.set_version(2)
+        self.assertIsNone(cache.get("key"))
+        self.assertEqual(cache.stats()["invalidations"], 1)
+
+    def test_version_check_throttled(self):
+        """Test that the version is due for a check at most once per interval."""
+        cache = QueryCache(version_check_interval=5)
+        with patch("ProductionCode.query_cache.time.monotonic", return_value=100.0):
+            self.assertTrue(cache.version_check_due())
+            self.assertFalse(cache.version_check_due())
+        with patch("ProductionCode.query_cache.time.monotonic", return_value=105.0):
+            self.assertTrue(cache.version_check_due())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+"""
+Unit tests for the SuggestionIndex class in suggest.py.
+"""
+import unittest
+from ProductionCode.suggest import SuggestionIndex, normalize, trigrams
+
+
+class TestSuggestionIndex(unittest.TestCase):
+    """Tests for ranking autocomplete suggestions."""
+
+    def setUp(self):
+        """Sets up an index over a handful of actor names."""
+        self.index = SuggestionIndex([
+            "Tom Hanks", "Tom Hardy", "Tommy Lee Jones", "Emma Stone",
+            "Sharon Stone", "Stone Cold Steve Austin", "Tom Hanks",
+        ])
+
+    def test_normalize(self):
+        """Test that normalization folds case and collapses whitespace."""
+        self.assertEqual(normalize("  Emma   STONE "), "emma stone")
+
+    def test_trigrams(self):
+        """Test that trigrams are padded at word boundaries."""
+        self.assertEqual(trigrams("ab"), {"  a", " ab", "ab "})
+
+    def test_duplicates_dropped(self):
+        """Test that repeated values are indexed once."""
+        self.assertEqual(len(self.index), 6)
+
+    def test_prefix_matches_first(self):
+        """Test that values starting with the query come first, in order."""
+        self.assertEqual(self.index.suggest("tom", 3),
+                         ["Tom Hanks", "Tom Hardy", "Tommy Lee Jones"])
+
+    def test_word_prefix_matches(self):
+        """Test that values with a later word starting with the query are found."""
+        self.assertEqual(self.index.suggest("stone"),
+                         ["Stone Cold Steve Austin", "Emma Stone", "Sharon Stone"])
+
+    def test_typo_tolerant(self):
+        """Test that a misspelled query still finds the closest value."""
+        self.assertEqual(self.index.suggest("tom hnks", 1), ["Tom Hanks"])
+
+    def test_limit(self):
+        """Test that no more than limit suggestions are returned."""
+        self.assertEqual(len(self.index.suggest("to", 2)), 2)
+
+    def test_empty_query(self):
+        """Test that an empty query suggests nothing."""
+        self.assertEqual(self.index.suggest("   "), [])
+
+    def test_no_match(self):
+        """Test that an unrelated query suggests nothing."""
+        self.assertEqual(self.index.suggest("zzzz"), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,24 +1,358 @@
 """
 Flask app for website.
 """
+import mimetypes
+import threading
+import time
+from functools import partial, wraps
+from itertools import chain
 from psycopg2 import DatabaseError
-from flask import Flask, render_template, request
-from ProductionCode.datasource import DataSource
+from flask import Flask, Response, g, jsonify, render_template, request, send_file, url_for
+from flask import stream_template, stream_with_context
+from flask import before_render_template, template_rendered
+from werkzeug.http import is_resource_modified
+from werkzeug.security import safe_join
+from ProductionCode import metrics
+from ProductionCode.async_datasource import AsyncDataSource
+from ProductionCode.backends import create_datasource
+from ProductionCode.compression import CompressionMiddleware, precompressed_path
+from ProductionCode.datasource import MATCH_MODES
+from ProductionCode.fragment_cache import FragmentCache
+from ProductionCode.http_cache import DataVersion, make_etag, version_time
+from ProductionCode.loader import PLATFORM_FILES
+from ProductionCode.media import MediaSummary
+from ProductionCode.pagination import Page, fetch_page
+from ProductionCode.query_cache import QueryCache
+from ProductionCode.suggest import SuggestionIndex
 
 app = Flask(__name__)
-ds = DataSource()
+app.wsgi_app = CompressionMiddleware(app.wsgi_app)
+ds = create_datasource(cache_vocabularies=True, query_cache=QueryCache())
+ads = AsyncDataSource(ds)
+data_version = DataVersion(ds)
+fragment_cache = FragmentCache()
 
-def get_searchbar_titles():
+SUGGEST_SOURCES = {
+    "title": "get_all_media_titles",
+    "actor": "get_all_actors",
+}
+MAX_SUGGESTIONS = 50
+# Choices offered by the search form's platform and type dropdowns.
+PLATFORMS = tuple(PLATFORM_FILES)
+MEDIA_TYPES = ("Movie", "TV Show")
+# "Did you mean" titles offered when a title lookup finds nothing.
+SIMILAR_TITLES = 5
+TEXT_PAGE_SIZE = 20
+PAGE_SIZE = 50
+LISTING_ERROR_MESSAGE = "Could not load these titles right now. Please try again later."
+# Streamed pages are sent in chunks of about this many characters.
+STREAM_CHUNK_SIZE = 8192
+# Cache-Control for pages cached by catalog version: result pages for five
+# minutes, the search form (whose category list rarely changes) for an hour.
+RESULTS_CACHE_CONTROL = "public, max-age=300"
+FORM_CACHE_CONTROL = "public, max-age=3600"
+# Autocomplete indexes by field, as (catalog version, index) pairs.
+suggestion_indexes = {}
+suggestion_locks = {field: threading.Lock() for field in SUGGEST_SOURCES}
+
+@app.before_request
+def start_timing():
     """
-    Small helper method that gets media titles for the
-    autocomplete searchbar at the top of most pages.
+    Starts timing the request and the database and template work it does.
     """
-    try:
-        return ds.get_all_media_titles()
-    except DatabaseError as e:
-        print('Database error in get_searchbar_titles(): ', e)
+    g.request_started = time.perf_counter()
+    g.request_timings = metrics.start_request_timing()
+
+@app.after_request
+def record_timing(response):
+    """
+    Records the request's total, database and template time by endpoint.
+    A streamed page is rendered, and may still query the database, while
+    it is sent, so its times are recorded when the response is closed.
+    """
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    endpoint = request.endpoint or 'unmatched'
+    method, status, timings = request.method, response.status_code, g.request_timings
+
+    def observe():
+        metrics.REGISTRY.observe('streamsearch_request_duration_seconds',
+                                 time.perf_counter() - started, 'Request latency.',
+                                 endpoint=endpoint, method=method, status=status)
+        metrics.REGISTRY.observe('streamsearch_request_db_seconds', timings['db'],
+                                 'Database time per request.', endpoint=endpoint)
+        metrics.REGISTRY.observe('streamsearch_request_render_seconds', timings['render'],
+                                 'Template render time per request.', endpoint=endpoint)
+    if response.is_streamed:
+        response.call_on_close(observe)
+    else:
+        observe()
+    return response
+
+def start_render_timing(_sender, **_extra):
+    """
+    Notes when a template starts rendering.
+    """
+    g.render_started = time.perf_counter()
+
+def finish_render_timing(_sender, **_extra):
+    """
+    Adds a finished template's render time to the request's timings.
+    """
+    started = g.pop('render_started', None)
+    if started is not None:
+        metrics.add_request_time('render', time.perf_counter() - started)
+
+before_render_template.connect(start_render_timing, app)
+template_rendered.connect(finish_render_timing, app)
+
+def cached_by_data_version(cache_control):
+    """
+    Decorator for read-only routes whose output depends only on their URL
+    and the catalog. Successful responses get a strong ETag derived from
+    the route, its arguments and the catalog version, a Last-Modified time
+    and the given Cache-Control policy. A request whose If-None-Match or
+    If-Modified-Since validators are still current gets 304 Not Modified
+    without running the view. While the catalog version cannot be read,
+    the view runs as usual and nothing is cached. A page whose queries
+    failed before the response started (see request_failed()), including
+    a streamed query that failed on its first rows, is sent with no-store,
+    so the error is not pinned until the next reload. A streamed page
+    whose query fails after it has started sending already has its
+    headers and is cut short instead.
+
+    Args:
+        cache_control (str): Cache-Control header value for the route.
+    """
+    def decorate(view):
+        @wraps(view)
+        def cached_view(*args, **kwargs):
+            version = data_version.get()
+            if version is None:
+                return view(*args, **kwargs)
+            etag = make_etag(request.endpoint, request.view_args,
+                             request.args.items(multi=True), version)
+            modified = version_time(version)
+            if not is_resource_modified(request.environ, etag, last_modified=modified):
+                response = app.response_class(status=304)
+            else:
+                response = app.make_response(view(*args, **kwargs))
+                if request_failed():
+                    response.headers['Cache-Control'] = 'no-store'
+                    return response
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.last_modified = modified
+            response.headers['Cache-Control'] = cache_control
+            return response
+        return cached_view
+    return decorate
+
+@app.template_global()
+def cache_fragment(name, data=True, caller=None):
+    """
+    Renders a template fragment once per catalog version, for use as
+    {% call cache_fragment("name", data) %} ... {% endcall %} around markup
+    that depends only on the catalog. The fragment is rendered without
+    caching when its data is empty or a query of the request failed, so a
+    dropdown left empty by a database error is not kept for the version.
+    """
+    version = data_version.get() if data and not request_failed() else None
+    return fragment_cache.render(name, version, caller)
+
+def get_suggestion_index(field):
+    """
+    Small helper method that builds the autocomplete index for a field
+    the first time it is needed and reuses it until the catalog version
+    changes, so a reload is picked up as by the other caches. While the
+    version cannot be read, the last index is kept.
+    An empty result (e.g. the database was down) is not kept, so the
+    next request tries again.
+    """
+    version = data_version.get()
+
+    def current():
+        cached = suggestion_indexes.get(field)
+        if cached is not None and (version is None or cached[0] == version):
+            return cached[1]
         return None
 
+    index = current()
+    if index is None:
+        with suggestion_locks[field]:
+            index = current()
+            if index is None:
+                try:
+                    index = SuggestionIndex(getattr(ds, SUGGEST_SOURCES[field])())
+                except DatabaseError as e:
+                    database_error('get_suggestion_index()', e)
+                    index = SuggestionIndex([])
+                if len(index):
+                    suggestion_indexes[field] = (version, index)
+    return index
+
+def database_error(route, error):
+    """
+    Small helper method that reports a database error a route recovered
+    from and marks the request as failed, see request_failed().
+    """
+    print(f"Database error in {route}:", error)
+    metrics.add_request_error()
+
+def request_failed():
+    """
+    Small helper method that tells whether the current request ran into a
+    database error, so what it rendered may be incomplete.
+    """
+    timings = g.get('request_timings')
+    return bool(timings and timings['errors'])
+
+def checked(fetch):
+    """
+    Small helper method that wraps a DataSource list method, marking the
+    request as failed when it returns None for a failed query.
+    """
+    def fetch_checked(*args, **kwargs):
+        rows = fetch(*args, **kwargs)
+        if rows is None:
+            metrics.add_request_error()
+        return rows
+    return fetch_checked
+
+def get_page(fetch):
+    """
+    Small helper method that fetches the page of a media list selected
+    by the after/before cursor in the query string.
+    """
+    return fetch_page(checked(fetch), PAGE_SIZE,
+                      request.args.get('after'), request.args.get('before'))
+
+@app.template_global()
+def page_url(**cursor):
+    """
+    Small helper method that builds a link to the current route and query
+    string with a different page cursor, or with other query args changed.
+    """
+    args = {key: value for key, value in request.args.items() if key not in ('after', 'before')}
+    args.update(cursor)
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+def pager_links(page):
+    """
+    Small helper method that renders previous/next links below a plain-text listing.
+    """
+    links = []
+    if page.prev_cursor:
+        links.append(f'<a href="{page_url(before=page.prev_cursor)}">Previous</a>')
+    if page.next_cursor:
+        links.append(f'<a href="{page_url(after=page.next_cursor)}">Next</a>')
+    if links:
+        links.append(f'<a href="{page_url(all=1)}">All</a>')
+    return "</br></br>" + " | ".join(links) if links else ""
+
+def gathered(outcome, route):
+    """
+    Small helper method that unwraps one result of ads.gather(): database
+    errors are printed and give None, other exceptions are raised again.
+    """
+    if isinstance(outcome, DatabaseError):
+        database_error(route, outcome)
+        return None
+    if isinstance(outcome, BaseException):
+        raise outcome
+    return outcome
+
+def match_mode():
+    """
+    Small helper method that reads how actor and genre names are matched
+    from the query string: "exact" (the default) or ?match=prefix.
+    """
+    match = request.args.get('match', 'exact')
+    return match if match in MATCH_MODES else 'exact'
+
+def first_rows(rows):
+    """
+    Small helper method that starts iterating a result, so that its query
+    runs, and can fail, before a streamed response has started.
+    Returns an iterator over all the rows, or None if there are none.
+    """
+    rows = iter(rows)
+    first = next(rows, None)
+    return None if first is None else chain((first,), rows)
+
+def buffered(chunks, size=STREAM_CHUNK_SIZE):
+    """
+    Small helper method that joins the small pieces of a streamed page into
+    chunks of about size characters before they are sent.
+    """
+    buffer, buffered_size = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered_size += len(chunk)
+        if buffered_size >= size:
+            yield "".join(buffer)
+            buffer, buffered_size = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+def stream_page(template, **context):
+    """
+    Small helper method that renders a template as a streamed response,
+    sending the page as it is rendered rather than after the last row.
+    """
+    return app.response_class(buffered(stream_template(template, **context)),
+                              mimetype='text/html')
+
+def media_listing(empty_message, **filters):
+    """
+    Small helper method that lists media matching filters as plain text:
+    one page selected by the after/before cursor, or with ?all=1 every
+    match, read through a server-side cursor. The listing is streamed
+    either way, so an all-catalog listing starts at once and does not
+    have to fit in memory. Names are matched as chosen by match_mode().
+    A listing left empty by a failed query, streamed or not, says so
+    rather than reporting no matches.
+    """
+    filters['match'] = match_mode()
+    if request.args.get('all'):
+        rows, footer = ds.stream_media(**filters, record=MediaSummary), ""
+    else:
+        page = get_page(partial(ds.get_media_summaries, **filters))
+        rows, footer = page.rows, pager_links(page)
+    rows = first_rows(rows)
+    if rows is None:
+        return LISTING_ERROR_MESSAGE if request_failed() else empty_message
+
+    def lines():
+        for i, row in enumerate(rows):
+            yield (f"{'</br></br>' if i else ''}"
+                   f"<b>{row.title}</b> ({row.release_year}): {row.media_description}")
+        yield footer
+    return app.response_class(stream_with_context(buffered(lines())), mimetype='text/html')
+
+def static_file(filename):
+    """
+    Serves a static file, or the copy precompressed by
+    "python -m ProductionCode.compression" when the client accepts its
+    encoding and it is newer than the original. Paths leading out of the
+    static folder are left to send_static_file(), which refuses them.
+    """
+    path = safe_join(app.static_folder, filename)
+    compressed = encoding = None
+    if path is not None:
+        compressed, encoding = precompressed_path(path, request.headers.get('Accept-Encoding'))
+    if compressed is None:
+        return app.send_static_file(filename)
+    response = send_file(compressed, mimetype=mimetypes.guess_type(filename)[0],
+                         max_age=app.get_send_file_max_age(filename))
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+app.view_functions['static'] = static_file
+
 @app.route('/')
 def homepage():
     """
@@ -28,109 +362,177 @@ def homepage():
     return render_template("index.html")
 
 @app.route('/actor/<name>', strict_slashes=False)
+@cached_by_data_version(RESULTS_CACHE_CONTROL)
 def search_by_actor(name):
     """
-    Returns movie titles and descriptions featuring the specified actor.
+    Returns one page of movie titles and descriptions featuring the specified actor,
+    or all of them with ?all=1.
 
     Args:
         name (str): The name of the actor to search for.
 
     Returns:
-        str: A string listing matching movie titles and descriptions,
-             or a message indicating no results were found.
+        Response: A streamed listing of matching movie titles and descriptions,
+            or a message indicating no results were found.
     """
     try:
-        results = ds.get_media_by_actor(name)
-        if not results:
-            return f"No results found for actor: {name}"
-        return "</br></br>".join(f"<b>{row[1]}</b> ({row[3]}): {row[5]}" for row in results)
+        return media_listing(f"No results found for actor: {name}", actor_name=name)
     except LookupError as e:
         print("Lookup error in /actor route:", e)
         return f"Could not find actor: {name}"
 
 @app.route('/year/<int:year>', strict_slashes=False)
+@cached_by_data_version(RESULTS_CACHE_CONTROL)
 def search_by_year(year):
     """
-    Returns all movies released after the specified year.
+    Returns one page of the movies released after the specified year,
+    or all of them with ?all=1.
 
     Args:
         year (int): The minimum release year for filtering movies.
 
     Returns:
-        str: A string listing matching movies,
-             or a message indicating no results were found.
+        Response: A streamed listing of matching movies,
+            or a message indicating no results were found.
     """
     try:
-        results = ds.get_media_later_than(year-1)
-        if not results:
-            return f"No movies found released after {year}."
-        return "</br></br>".join(f"<b>{row[1]}</b> ({row[3]}): {row[5]}" for row in results)
+        return media_listing(f"No movies found released after {year}.", release_year=year-1)
     except LookupError as e:
         print("Lookup error in /year route:", e)
         return f"Could not find titles after year: {year}"
 
 @app.route('/category/<category>', strict_slashes=False)
+@cached_by_data_version(RESULTS_CACHE_CONTROL)
 def search_by_category(category):
     """
-    Returns movie titles and descriptions in the specified category.
+    Returns one page of movie titles and descriptions in the specified category,
+    or all of them with ?all=1.
 
     Args:
         category (str): The genre or category of movies to search.
 
     Returns:
-        str: A string listing matching movies,
-             or a message indicating no results were found.
+        Response: A streamed listing of matching movies,
+            or a message indicating no results were found.
     """
     try:
-        results = ds.get_media_by_category(category)
-        if not results:
-            return f"No movies found in category: {category}"
-        return "</br></br>".join(f"<b>{row[1]}</b> ({row[3]}): {row[5]}" for row in results)
+        return media_listing(f"No movies found in category: {category}", category=category)
     except LookupError as e:
         print("Lookup error in /category route:", e)
         return f"Could not find movies in category: {category}"
 
 @app.route('/filter', methods=['GET'])
+@cached_by_data_version(FORM_CACHE_CONTROL)
 def filter_form():
     """
     Renders genre selection form with dynamic dropdown.
+    The category list is fetched while the title and actor autocomplete
+    indexes behind the form's search bars are built, all concurrently,
+    so the page waits only for the slowest of them.
     """
-    categories, actors = [], []
-    try:
-        categories = ds.get_all_categories()
-        actors = ds.get_all_actors()
-    except DatabaseError as e:
-        print("Database error in /filter:", e)
+    categories, *indexes = ads.gather(
+        ads.get_all_categories(),
+        *(ads.call(get_suggestion_index, field) for field in SUGGEST_SOURCES),
+    )
+    if isinstance(categories, DatabaseError):
+        database_error('/filter', categories)
+        categories = []
+    elif isinstance(categories, BaseException):
+        raise categories
+    for index in indexes:
+        if isinstance(index, BaseException):
+            print("Could not build autocomplete index in /filter:", index)
 
     return render_template(
         'filter.html',
         categories=categories,
-        actors=actors,
-        titles=get_searchbar_titles()
+        platforms=PLATFORMS,
+        media_types=MEDIA_TYPES
     )
 
 
 @app.route('/filter/results', methods=['GET'])
+@cached_by_data_version(RESULTS_CACHE_CONTROL)
 def filter_results():
-    """Handles advanced filter search and displays results."""
+    """
+    Handles advanced filter search and streams one page of results,
+    or with ?all=1 every result, read through a server-side cursor.
+    With ?match=prefix the actor and category match names starting with them.
+    ?platform= and ?type= narrow the results to one platform or media type.
+    The results are counted by genre, decade, platform and media type
+    while a page is fetched (before a whole listing is streamed), for the
+    page to show how to narrow them.
+    """
     category = request.args.get('category', '')
     actor = request.args.get('actor', '')
     year = request.args.get('year', '')
-    results = None
-    try:
-        results = ds.get_media_by_advanced_filter(
-            actor if actor else '',
-            str(int(year)-1) if year else '0',
-            category if category else ''
-        )
-    except DatabaseError as e:
-        print("Database error in /filter/results:", e)
-    return render_template(
+    filters = (actor if actor else '', str(int(year)-1) if year else '0',
+               category if category else '')
+    options = {'match': match_mode()}
+    for column, arg in (('platform', 'platform'), ('media_type', 'type')):
+        if request.args.get(arg):
+            options[column] = request.args[arg]
+    if request.args.get('all'):
+        # The stream holds its connection until the page is sent, so the
+        # facet counts are read first: a request never waits for a second
+        # connection while holding one.
+        facets = gathered(ads.gather(ads.get_facet_counts(*filters, **options))[0],
+                          '/filter/results')
+        rows = first_rows(ds.stream_media(*filters, **options))
+    else:
+        rows = ads.call(fetch_page,
+                        checked(partial(ds.get_media_by_advanced_filter, *filters, **options)),
+                        PAGE_SIZE, request.args.get('after'), request.args.get('before'))
+        rows, facets = (gathered(outcome, '/filter/results') for outcome in
+                        ads.gather(rows, ads.get_facet_counts(*filters, **options)))
+    results = rows
+    next_url = prev_url = all_url = None
+    if isinstance(rows, Page):
+        results = rows.rows
+        next_url = page_url(after=rows.next_cursor) if rows.next_cursor else None
+        prev_url = page_url(before=rows.prev_cursor) if rows.prev_cursor else None
+        all_url = page_url(all=1) if next_url or prev_url else None
+    return stream_page(
         'filter_results.html',
         actor=actor,
         year=year,
         category=category,
-        results=results
+        results=results or (),
+        facets=facets,
+        next_url=next_url,
+        prev_url=prev_url,
+        all_url=all_url
+    )
+
+
+@app.route('/search/text', methods=['GET'])
+@cached_by_data_version(RESULTS_CACHE_CONTROL)
+def text_search_results():
+    """
+    Handles keyword search over titles and descriptions and displays
+    one page of results, best matches first.
+    """
+    query = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    results = None
+    if query:
+        try:
+            results = checked(ds.search_text)(query, TEXT_PAGE_SIZE + 1,
+                                              (page - 1) * TEXT_PAGE_SIZE)
+        except DatabaseError as e:
+            database_error('/search/text', e)
+
+    next_url = prev_url = None
+    if results and len(results) > TEXT_PAGE_SIZE:
+        results = results[:TEXT_PAGE_SIZE]
+        next_url = url_for('text_search_results', q=query, page=page + 1)
+    if page > 1:
+        prev_url = url_for('text_search_results', q=query, page=page - 1)
+    return stream_page(
+        'filter_results.html',
+        results=results or (),
+        next_url=next_url,
+        prev_url=prev_url
     )
 
 
@@ -139,28 +541,83 @@ def about_page():
     """
     Renders the about page with information about the application.
     """
-    return render_template(
-        'about.html',
-        titles=get_searchbar_titles()
-    )
+    return render_template('about.html')
+
+
+@app.route('/api/suggest', methods=['GET'])
+def suggest():
+    """
+    Returns autocomplete suggestions as a JSON list of strings.
+
+    Query args:
+        field: "title" or "actor".
+        q: The text typed so far (jQuery UI's "term" is accepted too).
+        limit: Maximum number of suggestions (default 10).
+    """
+    field = request.args.get('field', 'title')
+    if field not in SUGGEST_SOURCES:
+        return jsonify(error=f"Unknown suggestion field: {field}"), 400
+    query = request.args.get('q', request.args.get('term', ''))
+    limit = min(max(request.args.get('limit', 10, type=int), 1), MAX_SUGGESTIONS)
+    return jsonify(get_suggestion_index(field).suggest(query, limit))
+
+
+@app.route('/admin/cache', methods=['GET'])
+def cache_stats():
+    """
+    Returns query cache, connection pool, prepared statement and
+    template fragment cache statistics as JSON.
+    """
+    return jsonify(query_cache=ds.cache_stats(), pool=ds.pool_stats(),
+                   prepared_statements=ds.prepared_stats(),
+                   fragment_cache=fragment_cache.stats())
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """
+    Returns request and query latency histograms, plus current pool,
+    cache, prepared statement and fragment cache statistics, in the
+    Prometheus text format.
+    """
+    gauges = {}
+    for prefix, stats in (('streamsearch_pool', ds.pool_stats()),
+                          ('streamsearch_query_cache', ds.cache_stats()),
+                          ('streamsearch_prepared', ds.prepared_stats()),
+                          ('streamsearch_fragment_cache', fragment_cache.stats())):
+        for name, value in stats.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                gauges[f'{prefix}_{name}'] = value
+    return Response(metrics.REGISTRY.render(gauges),
+                    mimetype='text/plain; version=0.0.4')
 
 
 @app.route('/search', methods=['GET'])
+@cached_by_data_version(RESULTS_CACHE_CONTROL)
 def search_result_page():
     """
     Renders the search result page given an individual movie title.
+    When no title matches, lists the most similar titles instead.
     """
     title_choice = request.args.get('title_choice', '')
     media = None
+    similar = []
 
     try:
         media = ds.get_media_from_title(title_choice)
+        if media is None and title_choice.strip():
+            seen = set()
+            for row in ds.get_similar_titles(title_choice, SIMILAR_TITLES) or []:
+                if row.title.lower() not in seen:
+                    seen.add(row.title.lower())
+                    similar.append(row)
     except DatabaseError as e:
-        print("Database error in /search:", e)
+        database_error('/search', e)
 
     return render_template(
         "search_result.html",
-        media=media
+        media=media,
+        similar=similar
     )
 
 
@@ -3,10 +3,22 @@ cl.py
 
 Command Line Interface for StreamSearch
 This module provides a command line interface for the StreamSearch application.
-It allows users to filter movies and shows based on actor names, categories, and release years.
+It allows users to filter movies and shows based on actor names, categories, release years,
+platforms and media types, or to search their titles and descriptions by keyword.
+Results are printed as they arrive from the database, as a table, CSV or JSON lines.
 """
 import argparse
-from ProductionCode.datasource import DataSource
+import csv
+import json
+import os
+import sys
+from functools import partial
+from ProductionCode.backends import create_datasource
+from ProductionCode.media import MEDIA_FIELDS
+from ProductionCode.pagination import fetch_page
+
+# Keyword matches read per query when listing every match.
+TEXT_BATCH_SIZE = 500
 
 def parse_args():
     """
@@ -19,51 +31,149 @@ def parse_args():
     parser.add_argument('-a', '--actor', type=str, help='Filter by actor name')
     parser.add_argument('-c', '--category', type=str, help='Filter by category')
     parser.add_argument('-y', '--year', type=int, help='Filter by release year')
+    parser.add_argument('--platform', type=str,
+                        help='Filter by streaming platform, e.g. Hulu')
+    parser.add_argument('--type', dest='media_type', type=str,
+                        help='Filter by media type: Movie or "TV Show"')
+    parser.add_argument('--prefix', action='store_true',
+                        help='Match actor and category names starting with the given ones '
+                             'instead of whole names')
+    parser.add_argument('-t', '--text', type=str,
+                        help='Keyword search over titles and descriptions, listing every match '
+                             'unless --limit is given')
+    parser.add_argument('-l', '--limit', type=int,
+                        help='Show at most this many results per page')
+    parser.add_argument('-p', '--page', type=int, default=1,
+                        help='Page of results to show when --limit is given (default 1)')
+    parser.add_argument('-f', '--format', choices=('table', 'csv', 'jsonl'), default='table',
+                        help='Output format (default table)')
     return parser.parse_args()
 
+def get_cl_page(fetch, limit, page):
+    """
+    Walks a media list page by page and returns the requested page.
+
+    Parameters:
+        fetch: A DataSource list method with its filters already bound.
+        limit (int): Results per page.
+        page (int): 1-based page number.
+
+    Returns:
+        list: The media entries on that page; empty if the list is shorter.
+    """
+    cursor = None
+    for _ in range(page - 1):
+        cursor = fetch_page(fetch, limit, after=cursor).next_cursor
+        if cursor is None:
+            return []
+    return fetch_page(fetch, limit, after=cursor).rows
+
+def all_text_matches(ds, text, batch_size=TEXT_BATCH_SIZE):
+    """
+    Yields every keyword search match, best first, reading batch_size
+    matches per query until a short batch shows the last one was read.
+
+    Parameters:
+        ds: An instance of the DataSource class to search.
+        text (str): Search words, as for search_text().
+        batch_size (int): Matches read per query.
+
+    Yields:
+        Media: Each match. Stops early if a query fails.
+    """
+    offset = 0
+    while True:
+        batch = ds.search_text(text, limit=batch_size, offset=offset)
+        if not batch:
+            return
+        yield from batch
+        if len(batch) < batch_size:
+            return
+        offset += batch_size
+
 def get_cl_filtered_results(args, ds):
     """
     Applies filtering logic based on command line arguments and calls the appropriate
     method from the DataSource.
 
+    A keyword search (--text) takes precedence over the other filters.
+    Platform and media type filters (--platform, --type) go through the
+    advanced filter, alone or combined with the others.
+    With --limit, only the requested --page of results is returned; otherwise
+    every match is streamed from the database as it is read.
+
     Parameters:
-        args: Parsed command line arguments containing actor, category, and/or year.
+        args: Parsed command line arguments containing actor, category, year,
+              platform, media_type and/or text.
         ds: An instance of the DataSource class to query media data from.
 
     Returns:
-        list: A list of media entries (tuples) that match the given filters.
+        iterable: The Media records that match the given filters.
     """
-    if args.actor and not args.category and not args.year:
-        return ds.get_media_by_actor(args.actor)
-    if args.category and not args.actor and not args.year:
-        return ds.get_media_by_category(args.category)
-    if args.year and not args.actor and not args.category:
-        return ds.get_media_later_than(args.year)
-    return ds.get_media_by_advanced_filter(
-        args.actor if args.actor else '',
-        args.year if args.year else 0,
-        args.category if args.category else ''
-    )
+    if args.text:
+        if args.limit:
+            return ds.search_text(args.text, limit=args.limit,
+                                  offset=(args.page - 1) * args.limit)
+        return all_text_matches(ds, args.text)
+    match = "prefix" if getattr(args, "prefix", False) else "exact"
+    columns = {column: getattr(args, column) for column in ("platform", "media_type")
+               if getattr(args, column, None)}
+    if not args.limit:
+        return ds.stream_media(args.actor, args.year, args.category, match=match, **columns)
+    if columns:
+        fetch = partial(ds.get_media_by_advanced_filter, args.actor or '', args.year,
+                        args.category or '', match=match, **columns)
+    elif args.actor and not args.category and not args.year:
+        fetch = partial(ds.get_media_by_actor, args.actor, match=match)
+    elif args.category and not args.actor and not args.year:
+        fetch = partial(ds.get_media_by_category, args.category, match=match)
+    elif args.year and not args.actor and not args.category:
+        fetch = partial(ds.get_media_later_than, args.year)
+    else:
+        fetch = partial(
+            ds.get_media_by_advanced_filter,
+            args.actor if args.actor else '',
+            args.year if args.year else 0,
+            args.category if args.category else '',
+            match=match
+        )
+    return get_cl_page(fetch, args.limit, args.page)
 
-def display_results(results):
+def display_results(results, output_format="table"):
     """
-    Displays query results in a readable format.
+    Displays query results in a readable format, one row at a time.
 
     Parameters:
-        results (list of tuples): Each tuple represents a media record
-                retrieved from the data source.
-                Fields/columns are printed separated by vertical bars.
+        results (iterable of Media): The media records retrieved from the
+                data source; any sequences of field values in MEDIA_FIELDS
+                order work too. May be a generator, in which case each row
+                is printed as soon as it is produced.
+        output_format (str): "table" prints fields separated by vertical bars,
+                "csv" prints a header row followed by CSV rows, and "jsonl"
+                prints one JSON object per row keyed by column name.
 
     Output:
-        Prints each result on a separate line. 
-        If no results are found, a corresponding message is displayed.
+        Prints each result on a separate line.
+        If no results are found, a corresponding message is displayed
+        (on stderr for csv and jsonl, so piped output stays parseable).
     """
-    if not results:
-        print("No matching results found.")
-        return
-
+    writer = None
+    count = 0
     for row in results:
-        print(" | ".join(str(field) for field in row))
+        if output_format == "csv":
+            if writer is None:
+                writer = csv.writer(sys.stdout, lineterminator="\n")
+                writer.writerow(MEDIA_FIELDS[:len(row)])
+            writer.writerow(row)
+        elif output_format == "jsonl":
+            print(json.dumps(dict(zip(MEDIA_FIELDS, row)), ensure_ascii=False, default=str))
+        else:
+            print(" | ".join(str(field) for field in row))
+        count += 1
+
+    if not count:
+        print("No matching results found.",
+              file=sys.stdout if output_format == "table" else sys.stderr)
 
 def main():
     """
@@ -71,13 +181,24 @@ def main():
     """
     args = parse_args()
 
-    if not (args.actor or args.category or args.year):
-        print("Please provide at least one filter: --actor, --category, or --year")
+    if not (args.actor or args.category or args.year or args.platform or args.media_type
+            or args.text):
+        print("Please provide at least one filter: --actor, --category, --year, --platform, "
+              "--type, or --text")
+        return
+    if (args.limit is not None and args.limit < 1) or args.page < 1:
+        print("--limit and --page must be positive")
         return
 
-    ds = DataSource()
-    results = get_cl_filtered_results(args, ds)
-    display_results(results)
+    ds = create_datasource()
+    try:
+        display_results(get_cl_filtered_results(args, ds), args.format)
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # The reader (e.g. head) went away; stop quietly like other shell tools.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    finally:
+        ds.close()
 
 if __name__ == "__main__":
     main()